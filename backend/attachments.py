@@ -0,0 +1,289 @@
+import os
+import re
+import sqlite3
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from backend.graph.transport import get_transport
+from backend.metrics import ITEMS, STAGE_SECONDS, log_event
+
+ATTACHMENT_DIR = "data/attachments"
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(25 * 1024 * 1024)))
+MAX_TEXT_CHARS = 20000     # text kept per attachment
+DOWNLOAD_WORKERS = 4       # concurrent downloads per mailbox
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+TEXT_EXTENSIONS = (".txt", ".log", ".csv", ".json", ".md", ".xml", ".yaml", ".yml", ".ini", ".cfg")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attachments (
+    message_id TEXT,
+    attachment_id TEXT,
+    name TEXT,
+    content_type TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    PRIMARY KEY (message_id, attachment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_attachments_sha ON attachments(sha256);
+
+CREATE TABLE IF NOT EXISTS attachment_blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER,
+    text TEXT,
+    extracted INTEGER DEFAULT 0
+);
+"""
+
+
+# --- Text extraction (runs in worker processes; module-level so it pickles) ---
+
+def _pdf_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ""  # Optional dependency: PDFs are stored but not read without pypdf
+    reader = PdfReader(path)
+    parts, total = [], 0
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        parts.append(text)
+        total += len(text)
+        if total >= MAX_TEXT_CHARS:
+            break
+    return "\n".join(parts)
+
+
+def _docx_text(path):
+    with zipfile.ZipFile(path) as z:
+        xml = z.read("word/document.xml").decode("utf-8", errors="replace")
+    xml = re.sub(r"</w:p>", "\n", xml)
+    return re.sub(r"<[^>]+>", "", xml)
+
+
+def _plain_text(path):
+    # Only the head of huge logs is useful, and reading it stays bounded
+    with open(path, "rb") as f:
+        data = f.read(MAX_TEXT_CHARS * 4)
+    return data.decode("utf-8", errors="replace")
+
+
+def extract_text(path, name, content_type):
+    """Best-effort plain text of one stored attachment ("" if unsupported)."""
+    name = (name or "").lower()
+    content_type = (content_type or "").lower()
+    try:
+        if name.endswith(".pdf") or content_type == "application/pdf":
+            text = _pdf_text(path)
+        elif name.endswith(".docx"):
+            text = _docx_text(path)
+        elif name.endswith((".html", ".htm")) or content_type == "text/html":
+            from bs4 import BeautifulSoup
+            text = BeautifulSoup(_plain_text(path), "html.parser").get_text(separator="\n")
+        elif content_type.startswith("text/") or name.endswith(TEXT_EXTENSIONS):
+            text = _plain_text(path)
+        else:
+            text = ""
+    except Exception as e:
+        print(f"⚠️  Could not read attachment {name}: {e}")
+        text = ""
+    return " ".join(text.split())[:MAX_TEXT_CHARS]
+
+
+_pool = None
+_pool_key = None
+
+
+def _get_pool(workers):
+    """One long-lived extraction pool per process (ingest runs once per fetched page)."""
+    global _pool, _pool_key
+    key = (os.getpid(), workers)
+    if _pool is None or _pool_key != key:
+        if _pool is not None and _pool_key[0] == os.getpid():
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_key = key
+    return _pool
+
+
+class AttachmentStore:
+    """
+    Attachment pipeline for ingested messages.
+
+    Attachments are listed per message, streamed to a temp file in chunks
+    (hashing while writing) and kept once per content hash under
+    data/attachments/, so the same file attached to fifty replies is stored
+    and read once. Text is extracted on a small process pool. Downloads and
+    extraction both run with a fixed number of workers, and only one chunk
+    per download is ever in memory.
+    """
+
+    def __init__(self, store, root=ATTACHMENT_DIR, download_workers=DOWNLOAD_WORKERS,
+                 extract_workers=EXTRACT_WORKERS, max_bytes=MAX_ATTACHMENT_BYTES):
+        self.store = store
+        self.conn = store.conn
+        self.lock = store.lock
+        self.root = root
+        self.max_bytes = max_bytes
+        self.download_workers = download_workers
+        self.extract_workers = extract_workers
+        os.makedirs(self.root, exist_ok=True)
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def _blob_path(self, sha):
+        return os.path.join(self.root, sha[:2], sha)
+
+    def _known(self, message_ids):
+        placeholders = ",".join("?" * len(message_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT message_id FROM attachments WHERE message_id IN ({placeholders})",
+                list(message_ids)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def _list(self, outlook, message_id):
+        response = get_transport().get(
+            f"{outlook.graph_url}/me/messages/{message_id}/attachments",
+            headers=outlook.headers, endpoint="attachments",
+            # Leave out contentBytes: the content is streamed separately
+            params={"$select": "id,name,contentType,size,isInline"},
+        )
+        response.raise_for_status()
+        return response.json().get('value', [])
+
+    def _download(self, outlook, message_id, attachment):
+        """Streams one attachment into the content-addressed store. Returns its row."""
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        os.close(fd)
+        try:
+            size, sha = get_transport().download(
+                f"{outlook.graph_url}/me/messages/{message_id}/attachments/{attachment['id']}/$value",
+                tmp, headers=outlook.headers, max_bytes=self.max_bytes,
+            )
+            path = self._blob_path(sha)
+            if os.path.exists(path):
+                ITEMS.inc(stage="attachments", outcome="deduplicated")
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+                ITEMS.inc(stage="attachments", outcome="stored")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return (message_id, attachment['id'], attachment.get('name'),
+                attachment.get('contentType'), size, sha)
+
+    def _fetch_message(self, outlook, message_id):
+        rows = []
+        for attachment in self._list(outlook, message_id):
+            # Item/reference attachments have no file content to stream
+            if attachment.get('isInline') or attachment.get('@odata.type', '').endswith(
+                    ("itemAttachment", "referenceAttachment")):
+                continue
+            if (attachment.get('size') or 0) > self.max_bytes:
+                ITEMS.inc(stage="attachments", outcome="too_large")
+                continue
+            try:
+                rows.append(self._download(outlook, message_id, attachment))
+            except ValueError:
+                # Reported size was wrong: the stream passed max_bytes. Skipped
+                # like any oversized attachment, so it is not fetched every run
+                ITEMS.inc(stage="attachments", outcome="too_large")
+        if not rows:
+            # Marker row so a message with only inline/oversized attachments is not listed again
+            rows.append((message_id, "", None, None, 0, None))
+        return message_id, rows
+
+    def ingest(self, outlook, messages):
+        """
+        Downloads and reads the attachments of `messages` (Graph API dicts with
+        hasAttachments) not seen before. Returns the number of new attachments.
+        """
+        ids = [m['id'] for m in messages if m.get('hasAttachments') and m.get('id')]
+        if not ids:
+            return 0
+        known = self._known(ids)
+        ids = [i for i in ids if i not in known]
+        if not ids:
+            return 0
+
+        rows = []
+        with STAGE_SECONDS.time(stage="attachments"), \
+                ThreadPoolExecutor(max_workers=self.download_workers) as pool:
+            futures = [pool.submit(self._fetch_message, outlook, mid) for mid in ids]
+            for future in as_completed(futures):
+                try:
+                    rows += future.result()[1]
+                except Exception as e:
+                    print(f"❌ Attachment download failed: {e}")
+                    log_event("attachment_failed", error=str(e))
+
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO attachments VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO attachment_blobs (sha256, size) VALUES (?, ?)",
+                [(r[5], r[4]) for r in rows if r[5]]
+            )
+        stored = sum(1 for r in rows if r[5])
+        if stored:
+            print(f"📎 Stored {stored} attachments from {len(ids)} messages.")
+        self.extract_pending()
+        return stored
+
+    def extract_pending(self):
+        """Extracts text for every stored blob not read yet, once per content hash."""
+        with self.lock:
+            pending = self.conn.execute(
+                "SELECT b.sha256, a.name, a.content_type FROM attachment_blobs b "
+                "JOIN attachments a ON a.sha256 = b.sha256 WHERE b.extracted = 0 GROUP BY b.sha256"
+            ).fetchall()
+        if not pending:
+            return 0
+
+        results = []
+        pool = _get_pool(self.extract_workers)
+        with STAGE_SECONDS.time(stage="attachment_text"):
+            # Keep at most 2 jobs per worker in flight
+            window = self.extract_workers * 2
+            running = {}
+            queue = list(pending)
+            while queue or running:
+                while queue and len(running) < window:
+                    sha, name, content_type = queue.pop()
+                    running[pool.submit(extract_text, self._blob_path(sha), name, content_type)] = sha
+                done = next(as_completed(running))
+                sha = running.pop(done)
+                try:
+                    results.append((done.result(), sha))
+                except Exception as e:
+                    print(f"⚠️  Text extraction failed for {sha[:12]}: {e}")
+                    results.append(("", sha))
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE attachment_blobs SET text = ?, extracted = 1 WHERE sha256 = ?", results
+            )
+        ITEMS.inc(len(results), stage="attachments", outcome="extracted")
+        return len(results)
+
+    def text_for(self, message_id):
+        """[(name, text)] for a message's attachments that have readable text."""
+        with self.lock:
+            try:
+                rows = self.conn.execute(
+                    "SELECT a.name, b.text FROM attachments a JOIN attachment_blobs b ON a.sha256 = b.sha256 "
+                    "WHERE a.message_id = ? AND b.text != '' ORDER BY a.name", (message_id,)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [(name, text) for name, text in rows]
+
+
+def with_attachment_text(text, attachments, limit=4000):
+    """Appends attachment text to a question/answer body for extraction and embedding."""
+    for name, body in attachments:
+        text += f"\n\n[Attachment: {name}]\n{body[:limit]}"
+    return text
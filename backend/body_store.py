@@ -0,0 +1,141 @@
+import re
+import time
+import zlib
+import threading
+from collections import Counter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # Optional dependency: zlib with a preset dictionary is used instead
+
+# Message bodies are compressed one by one (so any single body decodes on
+# its own) against a dictionary trained on the mailbox's own mail: the CSS
+# blocks, signatures, disclaimers and quoted history that every Outlook body
+# repeats end up in the dictionary instead of in each row.
+
+CODEC = "zstd" if zstandard else "zlib"
+LEVEL = 6
+ZSTD_DICT_SIZE = 112 * 1024
+ZLIB_DICT_SIZE = 32 * 1024        # zlib's window: a larger zdict is never used
+MIN_BODY_BYTES = 64               # smaller bodies are stored raw
+MIN_TRAIN_SAMPLES = 200           # bodies needed before the first dictionary
+TRAIN_SAMPLES = 2000              # most recent bodies used for (re)training
+RETRAIN_EVERY = 5000              # new bodies before the dictionary is retrained
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS body_dicts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codec TEXT,
+    data BLOB,
+    samples INTEGER,
+    created REAL
+);
+"""
+
+
+def _zlib_dictionary(samples, size=ZLIB_DICT_SIZE):
+    """
+    zlib has no trainer: build a preset dictionary from the HTML fragments
+    shared by many samples, most common last (closest to the data, cheapest
+    to reference).
+    """
+    counts = Counter()
+    for sample in samples:
+        fragments = {f for f in re.split(rb"(?<=>)", sample) if len(f) >= 16}
+        counts.update(fragments)
+    threshold = max(2, len(samples) // 50)
+    common = [f for f, n in sorted(counts.items(), key=lambda item: item[1]) if n >= threshold]
+    return b"".join(common)[-size:]
+
+
+class BodyCodec:
+    """
+    Dictionary compression for message bodies, sharing the MessageStore's
+    connection. Every dictionary ever trained is kept in `body_dicts`, and
+    each row records the one it was written with, so retraining never
+    rewrites old rows.
+    """
+
+    def __init__(self, conn, lock, codec=CODEC):
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package")
+        self.conn = conn
+        self.lock = lock
+        self.codec = codec
+        self._dicts = {}                 # id -> (codec, raw dictionary bytes, zstd dict or None)
+        self._local = threading.local()  # zstd (de)compressors are not thread-safe
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+            row = self.conn.execute(
+                "SELECT id FROM body_dicts WHERE codec = ? ORDER BY id DESC LIMIT 1", (codec,)
+            ).fetchone()
+        self.current = row[0] if row else None
+
+    def _dictionary(self, dict_id):
+        entry = self._dicts.get(dict_id)
+        if entry is None:
+            with self.lock:
+                row = self.conn.execute("SELECT codec, data FROM body_dicts WHERE id = ?", (dict_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown body dictionary {dict_id}")
+            codec, data = row
+            compiled = zstandard.ZstdCompressionDict(data) if codec == "zstd" else None
+            entry = self._dicts[dict_id] = (codec, data, compiled)
+        return entry
+
+    def _zstd(self, kind, dict_id):
+        cache = self._local.__dict__.setdefault(kind, {})
+        if dict_id not in cache:
+            compiled = self._dictionary(dict_id)[2]
+            cache[dict_id] = (zstandard.ZstdCompressor(level=LEVEL, dict_data=compiled) if kind == "c"
+                              else zstandard.ZstdDecompressor(dict_data=compiled))
+        return cache[dict_id]
+
+    def encode(self, text):
+        """text -> (blob, codec, dict_id). Call without the store lock held."""
+        data = (text or "").encode("utf-8")
+        dict_id = self.current
+        if dict_id is None or len(data) < MIN_BODY_BYTES:
+            return data, "raw", None
+        codec, raw, _ = self._dictionary(dict_id)
+        if codec == "zstd":
+            return self._zstd("c", dict_id).compress(data), codec, dict_id
+        compressor = zlib.compressobj(LEVEL, zdict=raw)
+        return compressor.compress(data) + compressor.flush(), codec, dict_id
+
+    def decode(self, blob, codec, dict_id):
+        """The body text of one row; rows from before compression have codec None."""
+        if blob is None:
+            return None
+        if codec in (None, "raw"):
+            return blob.decode("utf-8") if isinstance(blob, bytes) else blob
+        raw = self._dictionary(dict_id)[1]
+        if codec == "zstd":
+            return self._zstd("d", dict_id).decompress(blob).decode("utf-8")
+        decompressor = zlib.decompressobj(zdict=raw)
+        return (decompressor.decompress(blob) + decompressor.flush()).decode("utf-8")
+
+    def train(self, samples):
+        """Trains and stores a new dictionary from body texts. Returns its id (None if too few)."""
+        samples = [s.encode("utf-8") for s in samples if s and len(s) >= MIN_BODY_BYTES]
+        if len(samples) < MIN_TRAIN_SAMPLES:
+            return None
+        start = time.perf_counter()
+        if self.codec == "zstd":
+            try:
+                data = zstandard.train_dictionary(ZSTD_DICT_SIZE, samples, level=LEVEL).as_bytes()
+            except zstandard.ZstdError as e:
+                print(f"⚠️  Body dictionary training failed: {e}")
+                return None
+        else:
+            data = _zlib_dictionary(samples)
+        with self.lock, self.conn:
+            dict_id = self.conn.execute(
+                "INSERT INTO body_dicts (codec, data, samples, created) VALUES (?, ?, ?, ?)",
+                (self.codec, data, len(samples), time.time())
+            ).lastrowid
+        self.current = dict_id
+        print(f"🗜️  Trained {self.codec} body dictionary #{dict_id} ({len(data) // 1024} KB, "
+              f"{len(samples)} samples, {time.perf_counter() - start:.2f}s)")
+        return dict_id
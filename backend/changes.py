@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+CHANGES_DB = "data/changes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    name TEXT PRIMARY KEY,
+    seq INTEGER,
+    updated REAL,
+    info TEXT
+);
+"""
+
+
+class ChangeFeed:
+    """
+    Change notifications between processes that share the data directory.
+
+    The extractor writes messages, threads and FAQs to the SQLite stores and
+    then publishes a channel ("messages", "faqs", "profile") here; the UI
+    reads the stores directly and only watches the channel sequence numbers
+    to know when to re-render. The UI in turn publishes "refresh" to ask the
+    extractor for a fetch instead of calling Graph itself.
+
+    Waiting is a poll of `PRAGMA data_version`, which only changes when
+    another connection commits, so an idle wait never reads a table.
+    """
+
+    def __init__(self, db_file=CHANGES_DB):
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def publish(self, channel, **info):
+        """Bumps `channel` and stores `info` (small, JSON-serialisable). Returns the new seq."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO channels (name, seq, updated, info) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET seq = seq + 1, updated = excluded.updated, "
+                "info = excluded.info", (channel, time.time(), json.dumps(info))
+            )
+            return self.conn.execute("SELECT seq FROM channels WHERE name = ?", (channel,)).fetchone()[0]
+
+    def versions(self):
+        """{channel: seq} for every channel published so far."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT name, seq FROM channels").fetchall())
+
+    def info(self, channel):
+        """The last published info of `channel` plus its seq and time, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT seq, updated, info FROM channels WHERE name = ?", (channel,)
+            ).fetchone()
+        if not row:
+            return None
+        info = json.loads(row[2] or "{}")
+        info.update(seq=row[0], updated=row[1])
+        return info
+
+    def _data_version(self):
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self, seen):
+        """Current versions if any channel in `seen` ({channel: seq}) moved past it, else None."""
+        versions = self.versions()
+        if any(versions.get(channel, 0) > seq for channel, seq in seen.items()):
+            return versions
+        return None
+
+    def wait(self, seen, timeout=1.0, interval=0.1):
+        """Blocks up to `timeout` seconds for a change to a channel in `seen` (see changed())."""
+        versions = self.changed(seen)
+        deadline = time.monotonic() + timeout
+        data_version = self._data_version()
+        while versions is None and time.monotonic() < deadline:
+            time.sleep(interval)
+            current = self._data_version()
+            if current != data_version:
+                data_version = current
+                versions = self.changed(seen)
+        return versions
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,252 @@
+import json
+import time
+import uuid
+import hashlib
+
+from backend.metrics import ITEMS, log_event
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_runs (
+    run_id TEXT PRIMARY KEY,
+    mailbox TEXT,
+    started REAL,
+    finished REAL,
+    status TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS candidate_status (
+    answer_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    pair_hash TEXT,
+    status TEXT,
+    run_id TEXT,
+    attempts INTEGER DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_candidate_status ON candidate_status(status);
+CREATE TABLE IF NOT EXISTS run_lease (
+    mailbox TEXT PRIMARY KEY,
+    run_id TEXT,
+    expires REAL
+);
+"""
+
+# Candidate lifecycle. A pair is validated by Gemini exactly once per content
+# hash: the result is checkpointed before anything else is written, so a
+# crash after the (paid) call never repeats it.
+#
+#   pending -> validated -> saved -> vectorized
+#          \-> rejected
+#          \-> failed -> pending (retried next run, up to MAX_ATTEMPTS)
+PENDING, VALIDATED, REJECTED, FAILED, SAVED, VECTORIZED = (
+    "pending", "validated", "rejected", "failed", "saved", "vectorized"
+)
+TRANSITIONS = {
+    PENDING: {VALIDATED, REJECTED, FAILED},
+    FAILED: {PENDING, VALIDATED, REJECTED, FAILED},
+    VALIDATED: {SAVED},
+    SAVED: {VECTORIZED, SAVED},
+    REJECTED: set(),
+    VECTORIZED: set(),
+}
+# Statuses whose Gemini work is done for the current text of the pair
+SETTLED = {VALIDATED, REJECTED, SAVED, VECTORIZED}
+MAX_ATTEMPTS = 5            # transient failures before a pair is given up on
+LEASE_SECONDS = 300         # a run that stops renewing its lease this long is presumed dead
+
+
+class LeaseLost(RuntimeError):
+    """Another run took over the mailbox after this one stopped renewing its lease."""
+
+
+def pair_hash(pair):
+    """Hash of what Gemini sees: a pair whose text changed is validated again."""
+    payload = json.dumps([pair.get('question') or "", pair.get('answer') or ""])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RunLedger:
+    """
+    Run-level checkpoints for the extractor, next to the messages.
+
+    Every job gets a run id in `extraction_runs` and holds the mailbox's run
+    lease while it works, so a second extractor or `cli.py resume` cannot
+    drain the same queue (and pay for the same pairs) alongside it. A run
+    still "running" once its lease expired was interrupted. `candidate_status` records each Q&A
+    pair's stage and keeps the Gemini result as soon as it arrives, so a
+    restart finishes interrupted saves without calling Gemini again, and a
+    transient error leaves the pair to be retried instead of dropped.
+    """
+
+    def __init__(self, store):
+        self.conn = store.conn
+        self.lock = store.lock
+        self._renewed = 0
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    # --- Runs ---
+
+    def start_run(self, mailbox, ttl=LEASE_SECONDS):
+        """
+        Takes the mailbox's run lease and opens a new run. Returns (run_id,
+        ids of interrupted earlier runs), or (None, []) while another live run
+        holds the lease.
+        """
+        run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        now = time.time()
+        with self.lock, self.conn:
+            # One statement, so two processes cannot both take an expired lease
+            taken = self.conn.execute(
+                "INSERT INTO run_lease (mailbox, run_id, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(mailbox) DO UPDATE SET run_id = excluded.run_id, expires = excluded.expires "
+                "WHERE run_lease.expires <= ?",
+                (mailbox, run_id, now + ttl, now)
+            ).rowcount == 1
+            if not taken:
+                return None, []
+            # Holding the lease, any other run of this mailbox still "running" is dead
+            interrupted = [r[0] for r in self.conn.execute(
+                "SELECT run_id FROM extraction_runs WHERE status = 'running' AND mailbox = ?", (mailbox,)
+            ).fetchall()]
+            self.conn.execute(
+                "UPDATE extraction_runs SET status = 'interrupted' WHERE status = 'running' AND mailbox = ?",
+                (mailbox,)
+            )
+            self.conn.execute(
+                "INSERT INTO extraction_runs (run_id, mailbox, started, status) VALUES (?, ?, ?, 'running')",
+                (run_id, mailbox, now)
+            )
+        self._renewed = time.monotonic()
+        if interrupted:
+            log_event("runs_interrupted", runs=len(interrupted))
+        return run_id, interrupted
+
+    def renew(self, run_id, ttl=LEASE_SECONDS):
+        """Extends the run's lease (at most every ttl/4 seconds). Raises LeaseLost if it expired and was taken."""
+        if time.monotonic() - self._renewed < ttl / 4:
+            return
+        with self.lock, self.conn:
+            renewed = self.conn.execute(
+                "UPDATE run_lease SET expires = ? WHERE run_id = ?", (time.time() + ttl, run_id)
+            ).rowcount == 1
+        if not renewed:
+            log_event("run_lease_lost", level="warning", run_id=run_id)
+            raise LeaseLost(run_id)
+        self._renewed = time.monotonic()
+
+    def finish_run(self, run_id, summary, status="finished"):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE extraction_runs SET finished = ?, status = ?, summary = ? WHERE run_id = ?",
+                (time.time(), status, json.dumps(summary), run_id)
+            )
+            self.conn.execute("DELETE FROM run_lease WHERE run_id = ?", (run_id,))
+
+    def runs(self, limit=10):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT run_id, mailbox, started, finished, status, summary FROM extraction_runs "
+                "ORDER BY started DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(r, summary=json.loads(r['summary'] or "null")) for r in rows]
+
+    # --- Candidates ---
+
+    def _get(self, answer_id):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT * FROM candidate_status WHERE answer_id = ?", (answer_id,)
+            ).fetchone()
+
+    def _move(self, answer_id, status, run_id, **fields):
+        row = self._get(answer_id)
+        if row is None or status not in TRANSITIONS[row['status']]:
+            current = row['status'] if row else None
+            log_event("status_refused", answer_id=answer_id, current=current, requested=status)
+            return False
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE candidate_status SET status = ?, run_id = ?, updated = ?"
+                f"{', ' + assignments if assignments else ''} WHERE answer_id = ?",
+                (status, run_id, time.time(), *fields.values(), answer_id)
+            )
+        ITEMS.inc(stage="checkpoint", outcome=status)
+        return True
+
+    def track(self, conversation_id, pair, run_id):
+        """
+        Registers a parsed pair and returns its status. A pair seen before
+        with the same text keeps its status (settled ones need no LLM call);
+        one whose text changed starts over as pending.
+        """
+        digest = pair_hash(pair)
+        row = self._get(pair['id'])
+        if row and row['pair_hash'] == digest:
+            return row['status']
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO candidate_status "
+                "(answer_id, conversation_id, pair_hash, status, run_id, attempts, updated) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (pair['id'], conversation_id, digest, PENDING, run_id, time.time())
+            )
+        return PENDING
+
+    def needs_llm(self, pair):
+        """False when Gemini already answered for this exact text (or we gave up on it)."""
+        row = self._get(pair['id'])
+        if row is None or row['pair_hash'] != pair_hash(pair):
+            return True
+        return row['status'] == PENDING or (row['status'] == FAILED and row['attempts'] < MAX_ATTEMPTS)
+
+    def record_result(self, answer_id, run_id, metadata):
+        """Checkpoints Gemini's verdict (call before writing anything else)."""
+        if metadata:
+            return self._move(answer_id, VALIDATED, run_id, result=json.dumps(metadata), error=None)
+        return self._move(answer_id, REJECTED, run_id, error=None)
+
+    def record_failure(self, answer_id, run_id, error):
+        """A transient error: counts the attempt. Returns True while the pair should be retried."""
+        row = self._get(answer_id)
+        attempts = (row['attempts'] if row else 0) + 1
+        self._move(answer_id, FAILED, run_id, attempts=attempts, error=str(error)[:500])
+        return attempts < MAX_ATTEMPTS
+
+    def record_saved(self, answer_id, run_id):
+        return self._move(answer_id, SAVED, run_id)
+
+    def checkpointed(self):
+        """Validated pairs whose FAQ was not saved yet: [(answer_id, conversation_id, metadata)]."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT answer_id, conversation_id, result FROM candidate_status WHERE status = ?", (VALIDATED,)
+            ).fetchall()
+        return [(r['answer_id'], r['conversation_id'], json.loads(r['result'])) for r in rows]
+
+    def refresh_vectorized(self, faqs, consumer="vectorizer"):
+        """Moves saved pairs whose FAQ the vectorizer has embedded to `vectorized`."""
+        cursor = faqs.get_cursor(consumer)
+        if not cursor:
+            return 0
+        with self.lock:
+            saved = [r[0] for r in self.conn.execute(
+                "SELECT answer_id FROM candidate_status WHERE status = ?", (SAVED,)
+            ).fetchall()]
+        done = [aid for aid in saved if (faqs.get(aid) or {}).get('seq', cursor + 1) <= cursor]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE candidate_status SET status = ?, updated = ? WHERE answer_id = ?",
+                [(VECTORIZED, time.time(), aid) for aid in done]
+            )
+        return len(done)
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM candidate_status GROUP BY status"
+            ).fetchall()
+        return {status: n for status, n in rows}
@@ -0,0 +1,87 @@
+import threading
+import functools
+
+# Process-wide client singletons.
+# Building an OutlookService (MSAL app + token cache load), a PineconeHandler
+# (Pinecone client + index handle) or a GeminiValidator (model config) costs far
+# more than the calls we make with them, so long-lived processes (the Streamlit
+# server, the background extractor) build each one once and share it.
+
+_lock = threading.Lock()
+
+
+def _singleton(factory):
+    instance = {}
+
+    @functools.wraps(factory)
+    def get():
+        if "value" not in instance:
+            with _lock:
+                if "value" not in instance:
+                    instance["value"] = factory()
+        return instance["value"]
+
+    get.cache_clear = instance.clear
+    # Lets tests and benchmarks install a stand-in instead of the real client
+    get.override = lambda value: instance.__setitem__("value", value)
+    return get
+
+
+@_singleton
+def get_outlook():
+    from backend.graph import OutlookService
+    return OutlookService()
+
+
+@_singleton
+def get_pinecone():
+    from backend.pinecone_handler import PineconeHandler
+    return PineconeHandler()
+
+
+@_singleton
+def get_gemini():
+    from backend.gemini import GeminiValidator
+    return GeminiValidator()
+
+
+@_singleton
+def get_message_store():
+    from backend.message_store import MessageStore
+    return MessageStore()
+
+
+@_singleton
+def get_faq_store():
+    from backend.faq_store import FaqStore
+    return FaqStore()
+
+
+@_singleton
+def get_change_feed():
+    from backend.changes import ChangeFeed
+    return ChangeFeed()
+
+
+@_singleton
+def get_vector_store():
+    from backend.vector_store import LocalVectorStore
+    return LocalVectorStore()
+
+
+@_singleton
+def get_kb_search():
+    from backend.kb_search import KnowledgeBaseSearch
+    return KnowledgeBaseSearch()
+
+
+@_singleton
+def get_thread_index():
+    from backend.thread_index import ThreadIndex
+    return ThreadIndex(get_message_store())
+
+
+def reset_clients():
+    """Drops every cached client (e.g. after logout or a config change)."""
+    for getter in (get_outlook, get_pinecone, get_gemini, get_kb_search):
+        getter.cache_clear()
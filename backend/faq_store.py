@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+FAQ_DB = "data/faqs.db"
+LEGACY_FAQ_FILE = "data/faq_metadata.json"
+SNAPSHOT_DIR = "data/snapshots"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS faqs (
+    id TEXT PRIMARY KEY,
+    seq INTEGER UNIQUE,
+    question TEXT,
+    answer TEXT,
+    topic TEXT,
+    mailbox TEXT DEFAULT 'default',
+    content_hash TEXT,
+    deleted INTEGER DEFAULT 0,
+    updated REAL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_faqs_topic ON faqs(topic, deleted, seq);
+CREATE INDEX IF NOT EXISTS idx_faqs_live ON faqs(deleted, seq);
+
+CREATE TABLE IF NOT EXISTS faq_keywords (
+    faq_id TEXT,
+    keyword TEXT,
+    PRIMARY KEY (keyword, faq_id)
+);
+
+CREATE TABLE IF NOT EXISTS faq_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+def faq_id(faq):
+    """FAQs are keyed by the answer message they were extracted from."""
+    return faq.get('id') or faq.get('source_email_id')
+
+
+def content_hash(faq):
+    """Hash of the fields that end up in the embedding and its metadata."""
+    payload = json.dumps([
+        faq.get('question', ''), faq.get('answer', ''), faq.get('topic', ''),
+        sorted(faq.get('keywords') or []),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FaqStore:
+    """
+    Indexed FAQ store (SQLite), replacing the ever-growing faq_metadata.json.
+
+    Every insert, edit or delete takes the next sequence number, so readers
+    can page and filter through SQL, and consumers such as the vectorizer
+    ask for "changes since N" and keep their own cursor. Deletes are kept
+    as tombstones so consumers see them too. `snapshot()` writes a
+    versioned JSONL export for downstream tools.
+
+    All mailboxes share this one store (the `mailbox` column says where an
+    FAQ came from), so the vectorizer, reconcile job and UI see every FAQ.
+    """
+
+    def __init__(self, db_file=FAQ_DB, legacy_file=LEGACY_FAQ_FILE):
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            columns = [r['name'] for r in self.conn.execute("PRAGMA table_info(faqs)")]
+            if "mailbox" not in columns:
+                self.conn.execute("ALTER TABLE faqs ADD COLUMN mailbox TEXT DEFAULT 'default'")
+        self._import_legacy(legacy_file)
+
+    def _import_legacy(self, legacy_file):
+        """One-time import of an existing faq_metadata.json."""
+        if not legacy_file or not os.path.exists(legacy_file) or self._meta("legacy_imported"):
+            return
+        try:
+            with open(legacy_file, "r") as f:
+                faqs = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            faqs = []
+        self.upsert_many(faqs)
+        with self.lock, self.conn:
+            self._set_meta("legacy_imported", 1)
+        print(f"📦 Imported {len(faqs)} FAQs from {legacy_file}")
+
+    def adopt(self, mailbox, db_file, legacy_file=None):
+        """
+        One-time import of a mailbox's own FAQ store (data/mailboxes/<name>/faqs.db,
+        or its faq_metadata.json) from before all mailboxes shared this one.
+        """
+        key = f"adopted:{mailbox}"
+        with self.lock:
+            if self._meta(key):
+                return 0
+        if os.path.abspath(db_file) == os.path.abspath(self.db_file):
+            return 0
+        faqs = []
+        if os.path.exists(db_file) or (legacy_file and os.path.exists(legacy_file)):
+            own = FaqStore(db_file, legacy_file=legacy_file)
+            faqs = [dict(faq, mailbox=mailbox) for faq in own.iter_all()]
+            for faq in faqs:
+                faq.pop('seq', None)
+                faq.pop('content_hash', None)
+            own.close()
+        self.upsert_many(faqs)
+        with self.lock, self.conn:
+            self._set_meta(key, 1)
+        if faqs:
+            print(f"📦 Moved {len(faqs)} FAQs of mailbox {mailbox} into {self.db_file}")
+        return len(faqs)
+
+    # --- Meta / cursors ---
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM faq_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO faq_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value)
+        )
+
+    def _next_seq(self):
+        seq = (self._meta("seq") or 0) + 1
+        self._set_meta("seq", seq)
+        return seq
+
+    @property
+    def version(self):
+        """Last sequence number written; use it as a cache key."""
+        with self.lock:
+            return self._meta("seq") or 0
+
+    def get_cursor(self, consumer):
+        """Last sequence number `consumer` has processed (None if it never ran)."""
+        with self.lock:
+            return self._meta(f"cursor:{consumer}")
+
+    def set_cursor(self, consumer, seq):
+        with self.lock, self.conn:
+            self._set_meta(f"cursor:{consumer}", seq)
+
+    # --- Writes ---
+
+    def upsert_many(self, faqs):
+        """
+        Inserts new FAQs and updates changed ones; unchanged records keep their
+        sequence number. Returns the number of records written.
+        """
+        written = 0
+        now = time.time()
+        with self.lock, self.conn:
+            for faq in faqs:
+                fid = faq_id(faq)
+                if not fid:
+                    continue
+                digest = content_hash(faq)
+                row = self.conn.execute(
+                    "SELECT content_hash, deleted FROM faqs WHERE id = ?", (fid,)
+                ).fetchone()
+                if row and row['content_hash'] == digest and not row['deleted']:
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO faqs "
+                    "(id, seq, question, answer, topic, mailbox, content_hash, deleted, updated, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                    (fid, self._next_seq(), faq.get('question'), faq.get('answer'),
+                     faq.get('topic', 'General'), faq.get('mailbox') or 'default', digest, now, json.dumps(faq))
+                )
+                self.conn.execute("DELETE FROM faq_keywords WHERE faq_id = ?", (fid,))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO faq_keywords (faq_id, keyword) VALUES (?, ?)",
+                    [(fid, k.lower()) for k in faq.get('keywords') or [] if isinstance(k, str)]
+                )
+                written += 1
+        return written
+
+    def upsert(self, faq):
+        return self.upsert_many([faq]) == 1
+
+    def delete(self, ids):
+        """Tombstones FAQs (they stay visible to changes_since)."""
+        now = time.time()
+        deleted = 0
+        with self.lock, self.conn:
+            for fid in ids:
+                live = self.conn.execute("SELECT 1 FROM faqs WHERE id = ? AND deleted = 0", (fid,)).fetchone()
+                if not live:
+                    continue
+                self.conn.execute(
+                    "UPDATE faqs SET deleted = 1, seq = ?, updated = ? WHERE id = ?", (self._next_seq(), now, fid)
+                )
+                self.conn.execute("DELETE FROM faq_keywords WHERE faq_id = ?", (fid,))
+                deleted += 1
+        return deleted
+
+    # --- Reads ---
+
+    @staticmethod
+    def _record(row):
+        record = json.loads(row['data'])
+        record['id'] = row['id']
+        record['seq'] = row['seq']
+        record['content_hash'] = row['content_hash']
+        record['mailbox'] = row['mailbox']
+        if row['deleted']:
+            record['deleted'] = True
+        return record
+
+    @staticmethod
+    def _where(topic=None, keyword=None):
+        clauses, params = ["deleted = 0"], []
+        if topic:
+            clauses.append("topic = ?")
+            params.append(topic)
+        if keyword:
+            clauses.append("id IN (SELECT faq_id FROM faq_keywords WHERE keyword = ?)")
+            params.append(keyword.lower())
+        return " WHERE " + " AND ".join(clauses), params
+
+    def count(self, topic=None, keyword=None):
+        where, params = self._where(topic, keyword)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM faqs{where}", params).fetchone()[0]
+
+    def list(self, offset=0, limit=50, topic=None, keyword=None):
+        """One page of live FAQs, newest first."""
+        where, params = self._where(topic, keyword)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM faqs{where} ORDER BY seq DESC LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return [self._record(r) for r in rows]
+
+    def get(self, fid):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM faqs WHERE id = ? AND deleted = 0", (fid,)).fetchone()
+        return self._record(row) if row else None
+
+    def topics(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT topic, COUNT(*) FROM faqs WHERE deleted = 0 GROUP BY topic ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        return [(topic, count) for topic, count in rows]
+
+    def changes_since(self, seq, limit=1000):
+        """Records (including tombstones) written after `seq`, oldest change first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM faqs WHERE seq > ? ORDER BY seq LIMIT ?", (seq or 0, limit)
+            ).fetchall()
+        return [self._record(r) for r in rows]
+
+    def iter_all(self, batch=1000):
+        """Every live FAQ, oldest first, read in batches."""
+        last = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT * FROM faqs WHERE deleted = 0 AND seq > ? ORDER BY seq LIMIT ?", (last, batch)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._record(row)
+            last = rows[-1]['seq']
+
+    # --- Snapshots ---
+
+    def snapshot(self, directory=SNAPSHOT_DIR):
+        """
+        Writes every live FAQ to `<directory>/faqs-<seq>.jsonl` (first line is a
+        header with the sequence number and count) and returns the path.
+        The file is written to a temp name and renamed, so readers never see
+        a partial snapshot.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            # One read transaction: the header and the rows describe the same state
+            self.conn.execute("BEGIN")
+            try:
+                seq = self._meta("seq") or 0
+                path = os.path.join(directory, f"faqs-{seq:010d}.jsonl")
+                if not os.path.exists(path):
+                    count = self.conn.execute("SELECT COUNT(*) FROM faqs WHERE deleted = 0").fetchone()[0]
+                    tmp = path + ".tmp"
+                    with open(tmp, "w") as f:
+                        f.write(json.dumps({"format": "faqs-jsonl/1", "seq": seq, "count": count,
+                                            "created": time.time()}) + "\n")
+                        for row in self.conn.execute("SELECT * FROM faqs WHERE deleted = 0 ORDER BY seq"):
+                            f.write(json.dumps(self._record(row)) + "\n")
+                    os.replace(tmp, path)
+            finally:
+                self.conn.execute("COMMIT")
+        return path
+
+    def close(self):
+        self.conn.close()
+
+
+def latest_snapshot(directory=SNAPSHOT_DIR):
+    """Path of the newest snapshot in `directory`, or None."""
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(n for n in os.listdir(directory) if n.startswith("faqs-") and n.endswith(".jsonl"))
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def read_snapshot(path):
+    """Yields the header dict, then every FAQ record of a snapshot."""
+    with open(path, "r") as f:
+        for line in f:
+            yield json.loads(line)
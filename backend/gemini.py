@@ -1,28 +1,12 @@
 import os
-import google.generativeai as genai
 import json
 from dotenv import load_dotenv
+from backend.metrics import LLM_SECONDS, LLM_ERRORS, LLM_TOKENS
+from backend.prompt_budget import PromptPacker, estimate_tokens
 
 load_dotenv()
 
-class GeminiValidator:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in .env")
-        
-        genai.configure(api_key=api_key)
-        # Using gemini-1.5-flash as stable default, can switch to 2.0-flash-exp if available
-        # The user requested '2.5', we will try to use the latest available.
-        self.model = genai.GenerativeModel('gemini-2.5-flash') 
-
-    def validate_and_extract(self, question, answer):
-        """
-        Uses Gemini to check if this is a valid Q&A pair.
-        Returns JSON metadata if valid, else None.
-        """
-        
-        prompt = f"""
+VALIDATION_PROMPT = """
         Analyze the following email exchange between a User and a Support Agent.
         
         USER QUESTION:
@@ -49,23 +33,171 @@ class GeminiValidator:
         - Do NOT rewrite or summarize. Use the original text.
         - Output ONLY raw JSON. No markdown ticks.
         """
-        
+
+# Several pairs in one request (EXTRACT_PAIRS_PER_CALL > 1)
+BATCH_PROMPT = """
+        Analyze the following {count} email exchanges between Users and a Support Agent.
+
+        {pairs}
+
+        TASK:
+        For EACH numbered pair, decide whether it is a valid, helpful Question & Answer pair suitable for an FAQ (Ignore generic replies like "Thanks", "Ok", "Will check").
+        Return a JSON array with one object per pair, in the same order, each with:
+           - "pair": (The pair number)
+           - "valid": true or false
+           - If valid: "question" and "answer" (the exact texts), "topic" (a short 1-2 word category) and "keywords" (list of 3-5 keywords)
+
+        IMPORTANT:
+        - Do NOT rewrite or summarize. Use the original text.
+        - Output ONLY raw JSON. No markdown ticks.
+        """
+
+PAIR_BLOCK = """PAIR {number}
+        USER QUESTION:
+        {question}
+
+        SUPPORT ANSWER:
+        {answer}
+        --------------------------------------------------"""
+
+
+def prompt_packer():
+    """Packer sized for these prompts (the instructions count against each request)."""
+    fixed = max(estimate_tokens(VALIDATION_PROMPT.format(question="", answer="")),
+                estimate_tokens(BATCH_PROMPT.format(count=0, pairs="")))
+    return PromptPacker(fixed_tokens=fixed)
+
+
+def build_prompt(pairs, packer):
+    """The validation prompt for `pairs`, with their texts fitted to the request budget."""
+    fitted = packer.fit(pairs)
+    if len(pairs) == 1:
+        question, answer = fitted[0]
+        return VALIDATION_PROMPT.format(question=question, answer=answer)
+    blocks = "\n\n        ".join(PAIR_BLOCK.format(number=n, question=q, answer=a)
+                                   for n, (q, a) in enumerate(fitted, 1))
+    return BATCH_PROMPT.format(count=len(pairs), pairs=blocks)
+
+
+def _parse_json(text):
+    text = text.strip()
+    # Clean md ticks if present
+    if text.startswith("```json"):
+        text = text[7:-3]
+    elif text.startswith("```"):
+        text = text[3:-3]
+    return json.loads(text)
+
+
+class IncompleteResponse(ValueError):
+    """
+    The reply had no usable verdict for some pairs (left out, misnumbered,
+    not JSON we understand). `results` holds the verdicts that were given;
+    `missing` the positions to retry.
+    """
+
+    def __init__(self, results, missing):
+        super().__init__(f"no verdict for pair(s) {', '.join(str(i + 1) for i in missing)}")
+        self.results = results
+        self.missing = missing
+
+
+def _verdict(item):
+    # Only an explicit "valid": false is a rejection; anything else is not an answer
+    if isinstance(item, dict) and item.get("valid") is True:
+        # "pair" only numbers the verdict in a batch reply; keep it out of the FAQ
+        return {k: v for k, v in item.items() if k != "pair"}
+    if isinstance(item, dict) and item.get("valid") is False:
+        return None
+    raise ValueError(f"unusable verdict: {item!r}"[:200])
+
+
+def parse_verdicts(data, count):
+    """
+    One metadata dict (valid) or None (rejected) per pair from a parsed reply.
+    Raises IncompleteResponse when some pairs got no usable verdict.
+    """
+    if count == 1:
+        if isinstance(data, list) and len(data) == 1:
+            data = data[0]
+        try:
+            return [_verdict(data)]
+        except ValueError:
+            raise IncompleteResponse([None], [0])
+
+    found = {}
+    for position, item in enumerate(data if isinstance(data, list) else []):
+        if not isinstance(item, dict):
+            continue
+        number = item.get("pair", position + 1)
         try:
+            number = int(number)
+            if 1 <= number <= count and number - 1 not in found:
+                found[number - 1] = _verdict(item)
+        except (TypeError, ValueError):
+            continue
+    missing = [i for i in range(count) if i not in found]
+    results = [found.get(i) for i in range(count)]
+    if missing:
+        raise IncompleteResponse(results, missing)
+    return results
+
+
+class GeminiValidator:
+    def __init__(self):
+        import google.generativeai as genai
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env")
+        
+        genai.configure(api_key=api_key)
+        # Using gemini-1.5-flash as stable default, can switch to 2.0-flash-exp if available
+        # The user requested '2.5', we will try to use the latest available.
+        self.model = genai.GenerativeModel('gemini-2.5-flash') 
+        # Keeps every prompt within PROMPT_TOKEN_BUDGET, however long the email
+        self.packer = prompt_packer()
+
+    def _generate(self, prompt):
+        with LLM_SECONDS.time(model="gemini-2.5-flash"):
             response = self.model.generate_content(prompt)
-            text = response.text.strip()
-            
-            # Clean md ticks if present
-            if text.startswith("```json"):
-                text = text[7:-3]
-            elif text.startswith("```"):
-                text = text[3:-3]
-                
-            data = json.loads(text)
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            LLM_TOKENS.inc(usage.prompt_token_count or 0, kind="prompt")
+            LLM_TOKENS.inc(usage.candidates_token_count or 0, kind="completion")
+        return _parse_json(response.text)
+
+    def validate_and_extract(self, question, answer):
+        """
+        Uses Gemini to check if this is a valid Q&A pair.
+        Returns JSON metadata if valid, else None.
+        """
+        prompt = build_prompt([{"question": question, "answer": answer}], self.packer)
+        
+        try:
+            data = self._generate(prompt)
             
             if data.get("valid"):
                 return data
             return None
             
         except Exception as e:
+            LLM_ERRORS.inc()
             print(f"Gemini Error: {e}")
             return None
+
+    def validate_batch(self, pairs):
+        """
+        Validates one or more Q&A pairs in one request (packed by PromptPacker).
+        Returns one metadata dict or None (rejected) per pair, in order.
+        Unlike validate_and_extract, errors are raised, so callers can tell a
+        failed call from a rejection and retry it; pairs the reply leaves
+        without a verdict raise IncompleteResponse.
+        """
+        try:
+            data = self._generate(build_prompt(pairs, self.packer))
+            return parse_verdicts(data, len(pairs))
+        except Exception:
+            LLM_ERRORS.inc()
+            raise
@@ -0,0 +1,25 @@
+# Microsoft Graph client: auth, pooled transport and mailbox reads.
+# `outlook_client`, `final_outlook` and `graph_service` re-export from here.
+#
+# Names resolve on first use (PEP 562), so importing one submodule, e.g.
+# backend.graph.messages, does not pay for msal or the token cache.
+import importlib
+
+_EXPORTS = {
+    "OutlookService": "backend.graph.client",
+    "AuthError": "backend.graph.auth",
+    "TokenManager": "backend.graph.auth",
+    "GRAPH_BASE_URL": "backend.graph.transport",
+    "RetryPolicy": "backend.graph.transport",
+    "get_transport": "backend.graph.transport",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'backend.graph' has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
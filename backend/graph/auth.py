@@ -0,0 +1,122 @@
+import os
+import time
+import tempfile
+import threading
+
+
+class AuthError(Exception):
+    """Raised when a token is needed but cannot be obtained without user interaction."""
+
+
+def atomic_write(path, data):
+    """
+    Writes `data` to `path` via a temp file + rename, so a concurrent reader
+    (the UI and the extractor share token_cache.json) never sees a torn file.
+    """
+    directory = os.path.dirname(path) or "."
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class TokenManager:
+    """
+    In-memory access token cache in front of MSAL.
+
+    `get_token()` returns the cached token without touching MSAL, disk or the
+    network while it is valid. A background thread refreshes it
+    `refresh_margin` seconds before expiry (behind a lock, so concurrent
+    callers never refresh twice) and persists the MSAL cache atomically.
+    """
+
+    def __init__(self, app, scopes, cache, token_file, refresh_margin=300):
+        self.app = app
+        self.scopes = scopes
+        self.cache = cache
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+
+        self.access_token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _valid(self, margin=0):
+        return self.access_token and time.time() < self.expires_at - margin
+
+    def set_token(self, result):
+        """Stores an MSAL token response (silent or interactive)."""
+        self.access_token = result['access_token']
+        self.expires_at = time.time() + int(result.get('expires_in', 3600))
+        self.save_cache()
+        self._start_refresher()
+
+    def refresh(self, force=False):
+        """
+        Silently acquires a token (MSAL cache or refresh token).
+        Returns the token, or None if a user sign-in is required.
+        """
+        with self.lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not force and self._valid(self.refresh_margin):
+                return self.access_token
+
+            accounts = self.app.get_accounts()
+            if not accounts:
+                return None
+            result = self.app.acquire_token_silent(self.scopes, account=accounts[0], force_refresh=force)
+            if not result or "access_token" not in result:
+                return None
+            self.set_token(result)
+            return self.access_token
+
+    def get_token(self):
+        """Cached token if still valid, else a silent refresh. Never interactive."""
+        if self._valid():
+            return self.access_token
+        return self.refresh()
+
+    def clear(self):
+        self.access_token = None
+        self.expires_at = 0
+
+    def save_cache(self):
+        """Persists the MSAL cache if it changed."""
+        if self.cache.has_state_changed:
+            atomic_write(self.token_file, self.cache.serialize())
+            self.cache.has_state_changed = False
+
+    def _start_refresher(self):
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            wait = self.expires_at - self.refresh_margin - time.time()
+            if wait > 0 and self._stop.wait(wait):
+                return
+            try:
+                if self.refresh(force=True):
+                    continue
+            except Exception as e:
+                print(f"⚠️  Background token refresh failed: {e}")
+            # Keep serving the current token and retry shortly until it expires
+            if not self._valid() or self._stop.wait(30):
+                return
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,206 @@
+import os
+import msal
+import http.server
+from dotenv import load_dotenv
+from urllib.parse import urlparse, parse_qs
+from backend.graph.auth import TokenManager, AuthError
+from backend.graph.transport import GRAPH_BASE_URL, get_transport
+
+# Load environment variables
+load_dotenv()
+
+class OutlookService:
+    """
+    The one Microsoft Graph client: silent and interactive sign-in, profile,
+    mail fetch (paged and delta), $batch and sendMail. Every call goes
+    through the shared pooled transport and its retry policy.
+    """
+
+    def __init__(self, token_file='token_cache.json'):
+        self.client_id = os.getenv('AZURE_CLIENT_ID')
+        self.client_secret = os.getenv('AZURE_CLIENT_SECRET')
+        self.tenant_id = os.getenv('AZURE_TENANT_ID', 'common') 
+        self.authority = f"https://login.microsoftonline.com/{self.tenant_id}"
+        
+        self.scopes = ["User.Read", "Mail.Read", "Mail.Send", "Mail.ReadWrite"]
+        self.token_file = token_file
+        # Overridable so the app can be pointed at a local Graph stand-in (benchmarks)
+        self.graph_url = os.getenv('GRAPH_BASE_URL', GRAPH_BASE_URL)
+        
+        # Initialize Token Cache
+        self.cache = msal.SerializableTokenCache()
+        if os.path.exists(self.token_file):
+            print(f"📂 Loading token cache from {self.token_file}...")
+            with open(self.token_file, 'r') as f:
+                self.cache.deserialize(f.read())
+        
+        self.app = msal.ConfidentialClientApplication(
+            self.client_id,
+            authority=self.authority,
+            client_credential=self.client_secret,
+            token_cache=self.cache  # Pass the cache to the app
+        )
+        # Keeps the access token in memory and refreshes it before expiry
+        self.tokens = TokenManager(self.app, self.scopes, self.cache, self.token_file)
+
+    @property
+    def access_token(self):
+        return self.tokens.access_token
+
+    @property
+    def headers(self):
+        token = self.tokens.access_token
+        return {'Authorization': 'Bearer ' + token} if token else None
+
+    def get_auth_url(self):
+        """Generates the login URL for the user to click."""
+        flow = self.app.initiate_auth_code_flow(self.scopes, redirect_uri='http://localhost:8000')
+        return flow['auth_uri'], flow
+
+    def wait_for_auth_code(self):
+        """
+        Starts a local server to listen for the auth code. 
+        Blocking call, suitable for a background thread.
+        Returns the query params or None.
+        """
+        auth_data = {}
+        
+        class CallbackHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed_path = urlparse(self.path)
+                auth_data['query_params'] = parse_qs(parsed_path.query)
+                
+                self.send_response(200)
+                self.send_header('Content-type', 'text/html')
+                self.end_headers()
+                self.wfile.write(b"<h1>Authentication Complete!</h1><p>You can close this tab and return to the app.</p><script>window.close()</script>")
+            
+            def log_message(self, format, *args):
+                return # Silence logs
+
+        try:
+            server = http.server.HTTPServer(('localhost', 8000), CallbackHandler)
+            # print("👂 Listening for callback on http://localhost:8000...")
+            server.handle_request()
+            server.server_close()
+            
+            if 'query_params' in auth_data:
+                # Flatten the query params for MSAL
+                return {k: v[0] if isinstance(v, list) else v for k, v in auth_data['query_params'].items()}
+        except Exception as e:
+            print(f"❌ Server Error: {e}")
+            return None
+        return None
+
+    def exchange_code_for_token(self, flow, query_params):
+        """Exchanges the auth parameters for a token."""
+        try:
+            result = self.app.acquire_token_by_auth_code_flow(flow, query_params)
+            if "access_token" in result:
+                self.tokens.set_token(result)
+                print("💾 Token cache saved.")
+                return self.access_token
+        except Exception as e:
+            print(f"❌ Token Exchange Error: {e}")
+        return None
+
+    def save_cache(self):
+        """Saves the token cache to a file (atomically)."""
+        self.tokens.save_cache()
+
+    def get_token(self, interactive=True):
+        # 1. Try Cache (in-memory token, then a silent MSAL refresh)
+        token = self.tokens.get_token()
+        if token:
+            return token
+
+        # Background/request paths must fail fast instead of waiting on a browser
+        if not interactive:
+            return None
+
+        # 2. Interactive Login (Terminal only fallback)
+        print("⚠️  Initiating login...")
+        auth_url, flow = self.get_auth_url()
+        print(f"\n👉  OPEN THIS LINK IN YOUR BROWSER:\n{auth_url}\n")
+        print("👂 Listening for callback on http://localhost:8000...")
+        
+        query_params = self.wait_for_auth_code()
+        
+        if query_params:
+            print("✅ Captured authentication data automatically.")
+        else:
+            # Port 8000 blocked or similar: let the user paste the redirect URL
+            print("❌ Automatic capture failed. Falling back to manual paste.")
+            query_params = self.parse_redirect_url(
+                input("Paste the FULL redirect URL (http://localhost:8000/?code=...) here: ")
+            )
+
+        if query_params and self.exchange_code_for_token(flow, query_params):
+            print("✅ Authentication successful! Token saved.")
+            return self.access_token
+        return None
+
+    @staticmethod
+    def parse_redirect_url(url):
+        """Turns a pasted redirect URL into the query params MSAL expects."""
+        url = url.strip()
+        if url.startswith("localhost"):
+            url = "http://" + url
+        params = parse_qs(urlparse(url).query)
+        return {k: v[0] for k, v in params.items()} or None
+
+    def _require_token(self):
+        if not self.get_token(interactive=False):
+            raise AuthError("Not signed in to Outlook")
+
+    # --- Graph calls ---
+
+    def get_my_profile(self):
+        self._require_token()
+        response = get_transport().get(f"{self.graph_url}/me", headers=self.headers, endpoint="me")
+        response.raise_for_status()
+        return response.json()
+
+    def send_email(self, subject, body, to_email, content_type="Text"):
+        """Sends a simple email. Returns True when Graph accepted it."""
+        self._require_token()
+        email_msg = {
+            "message": {
+                "subject": subject,
+                "body": {"contentType": content_type, "content": body},
+                "toRecipients": [{"emailAddress": {"address": to_email}}],
+            }
+        }
+        # Not idempotent: only a 429 (request never accepted) is retried
+        response = get_transport().post(f"{self.graph_url}/me/sendMail", headers=self.headers,
+                                        json=email_msg, endpoint="send")
+        if response.status_code == 202:
+            print(f"✅ Email sent to {to_email}")
+            return True
+        print(f"❌ Failed to send email: {response.text}")
+        return False
+
+    def iter_message_pages(self, **kwargs):
+        """Streams the mailbox page by page (see backend.graph.messages.iter_email_pages)."""
+        from backend.graph.messages import iter_email_pages
+        return iter_email_pages(self, **kwargs)
+
+    def delta(self, **kwargs):
+        """Pages of messages changed since a delta link (see iter_delta_pages)."""
+        from backend.graph.messages import iter_delta_pages
+        return iter_delta_pages(self, **kwargs)
+
+    def batch(self, requests, idempotent=True):
+        """Runs many Graph calls via $batch (see batch_requests)."""
+        from backend.graph.messages import batch_requests
+        return batch_requests(self, requests, idempotent=idempotent)
+
+
+if __name__ == "__main__":
+    outlook = OutlookService()
+    if outlook.get_token():
+        profile = outlook.get_my_profile()
+        print(f"👋 Hello, {profile.get('displayName')} ({profile.get('mail') or profile.get('userPrincipalName')})")
+        
+        # OPTIONAL: Send a test email (Uncomment to test)
+        # outlook.send_email("Hello from Python", "This is a test email from my script!", "recipient@example.com")
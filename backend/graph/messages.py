@@ -0,0 +1,289 @@
+import json
+import time
+import asyncio
+import httpx
+
+from backend.graph.transport import get_transport, AsyncGraphTransport
+
+# Mailbox reads on top of the shared transport. Every function takes any
+# object with `graph_url`, `headers` and `get_token(interactive=False)`
+# (OutlookService, or a stand-in in the benchmarks).
+
+DEFAULT_SELECT = "sender,subject,receivedDateTime,bodyPreview,body,conversationId,hasAttachments"
+def _first_request(outlook, max_count, page_size, select):
+    """
+    Ensures we are logged in and builds the first page request.
+    Returns (endpoint, params) or (None, None) when login failed.
+    """
+    print(f"🔄 Connecting to Outlook...")
+    
+    # 1. Ensure we are logged in (cached token; never opens a browser here)
+    token = outlook.get_token(interactive=False)
+    if not token:
+        print("❌ Not logged in. Cannot retrieve emails.")
+        return None, None
+
+    # 2. API Setup
+    # Optimize the request: 
+    # - Get one page at a time ($top)
+    # - Sort by newest first ($orderby)
+    # - Only get fields we need ($select) to make it faster
+    top = page_size if max_count is None else min(page_size, max_count)
+    params = {
+        "$top": str(top),
+        "$orderby": "receivedDateTime DESC",
+        "$select": select
+    }
+    return f"{outlook.graph_url}/me/messages", params
+
+def iter_email_pages(outlook, max_count=None, page_size=50, transform=None, select=DEFAULT_SELECT,
+                     rate_limiter=None):
+    """
+    Streams the user's inbox one page at a time (newest first).
+
+    Only the current page is held in memory: the next page is requested when
+    the consumer asks for it, so a slow consumer naturally throttles the
+    download. `transform` (optional) is applied to every message as the page
+    arrives, e.g. `strip_html` or `project(...)`.
+
+    Args:
+        outlook: The authenticated OutlookService instance.
+        max_count: Stop after this many messages (None for the whole mailbox).
+        page_size: Messages requested per Graph call.
+        rate_limiter: Optional TokenBucket acquired before every Graph request.
+    """
+    endpoint, params = _first_request(outlook, max_count, page_size, select)
+    if not endpoint:
+        return
+
+    fetched = 0
+    transport = get_transport()
+    print("📥 Starting download...")
+
+    # 3. Pagination Loop (The "Next Page" Logic)
+    while endpoint and (max_count is None or fetched < max_count):
+        try:
+            response = transport.get(endpoint, headers=outlook.headers, params=params,
+                                     endpoint="messages", rate_limiter=rate_limiter)
+            response.raise_for_status() # Raise error if 401/403/500
+
+            data = response.json()
+        except httpx.HTTPStatusError as e:
+            print(f"❌ HTTP Error: {e}")
+            return
+        except Exception as e:
+            print(f"❌ Unexpected Error: {e}")
+            return
+
+        messages = data.get('value', [])
+        if max_count is not None:
+            messages = messages[:max_count - fetched]
+        fetched += len(messages)
+        print(f"   ...Fetched {len(messages)} emails (Total: {fetched})")
+
+        # 4. Check for the "Next Page" Link
+        # If Microsoft has more emails, they give us a specifically formatted URL
+        # which already contains the params (top, select, etc.)
+        endpoint = data.get('@odata.nextLink')
+        params = None
+
+        if transform:
+            messages = [transform(m) for m in messages]
+        if messages:
+            yield messages
+
+    if max_count is not None and fetched >= max_count:
+        print("🛑 Reached email limit.")
+
+def iter_emails(outlook, max_count=None, page_size=50, transform=None, select=DEFAULT_SELECT,
+                rate_limiter=None):
+    """Same as iter_email_pages, one message at a time."""
+    for page in iter_email_pages(outlook, max_count, page_size, transform, select, rate_limiter):
+        yield from page
+
+async def aiter_email_pages(outlook, max_count=None, page_size=50, transform=None,
+                            select=DEFAULT_SELECT, prefetch=1):
+    """
+    Async variant of iter_email_pages.
+
+    Pages are downloaded by a background task into a queue of `prefetch`
+    pages, so the next page downloads while the current one is processed but
+    the download never runs more than `prefetch` pages ahead of the consumer.
+    """
+    endpoint, params = _first_request(outlook, max_count, page_size, select)
+    if not endpoint:
+        return
+
+    queue = asyncio.Queue(maxsize=prefetch)
+    done = object()
+
+    async def producer(endpoint, params):
+        fetched = 0
+        try:
+            transport = AsyncGraphTransport()
+            try:
+                while endpoint and (max_count is None or fetched < max_count):
+                    response = await transport.get(endpoint, headers=outlook.headers, params=params,
+                                                   endpoint="messages")
+                    response.raise_for_status()
+
+                    data = response.json()
+                    messages = data.get('value', [])
+                    if max_count is not None:
+                        messages = messages[:max_count - fetched]
+                    fetched += len(messages)
+
+                    endpoint = data.get('@odata.nextLink')
+                    params = None
+
+                    if transform:
+                        messages = [transform(m) for m in messages]
+                    if messages:
+                        await queue.put(messages)
+            finally:
+                await transport.aclose()
+        except Exception as e:
+            print(f"❌ Download Error: {e}")
+        # Not in a `finally`: once cancelled (the consumer stopped early) the
+        # queue may be full and nobody would ever take the sentinel
+        await queue.put(done)
+
+    task = asyncio.create_task(producer(endpoint, params))
+    try:
+        while True:
+            page = await queue.get()
+            if page is done:
+                break
+            yield page
+    finally:
+        task.cancel()
+        # Wait for the producer to wind down (closing its transport); gather
+        # still propagates a cancellation of the consumer itself
+        await asyncio.gather(task, return_exceptions=True)
+
+async def aiter_emails(outlook, max_count=None, page_size=50, transform=None,
+                       select=DEFAULT_SELECT, prefetch=1):
+    """Same as aiter_email_pages, one message at a time."""
+    async for page in aiter_email_pages(outlook, max_count, page_size, transform, select, prefetch):
+        for message in page:
+            yield message
+
+# --- Transforms (for the `transform` argument) ---
+
+def strip_html(message):
+    """Replaces the HTML body with its plain text so large markup is dropped early."""
+    from backend.processing import ThreadProcessor
+    body = message.get('body') or {}
+    if body.get('contentType', '').lower() == 'html':
+        message['body'] = {
+            "contentType": "text",
+            "content": ThreadProcessor().clean_html(body.get('content', ''))
+        }
+    return message
+
+def project(*fields):
+    """Returns a transform keeping only the given top-level fields."""
+    def _project(message):
+        return {k: message[k] for k in fields if k in message}
+    return _project
+
+def get_all_emails(outlook, max_count=50):
+    """
+    Fetches emails from the user's inbox.
+    
+    Args:
+        outlook: The authenticated OutlookService instance.
+        max_count: Maximum number of emails to retrieve (use 9999 for 'all')
+
+    Holds every message in memory; prefer iter_email_pages for large mailboxes.
+    """
+    return list(iter_emails(outlook, max_count=max_count))
+
+# --- Delta sync ---
+
+def iter_delta_pages(outlook, folder="inbox", delta_link=None, select=DEFAULT_SELECT,
+                     page_size=50, state=None):
+    """
+    Yields pages of messages added or changed in `folder` since `delta_link`
+    (everything on the first sync). Removed messages come back as
+    {"id": ..., "@removed": {...}}.
+
+    When the sync completes, the new delta link is stored in
+    `state["delta_link"]`; pass it back next time to get only the changes.
+    """
+    if not outlook.get_token(interactive=False):
+        print("❌ Not logged in. Cannot sync emails.")
+        return
+
+    transport = get_transport()
+    if delta_link:
+        endpoint, params = delta_link, None
+    else:
+        endpoint = f"{outlook.graph_url}/me/mailFolders/{folder}/messages/delta"
+        params = {"$select": select}
+    headers = dict(outlook.headers, Prefer=f"odata.maxpagesize={page_size}")
+
+    while endpoint:
+        response = transport.get(endpoint, headers=headers, params=params, endpoint="delta")
+        response.raise_for_status()
+        data = response.json()
+        params = None
+
+        if data.get('value'):
+            yield data['value']
+
+        endpoint = data.get('@odata.nextLink')
+        if not endpoint and state is not None:
+            state['delta_link'] = data.get('@odata.deltaLink')
+
+# --- JSON batching ---
+
+BATCH_LIMIT = 20  # Graph accepts at most 20 requests per $batch
+
+def batch_requests(outlook, requests, idempotent=True):
+    """
+    Sends many Graph calls through `$batch`, 20 per HTTP request.
+
+    `requests` are dicts like {"method": "GET", "url": "/me/messages/{id}"}
+    (URLs relative to the API version). Sub-requests answered with 429 (or
+    5xx when `idempotent`) are retried with the shared RetryPolicy.
+    Returns one {"status", "headers", "body"} dict per request, in order.
+    """
+    transport = get_transport()
+    policy = transport.policy
+    results = [None] * len(requests)
+
+    for start in range(0, len(requests), BATCH_LIMIT):
+        pending = list(range(start, min(start + BATCH_LIMIT, len(requests))))
+        attempt = 0
+        while pending:
+            payload = {"requests": [dict(requests[i], id=str(i)) for i in pending]}
+            for item in payload['requests']:
+                if item.get("body") is not None:
+                    item.setdefault("headers", {"Content-Type": "application/json"})
+            response = transport.post(f"{outlook.graph_url}/$batch", headers=outlook.headers,
+                                      json=payload, endpoint="batch", idempotent=idempotent)
+            response.raise_for_status()
+
+            retry, wait = [], 0
+            for item in response.json().get('responses', []):
+                index = int(item['id'])
+                status = item.get('status', 0)
+                sub = httpx.Response(status, headers=item.get('headers') or {})
+                if policy.should_retry(sub, attempt, idempotent):
+                    retry.append(index)
+                    wait = max(wait, policy.delay(sub, attempt))
+                else:
+                    results[index] = {
+                        "status": status,
+                        "headers": item.get('headers') or {},
+                        "body": item.get('body'),
+                    }
+
+            pending = retry
+            if pending:
+                print(f"   ...{len(pending)} batched requests throttled, retrying in {wait}s")
+                time.sleep(wait)
+                attempt += 1
+
+    return results
@@ -0,0 +1,194 @@
+import os
+import time
+import hashlib
+import asyncio
+import threading
+import httpx
+
+from backend.metrics import GRAPH_SECONDS, GRAPH_RETRIES
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
+# One connection pool per process, shared by every OutlookService and helper
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+TIMEOUT = httpx.Timeout(30, connect=10)
+
+
+class RetryPolicy:
+    """
+    The single retry policy for Graph calls.
+
+    429s are always retried: Graph did not accept the request, so even a
+    POST like sendMail is safe to resend. 5xx responses and connection errors
+    are retried only for idempotent requests (GET, or callers that pass
+    idempotent=True), so a message is never sent twice.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_retries=5, max_delay=60):
+        self.max_retries = max_retries
+        self.max_delay = max_delay
+
+    def should_retry(self, response, attempt, idempotent):
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return idempotent
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in self.RETRY_STATUSES
+
+    def delay(self, response, attempt):
+        """Honors Retry-After, else exponential backoff."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), self.max_delay)
+        return min(2 ** attempt, self.max_delay)
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class GraphTransport:
+    """Pooled, retrying HTTP transport for Microsoft Graph."""
+
+    def __init__(self, policy=DEFAULT_POLICY):
+        self.policy = policy
+        self.client = httpx.Client(timeout=TIMEOUT, limits=POOL_LIMITS)
+
+    def request(self, method, url, headers=None, endpoint="other", idempotent=None,
+                rate_limiter=None, **kwargs):
+        """
+        Sends a request with retries. Returns the final httpx.Response (callers
+        decide how to treat error statuses); connection errors are re-raised
+        once retries are exhausted.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "DELETE", "PUT")
+
+        attempt = 0
+        while True:
+            if rate_limiter:
+                rate_limiter.acquire()
+            response, error = None, None
+            try:
+                with GRAPH_SECONDS.time(endpoint=endpoint):
+                    response = self.client.request(method, url, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+
+            if not self.policy.should_retry(response, attempt, idempotent):
+                if error:
+                    raise error
+                return response
+
+            GRAPH_RETRIES.inc(status=response.status_code if response is not None else "error")
+            delay = self.policy.delay(response, attempt)
+            if response is not None:
+                print(f"   ...Graph returned {response.status_code}, retrying in {delay}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def download(self, url, path, headers=None, endpoint="download", chunk_size=1 << 16,
+                 max_bytes=None):
+        """
+        Streams a response body to `path` chunk by chunk (never holding it in
+        memory) and returns (size, sha256 hex digest). Retries like a GET,
+        restarting the file on each attempt. Raises ValueError if the body
+        exceeds `max_bytes`.
+        """
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                with GRAPH_SECONDS.time(endpoint=endpoint):
+                    with self.client.stream("GET", url, headers=headers) as response:
+                        if response.status_code == 200:
+                            digest = hashlib.sha256()
+                            size = 0
+                            with open(path, "wb") as f:
+                                for chunk in response.iter_bytes(chunk_size):
+                                    size += len(chunk)
+                                    if max_bytes and size > max_bytes:
+                                        raise ValueError(f"Download larger than {max_bytes} bytes")
+                                    digest.update(chunk)
+                                    f.write(chunk)
+                            return size, digest.hexdigest()
+            except httpx.TransportError as e:
+                # Also covers a connection dropped mid-body: start over
+                response, error = None, e
+
+            if not self.policy.should_retry(response, attempt, True):
+                if error:
+                    raise error
+                response.raise_for_status()
+                raise httpx.HTTPStatusError(f"Unexpected status {response.status_code}",
+                                            request=response.request, response=response)
+
+            GRAPH_RETRIES.inc(status=response.status_code if response is not None else "error")
+            time.sleep(self.policy.delay(response, attempt))
+            attempt += 1
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncGraphTransport:
+    """Async twin of GraphTransport (same policy); create one per event loop."""
+
+    def __init__(self, policy=DEFAULT_POLICY):
+        self.policy = policy
+        self.client = httpx.AsyncClient(timeout=TIMEOUT, limits=POOL_LIMITS)
+
+    async def request(self, method, url, headers=None, endpoint="other", idempotent=None, **kwargs):
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD", "DELETE", "PUT")
+
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                with GRAPH_SECONDS.time(endpoint=endpoint):
+                    response = await self.client.request(method, url, headers=headers, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+
+            if not self.policy.should_retry(response, attempt, idempotent):
+                if error:
+                    raise error
+                return response
+
+            GRAPH_RETRIES.inc(status=response.status_code if response is not None else "error")
+            await asyncio.sleep(self.policy.delay(response, attempt))
+            attempt += 1
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_transport = None
+_transport_pid = None
+_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    The process-wide transport. Rebuilt after a fork so worker processes
+    never share sockets with their parent.
+    """
+    global _transport, _transport_pid
+    with _lock:
+        if _transport is None or _transport_pid != os.getpid():
+            _transport = GraphTransport()
+            _transport_pid = os.getpid()
+        return _transport
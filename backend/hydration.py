@@ -0,0 +1,121 @@
+import time
+from urllib.parse import quote
+
+from backend.metrics import ITEMS, STAGE_SECONDS, log_event
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hydrated_conversations (
+    conversation_id TEXT PRIMARY KEY,
+    added INTEGER,
+    hydrated REAL
+);
+"""
+
+# Messages fetched per conversation; a question older than this many
+# messages in its own thread is not worth another round trip
+MAX_PER_CONVERSATION = 50
+
+
+def is_incomplete(thread, my_email_address):
+    """
+    True when the oldest message we hold is our own reply, i.e. the customer
+    message it answers is older than the fetch window.
+    """
+    me = (my_email_address or "").lower()
+    return bool(me) and bool(thread) and thread['first_sender'] == me
+
+
+class ConversationHydrator:
+    """
+    Completes conversations cut off by the fetch window.
+
+    The extractor only fetches the newest messages, so a thread whose
+    question arrived earlier shows up as just our reply and never yields a
+    Q&A pair. For such threads the whole conversation is fetched by
+    conversationId filter, up to 20 conversations per $batch call, and
+    folded into the store and thread index. Every conversation is hydrated
+    at most once; the `hydrated_conversations` table remembers it even when
+    the fetch found nothing new.
+    """
+
+    def __init__(self, store, thread_index, select=None):
+        from backend.graph.messages import DEFAULT_SELECT
+        self.store = store
+        self.thread_index = thread_index
+        self.conn = store.conn
+        self.lock = store.lock
+        self.select = select or DEFAULT_SELECT
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def _already_hydrated(self, conversation_ids):
+        placeholders = ",".join("?" * len(conversation_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT conversation_id FROM hydrated_conversations WHERE conversation_id IN ({placeholders})",
+                list(conversation_ids)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def candidates(self, conversation_ids, my_email_address):
+        """The conversations in `conversation_ids` that are incomplete and not hydrated yet."""
+        if not conversation_ids:
+            return []
+        done = self._already_hydrated(conversation_ids)
+        return [
+            cid for cid in conversation_ids
+            if cid not in done and is_incomplete(self.thread_index.get_thread(cid), my_email_address)
+        ]
+
+    def _request(self, conversation_id):
+        # OData string literal: single quotes are escaped by doubling them
+        literal = conversation_id.replace("'", "''")
+        odata_filter = quote(f"conversationId eq '{literal}'", safe="")
+        return {
+            "method": "GET",
+            "url": (f"/me/messages?$filter={odata_filter}"
+                    f"&$select={self.select}&$top={MAX_PER_CONVERSATION}"),
+        }
+
+    def hydrate(self, outlook, conversation_ids, my_email_address):
+        """
+        Fetches the missing messages of the incomplete conversations among
+        `conversation_ids`. Returns the number of messages added.
+        """
+        from backend.graph.messages import batch_requests
+
+        todo = self.candidates(conversation_ids, my_email_address)
+        if not todo:
+            return 0
+
+        with STAGE_SECONDS.time(stage="hydrate"):
+            try:
+                results = batch_requests(outlook, [self._request(cid) for cid in todo])
+            except Exception as e:
+                # Not recorded as hydrated, so the next run tries again
+                print(f"❌ Conversation hydration failed: {e}")
+                log_event("hydrate_failed", conversations=len(todo), error=str(e))
+                return 0
+
+            added, done = 0, []
+            for cid, result in zip(todo, results):
+                if not result or result['status'] != 200:
+                    continue
+                messages = [m for m in (result.get('body') or {}).get('value', []) if m.get('id')]
+                known = set(self.thread_index.get_thread(cid)['message_ids'])
+                new = [m for m in messages if m['id'] not in known]
+                if new:
+                    self.store.add_messages(new)
+                    self.thread_index.update(new, my_email_address)
+                added += len(new)
+                done.append((cid, len(new), time.time()))
+
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO hydrated_conversations VALUES (?, ?, ?)", done)
+
+        ITEMS.inc(len(done), stage="hydrate", outcome="conversations")
+        ITEMS.inc(added, stage="hydrate", outcome="messages")
+        log_event("hydrate_done", conversations=len(done), messages=added)
+        if added:
+            print(f"🧩 Completed {len(done)} cut-off conversations ({added} earlier messages).")
+        return added
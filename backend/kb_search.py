@@ -0,0 +1,59 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Knowledge-base search as the Search tab runs it. Queries that differ only
+# in case or spacing share one cached answer for CACHE_TTL seconds; the text
+# that gets embedded is the query as typed. Failed lookups raise and are
+# never cached, so a transient Pinecone error does not turn into "no results".
+
+CACHE_TTL = 600          # seconds a knowledge-base answer stays cached
+CACHE_SIZE = 1024
+
+
+def normalize_query(query):
+    """Collapses case and whitespace so equivalent queries share a cache entry."""
+    return " ".join((query or "").lower().split())
+
+
+class KnowledgeBaseSearch:
+    """Cached FAQ search over the vector index (thread-safe: Streamlit sessions share it)."""
+
+    def __init__(self, index=None, ttl=CACHE_TTL, size=CACHE_SIZE):
+        self.index = index
+        self.ttl = ttl
+        self.size = size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _index(self):
+        if self.index is not None:
+            return self.index
+        from backend.clients import get_pinecone
+        return get_pinecone()
+
+    def search(self, query, top_k=3):
+        """[{"id", "score", "metadata"}] best first. Raises when the lookup fails."""
+        key = (normalize_query(query), top_k)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self.cache.move_to_end(key)
+                return entry[1]
+
+        index = self._index()
+        matches = index.search_vector(index.embed_queries([query.strip()])[0], top_k=top_k)
+        results = [
+            {"id": m['id'], "score": m['score'], "metadata": dict(m['metadata'] or {})}
+            for m in matches or []
+        ]
+        with self.lock:
+            self.cache[key] = (time.monotonic(), results)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return results
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
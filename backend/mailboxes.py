@@ -0,0 +1,185 @@
+import os
+import json
+import threading
+
+from backend.rate_limit import TokenBucket, SharedTokenBucket
+
+REGISTRY_FILE = "data/mailboxes.json"
+MAILBOX_ROOT = "data/mailboxes"
+DEFAULT_NAME = "default"
+
+
+class Mailbox:
+    """
+    One support mailbox with its own token cache, local state and rate limits.
+
+    The default mailbox keeps the original single-account layout
+    (token_cache.json + data/) and reuses the process-wide clients, so the
+    Streamlit app and a plain `python faq_extractor.py` behave as before.
+    """
+
+    def __init__(self, name, token_file=None, data_dir=None, llm_per_minute=0,
+                 graph_per_second=0, max_count=50, llm_budget=None, time_budget=None,
+                 token_budget=None):
+        self.name = name
+        self.is_default = name == DEFAULT_NAME
+        if self.is_default:
+            self.token_file = token_file or "token_cache.json"
+            self.data_dir = data_dir or "data"
+        else:
+            self.data_dir = data_dir or os.path.join(MAILBOX_ROOT, name)
+            self.token_file = token_file or os.path.join(self.data_dir, "token_cache.json")
+        self.max_count = max_count
+        self.llm_per_minute = llm_per_minute
+        self.graph_per_second = graph_per_second
+        # Per-run extraction budgets (None: EXTRACT_LLM_BUDGET / EXTRACT_TIME_BUDGET / EXTRACT_TOKEN_BUDGET)
+        self.llm_budget = llm_budget
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+
+        # Per-tenant limits: one mailbox cannot use up the shared Gemini quota.
+        # In MailboxPool workers the buckets are shared by every process (see share_limiters)
+        shared = _shared_limiters.get(name)
+        if shared:
+            self.llm_limiter, self.graph_limiter = shared
+        else:
+            self.llm_limiter, self.graph_limiter = _limiters(TokenBucket, llm_per_minute, graph_per_second)
+
+        self._clients = {}
+        self._lock = threading.RLock()
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "token_file": self.token_file,
+            "data_dir": self.data_dir,
+            "llm_per_minute": self.llm_per_minute,
+            "graph_per_second": self.graph_per_second,
+            "max_count": self.max_count,
+            "llm_budget": self.llm_budget,
+            "time_budget": self.time_budget,
+            "token_budget": self.token_budget,
+        }
+
+    def _client(self, key, factory):
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = factory()
+            return self._clients[key]
+
+    def outlook(self):
+        if self.is_default:
+            from backend.clients import get_outlook
+            return get_outlook()
+        from backend.graph import OutlookService
+        return self._client("outlook", lambda: OutlookService(token_file=self.token_file))
+
+    def store(self):
+        if self.is_default:
+            from backend.clients import get_message_store
+            return get_message_store()
+        from backend.message_store import MessageStore
+        return self._client("store", lambda: MessageStore(os.path.join(self.data_dir, "mailbox.db")))
+
+    def thread_index(self):
+        if self.is_default:
+            from backend.clients import get_thread_index
+            return get_thread_index()
+        from backend.thread_index import ThreadIndex
+        return self._client("threads", lambda: ThreadIndex(self.store()))
+
+    def scheduler(self):
+        from backend import scheduler
+        return self._client("scheduler", lambda: scheduler.ExtractionScheduler(
+            self.store(),
+            llm_budget=scheduler.LLM_BUDGET if self.llm_budget is None else self.llm_budget,
+            time_budget=scheduler.TIME_BUDGET if self.time_budget is None else self.time_budget,
+            token_budget=scheduler.TOKEN_BUDGET if self.token_budget is None else self.token_budget,
+        ))
+
+    def ledger(self):
+        from backend.checkpoints import RunLedger
+        return self._client("ledger", lambda: RunLedger(self.store()))
+
+    def hydrator(self):
+        from backend.hydration import ConversationHydrator
+        return self._client("hydrator", lambda: ConversationHydrator(self.store(), self.thread_index()))
+
+    def changes(self):
+        if self.is_default:
+            from backend.clients import get_change_feed
+            return get_change_feed()
+        from backend.changes import ChangeFeed
+        return self._client("changes", lambda: ChangeFeed(os.path.join(self.data_dir, "changes.db")))
+
+    def attachments(self):
+        from backend.attachments import AttachmentStore
+        return self._client("attachments", lambda: AttachmentStore(
+            self.store(), root=os.path.join(self.data_dir, "attachments")
+        ))
+
+    def suggestions(self):
+        from backend.clients import get_pinecone
+        from backend.suggestions import SuggestionEngine
+        return self._client("suggestions", lambda: SuggestionEngine(
+            self.store(), get_pinecone(), outlook=self.outlook(), threads=self.thread_index(),
+            create_drafts=bool(os.getenv("AUTO_REPLY_DRAFTS"))
+        ))
+
+    def state(self):
+        from backend.state import StateManager
+        return StateManager(data_dir=self.data_dir, mailbox=self.name)
+
+
+_mailboxes = {}
+_registry_lock = threading.Lock()
+_shared_limiters = {}
+
+
+def _limiters(bucket, llm_per_minute=0, graph_per_second=0, **_):
+    return (bucket(llm_per_minute / 60, capacity=max(1, llm_per_minute // 6)),
+            bucket(graph_per_second, capacity=max(1, graph_per_second)))
+
+
+def shared_limiters(entries):
+    """Per-mailbox (llm, graph) buckets in shared memory, built in the parent process."""
+    return {e['name']: _limiters(SharedTokenBucket, **e) for e in entries}
+
+
+def share_limiters(limiters):
+    """Pool initializer: mailboxes in this worker use the parent's shared buckets."""
+    _shared_limiters.update(limiters)
+
+
+def get_mailbox(config):
+    """
+    Returns the (per-process cached) Mailbox for a registry entry, so clients
+    and token caches survive between scheduled runs in a worker.
+    """
+    if isinstance(config, str):
+        config = {"name": config}
+    with _registry_lock:
+        mailbox = _mailboxes.get(config['name'])
+        if mailbox is None or mailbox.to_dict() != Mailbox(**config).to_dict():
+            mailbox = _mailboxes[config['name']] = Mailbox(**config)
+        return mailbox
+
+
+def default_mailbox():
+    return get_mailbox(DEFAULT_NAME)
+
+
+def load_registry(path=REGISTRY_FILE):
+    """
+    Reads the mailbox registry: a JSON list of entries such as
+    {"name": "support-eu", "llm_per_minute": 30, "graph_per_second": 4}.
+    Falls back to the single default mailbox when no registry exists.
+    """
+    if not os.path.exists(path):
+        return [{"name": DEFAULT_NAME}]
+    with open(path, "r") as f:
+        entries = json.load(f)
+    names = [e['name'] for e in entries]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Duplicate mailbox names in {path}")
+    return entries
@@ -0,0 +1,344 @@
+import os
+import sqlite3
+import threading
+
+from backend import body_store
+from backend.search_index import SearchIndex, index_text
+
+DB_FILE = "data/mailbox.db"
+
+# Columns the inbox view is allowed to sort on (maps UI name -> SQL column)
+SORT_COLUMNS = {
+    "received": "received",
+    "sender": "sender_name",
+    "subject": "subject",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    sender_name TEXT,
+    sender_address TEXT,
+    subject TEXT,
+    received TEXT,
+    preview TEXT,
+    body TEXT,
+    body_type TEXT,
+    body_blob BLOB,
+    body_codec TEXT,
+    body_dict INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_messages_received ON messages(received);
+CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_address, received);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, received);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+
+class MessageStore:
+    """
+    Local SQLite index of fetched messages.
+
+    The UI pages, sorts and filters through SQL so only one page of rows
+    (without bodies) is ever materialised; a body is loaded on demand when a
+    single message is opened.
+
+    Bodies are stored compressed against a dictionary trained on this
+    mailbox (see backend.body_store); the first dictionary is trained once
+    MIN_TRAIN_SAMPLES bodies are stored, and a new one every RETRAIN_EVERY.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            columns = {r[1] for r in self.conn.execute("PRAGMA table_info(messages)")}
+            # Stores created before body compression keep their text in `body`
+            for column, kind in (("body_blob", "BLOB"), ("body_codec", "TEXT"), ("body_dict", "INTEGER")):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {kind}")
+        self.bodies = body_store.BodyCodec(self.conn, self.lock)
+        self.search_index = SearchIndex(self.conn, self.lock)
+        if self.search_index.is_empty() and self.count_messages():
+            self.rebuild_search_index()
+
+    def _to_row(self, email):
+        sender = email.get('sender', {}).get('emailAddress', {})
+        body = email.get('body', {})
+        blob, codec, dict_id = self.bodies.encode(body.get('content', ''))
+        return (
+            email.get('id'),
+            email.get('conversationId'),
+            sender.get('name', 'Unknown'),
+            sender.get('address', '').lower(),
+            email.get('subject') or '(No Subject)',
+            email.get('receivedDateTime', ''),
+            email.get('bodyPreview', ''),
+            body.get('contentType', 'html'),
+            blob,
+            codec,
+            dict_id,
+        )
+
+    def add_messages(self, emails):
+        """
+        Inserts or refreshes messages (Graph API dicts).
+        Returns the number of messages written.
+        """
+        emails = [e for e in emails if e.get('id')]
+        rows = [self._to_row(e) for e in emails]
+        if not rows:
+            return 0
+        # Cleaned text for the full-text index, built outside the lock like the bodies
+        texts = {e['id']: self._index_entry(e) for e in emails}
+
+        with self.lock, self.conn:
+            # Refetched messages are refreshed but don't count towards retraining
+            placeholders = ",".join("?" * len(texts))
+            known = self.conn.execute(
+                f"SELECT COUNT(*) FROM messages WHERE id IN ({placeholders})", list(texts)
+            ).fetchone()[0]
+            self.conn.executemany(
+                """
+                INSERT INTO messages (id, conversation_id, sender_name, sender_address,
+                                      subject, received, preview, body_type,
+                                      body_blob, body_codec, body_dict)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    conversation_id = excluded.conversation_id,
+                    sender_name = excluded.sender_name,
+                    sender_address = excluded.sender_address,
+                    subject = excluded.subject,
+                    received = excluded.received,
+                    preview = excluded.preview,
+                    body = NULL,
+                    body_type = excluded.body_type,
+                    body_blob = excluded.body_blob,
+                    body_codec = excluded.body_codec,
+                    body_dict = excluded.body_dict
+                """,
+                rows,
+            )
+            rowids = self.conn.execute(
+                f"SELECT rowid, id FROM messages WHERE id IN ({placeholders})", list(texts)
+            ).fetchall()
+            self.search_index.write([(rowid, *texts[mid]) for rowid, mid in rowids])
+            self._bump_version()
+            since = self._bump_meta("bodies_since_train", len(texts) - known)
+        self._maybe_train(since)
+        return len(rows)
+
+    def _bump_meta(self, key, amount):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value", (key, amount)
+        )
+        return self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    # --- Full-text search ---
+
+    @staticmethod
+    def _index_entry(email):
+        sender = email.get('sender', {}).get('emailAddress', {})
+        body = email.get('body', {})
+        return (
+            email.get('subject') or '',
+            f"{sender.get('name', '')} {sender.get('address', '')}",
+            index_text(body.get('content', ''), body.get('contentType', 'html')),
+        )
+
+    def rebuild_search_index(self, batch=1000):
+        """Indexes every stored message (stores created before the index existed)."""
+        print("🔎 Building the mailbox search index...")
+        done, last = 0, 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, * FROM messages WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, batch)
+                ).fetchall()
+            if not rows:
+                break
+            entries = [(r['rowid'],) + self._index_entry(self._to_graph(r)) for r in rows]
+            with self.lock, self.conn:
+                self.search_index.write(entries)
+            done += len(rows)
+            last = rows[-1]['rowid']
+        print(f"🔎 Indexed {done} messages.")
+        return done
+
+    def search_messages(self, query, offset=0, limit=25):
+        """Ranked full-text matches (see backend.search_index.to_fts_query for the syntax)."""
+        return self.search_index.search(query, offset, limit)
+
+    def count_search(self, query):
+        return self.search_index.count(query)
+
+    # --- Body compression ---
+
+    def _body(self, row):
+        if row['body_codec'] is None:
+            return row['body']
+        return self.bodies.decode(row['body_blob'], row['body_codec'], row['body_dict'])
+
+    def _maybe_train(self, since):
+        first = self.bodies.current is None
+        if first:
+            # Count the whole store, so rows from before compression count too
+            if self.count_messages() < body_store.MIN_TRAIN_SAMPLES:
+                return
+        elif since < body_store.RETRAIN_EVERY:
+            return
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT body, body_blob, body_codec, body_dict FROM messages ORDER BY received DESC LIMIT ?",
+                (body_store.TRAIN_SAMPLES,)
+            ).fetchall()
+        if self.bodies.train([self._body(r) for r in rows]) is None:
+            return
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE meta SET value = 0 WHERE key = 'bodies_since_train'")
+        if first:
+            self.recompress()
+
+    def recompress(self, batch=500):
+        """
+        Compresses bodies stored raw (before the first dictionary existed, or
+        by an older version of the store). Returns the number of rows rewritten.
+        """
+        if self.bodies.current is None:
+            return 0
+        done, last = 0, 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, body, body_blob, body_codec, body_dict FROM messages "
+                    "WHERE rowid > ? AND (body_codec IS NULL OR body_codec = 'raw') ORDER BY rowid LIMIT ?",
+                    (last, batch)
+                ).fetchall()
+            if not rows:
+                return done
+            updates = [self.bodies.encode(self._body(r)) + (r['rowid'],) for r in rows]
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "UPDATE messages SET body = NULL, body_blob = ?, body_codec = ?, body_dict = ? WHERE rowid = ?",
+                    updates
+                )
+            done += len(rows)
+            last = rows[-1]['rowid']
+
+    def storage_stats(self):
+        """Stored vs. raw body bytes (decodes every body: for reports, not hot paths)."""
+        stored = raw = count = 0
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT body, body_blob, body_codec, body_dict FROM messages"
+            ).fetchall()
+        for row in rows:
+            text = self._body(row) or ""
+            raw += len(text.encode("utf-8"))
+            stored += len(row['body_blob'] or b"") if row['body_codec'] else len((row['body'] or "").encode("utf-8"))
+            count += 1
+        return {"messages": count, "raw_bytes": raw, "stored_bytes": stored,
+                "ratio": round(raw / stored, 2) if stored else 0.0}
+
+    def _bump_version(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    @property
+    def version(self):
+        """Increases on every write; use it as a cache key for derived data."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _where(sender=None, subject=None):
+        clauses, params = [], []
+        if sender:
+            clauses.append("(sender_address LIKE ? OR sender_name LIKE ?)")
+            params += [f"%{sender}%", f"%{sender}%"]
+        if subject:
+            clauses.append("subject LIKE ?")
+            params.append(f"%{subject}%")
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def count_messages(self, sender=None, subject=None):
+        where, params = self._where(sender, subject)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM messages{where}", params).fetchone()[0]
+
+    def list_messages(self, offset=0, limit=50, sort_by="received", descending=True,
+                      sender=None, subject=None):
+        """
+        Returns one page of message summaries (no bodies).
+        """
+        column = SORT_COLUMNS.get(sort_by)
+        if not column:
+            raise ValueError(f"Unsupported sort column: {sort_by}")
+        direction = "DESC" if descending else "ASC"
+
+        where, params = self._where(sender, subject)
+        sql = (
+            "SELECT id, conversation_id, sender_name, sender_address, subject, received, preview "
+            f"FROM messages{where} ORDER BY {column} {direction}, id {direction} LIMIT ? OFFSET ?"
+        )
+        with self.lock:
+            rows = self.conn.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_message(self, message_id):
+        """Returns the full stored message (including raw body) or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if not row:
+            return None
+        message = {k: row[k] for k in row.keys() if k not in ("body_blob", "body_codec", "body_dict")}
+        message['body'] = self._body(row)
+        return message
+
+    def _to_graph(self, row):
+        return {
+            "id": row['id'],
+            "conversationId": row['conversation_id'],
+            "sender": {"emailAddress": {"name": row['sender_name'], "address": row['sender_address']}},
+            "subject": row['subject'],
+            "receivedDateTime": row['received'],
+            "bodyPreview": row['preview'],
+            "body": {"contentType": row['body_type'], "content": self._body(row)},
+        }
+
+    def get_messages(self, message_ids):
+        """
+        Returns the stored messages in the order of `message_ids`, shaped like
+        Graph API dicts so they can be fed to the same processing code.
+        """
+        if not message_ids:
+            return []
+        placeholders = ",".join("?" * len(message_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM messages WHERE id IN ({placeholders})", list(message_ids)
+            ).fetchall()
+        by_id = {r['id']: self._to_graph(r) for r in rows}
+        return [by_id[mid] for mid in message_ids if mid in by_id]
+
+    def close(self):
+        self.conn.close()
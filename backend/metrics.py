@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import contextlib
+from collections import Counter as _StackCounter
+
+# Lightweight in-process metrics (Prometheus text format), structured JSON
+# logs and an opt-in sampling profiler. Standard library only, so it can be
+# imported from every hot path without pulling in extra dependencies.
+
+PREFIX = "emailfetch_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(_key(labels), 0)
+
+    def render(self):
+        return [f"{PREFIX}{self.name}{_format_labels(k)} {v}" for k, v in sorted(self.values.items())]
+
+    def snapshot(self):
+        return {_format_labels(k) or "": v for k, v in self.values.items()}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _key(labels)
+        with _lock:
+            series = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = []
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{PREFIX}{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{PREFIX}{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{PREFIX}{self.name}_sum{_format_labels(key)} {series[-2]:.6f}")
+            lines.append(f"{PREFIX}{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+    def snapshot(self):
+        return {
+            _format_labels(k) or "": {"count": s[-1], "sum": round(s[-2], 6)}
+            for k, s in self.values.items()
+        }
+
+
+def _register(cls, name, help_text, **kwargs):
+    with _lock:
+        if name not in _metrics:
+            _metrics[name] = cls(name, help_text, **kwargs)
+        return _metrics[name]
+
+
+def counter(name, help_text=""):
+    return _register(Counter, name, help_text)
+
+
+def histogram(name, help_text="", buckets=LATENCY_BUCKETS):
+    return _register(Histogram, name, help_text, buckets=buckets)
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        for name, metric in sorted(_metrics.items()):
+            lines.append(f"# HELP {PREFIX}{name} {metric.help}")
+            lines.append(f"# TYPE {PREFIX}{name} {metric.kind}")
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """All metrics as a JSON-serialisable dict."""
+    with _lock:
+        return {name: metric.snapshot() for name, metric in _metrics.items()}
+
+
+# --- Metric definitions shared across modules ---
+
+STAGE_SECONDS = histogram("stage_seconds", "Time spent per extraction stage")
+JOB_SECONDS = histogram("job_seconds", "Duration of a full extraction job", buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+ITEMS = counter("items_total", "Items flowing through the extraction pipeline, by outcome")
+GRAPH_SECONDS = histogram("graph_request_seconds", "Microsoft Graph request latency")
+GRAPH_RETRIES = counter("graph_retries_total", "Graph requests retried after a 429/5xx")
+LLM_SECONDS = histogram("llm_request_seconds", "Gemini request latency")
+LLM_ERRORS = counter("llm_errors_total", "Gemini requests that raised or returned unparsable output")
+LLM_TOKENS = counter("llm_tokens_total", "Gemini token usage")
+VECTOR_SECONDS = histogram("vector_request_seconds", "Pinecone request latency")
+VECTOR_ERRORS = counter("vector_errors_total", "Failed Pinecone requests")
+
+
+# --- Structured logs ---
+
+JSON_LOGS = os.getenv("EMAILFETCH_JSON_LOGS", "").lower() in ("1", "true", "yes")
+LOG_FILE = os.getenv("EMAILFETCH_LOG_FILE")
+
+
+def log_event(event, **fields):
+    """
+    Emits one JSON log line when EMAILFETCH_JSON_LOGS is set
+    (to EMAILFETCH_LOG_FILE if given, else stderr).
+    """
+    if not JSON_LOGS:
+        return
+    record = {"ts": round(time.time(), 3), "event": event}
+    record.update(fields)
+    line = json.dumps(record, default=str)
+    if LOG_FILE:
+        with _lock, open(LOG_FILE, "a") as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=sys.stderr, flush=True)
+
+
+# --- HTTP endpoint ---
+
+def start_metrics_server(port=9464, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json on a daemon thread.
+    Returns the server (call .shutdown() to stop it).
+    """
+    import http.server  # ~30ms of imports; only the extractor's --metrics-port needs it
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(snapshot()).encode()
+                content_type = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = render_prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            return # Silence logs
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# --- Sampling profiler ---
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds and writes the
+    counts in collapsed-stack format ("a;b;c 42"), which flamegraph.pl and
+    speedscope read directly. Cheap enough to leave on for a single job run.
+    """
+
+    def __init__(self, output_file, interval=0.005, thread_id=None):
+        self.output_file = output_file
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = _StackCounter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        with open(self.output_file, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"🔬 Profile written to {self.output_file} ({sum(self.stacks.values())} samples)")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
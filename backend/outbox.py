@@ -0,0 +1,363 @@
+import os
+import time
+import uuid
+import string
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.rate_limit import TokenBucket
+from backend.metrics import ITEMS, STAGE_SECONDS, log_event
+
+OUTBOX_FILE = "data/outbox.db"
+
+# Graph accepts 30 messages per minute per mailbox (and 4 concurrent
+# requests); both are overridable for tenants with raised limits or the stub.
+SEND_PER_MINUTE = int(os.getenv("OUTBOX_PER_MINUTE", "30"))
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 120     # a sender that stops renewing its lease this long is presumed dead
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT UNIQUE,
+    to_address TEXT,
+    subject TEXT,
+    body TEXT,
+    content_type TEXT,
+    status TEXT DEFAULT 'queued',
+    attempts INTEGER DEFAULT 0,
+    not_before REAL DEFAULT 0,
+    last_error TEXT,
+    created REAL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, not_before, id);
+
+CREATE TABLE IF NOT EXISTS outbox_lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    expires REAL
+);
+"""
+
+# --- Templates ---
+
+TEMPLATES = {
+    "faq_answer": (
+        "Re: $subject",
+        "Hi $name,\n\n"
+        "Thanks for getting in touch. $answer\n\n"
+        "If this does not solve it, just reply to this email.\n\n"
+        "Best regards,\n$signature",
+    ),
+}
+
+
+SUBJECT_CHARS = 100
+
+
+def reply_subject(faq):
+    """
+    One-line subject for a reply about `faq`: the original thread's subject,
+    or (for FAQs saved before it was kept) the question's first line, cut
+    to SUBJECT_CHARS. The question is the customer's whole email.
+    """
+    subject = " ".join((faq.get('subject') or "").split())
+    while subject.lower().startswith(("re:", "aw:", "fw:", "fwd:")):
+        subject = subject.split(":", 1)[1].strip()
+    if not subject:
+        lines = [line for line in (faq.get('question') or "").splitlines() if line.strip()]
+        subject = " ".join(lines[0].split()) if lines else ""
+    if len(subject) > SUBJECT_CHARS:
+        subject = subject[:SUBJECT_CHARS - 1].rstrip() + "…"
+    return subject or "Your question"
+
+
+def render_template(template, faq, **context):
+    """
+    Fills a (subject, body) template from a stored FAQ ($question, $answer,
+    $topic, $subject) plus extra fields such as $name. Unknown placeholders
+    are left as-is rather than raising.
+    """
+    if isinstance(template, str):
+        template = TEMPLATES[template]
+    values = {"name": "there", "signature": "Support Team"}
+    values.update({k: v for k, v in faq.items() if isinstance(v, str)})
+    values['subject'] = reply_subject(faq)
+    values.update(context)
+    subject, body = template
+    return (string.Template(subject).safe_substitute(values),
+            string.Template(body).safe_substitute(values))
+
+
+class Outbox:
+    """
+    Persistent send queue (SQLite).
+
+    Every message carries a dedupe key (by default a hash of recipient,
+    subject and body), so enqueuing the same reply twice, e.g. after a crash
+    mid-import, queues it once. Rows move queued -> sending -> sent/failed.
+    One sender at a time holds the outbox lease; only it may decide that
+    rows left in 'sending' belong to a dead run.
+    """
+
+    def __init__(self, db_file=OUTBOX_FILE):
+        directory = os.path.dirname(db_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _dedupe_key(to_address, subject, body):
+        return hashlib.sha256(f"{to_address.lower()}\n{subject}\n{body}".encode()).hexdigest()
+
+    def enqueue(self, to_address, subject, body, content_type="Text", dedupe_key=None):
+        """Queues one message. Returns True if it was new."""
+        return self.enqueue_many([(to_address, subject, body, content_type, dedupe_key)]) == 1
+
+    def enqueue_many(self, messages):
+        """
+        Queues (to, subject, body[, content_type[, dedupe_key]]) tuples in one
+        transaction. Returns the number of new messages.
+        """
+        now = time.time()
+        rows = []
+        for message in messages:
+            to_address, subject, body = message[:3]
+            content_type = message[3] if len(message) > 3 and message[3] else "Text"
+            key = message[4] if len(message) > 4 and message[4] else self._dedupe_key(to_address, subject, body)
+            rows.append((key, to_address, subject, body, content_type, now))
+        with self.lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO outbox (dedupe_key, to_address, subject, body, content_type, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            return self.conn.total_changes - before
+
+    def enqueue_template(self, template, faq, recipients):
+        """
+        Queues one rendered `template` per recipient. `recipients` are dicts
+        with an "address" and any extra template fields (e.g. "name").
+        """
+        messages = []
+        for recipient in recipients:
+            context = {k: v for k, v in recipient.items() if k != "address"}
+            subject, body = render_template(template, faq, **context)
+            messages.append((recipient["address"], subject, body))
+        return self.enqueue_many(messages)
+
+    def claim(self, limit):
+        """Marks up to `limit` due messages as sending and returns them."""
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT * FROM outbox WHERE status = 'queued' AND not_before <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+            if rows:
+                self.conn.executemany(
+                    "UPDATE outbox SET status = 'sending', attempts = attempts + 1 WHERE id = ?",
+                    [(row['id'],) for row in rows]
+                )
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, ids):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                [(time.time(), i) for i in ids]
+            )
+
+    def mark_failed(self, message, error, retry=False, delay=0):
+        """Requeues `message` (up to MAX_ATTEMPTS) when `retry`, else fails it."""
+        status = "queued" if retry and message['attempts'] < MAX_ATTEMPTS else "failed"
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, last_error = ?, not_before = ? WHERE id = ?",
+                (status, str(error)[:500], time.time() + delay, message['id'])
+            )
+        return status
+
+    # --- Sender lease ---
+
+    def acquire_lease(self, owner, ttl=LEASE_SECONDS):
+        """Takes or renews the sender lease. False while another live sender holds it."""
+        now = time.time()
+        with self.lock, self.conn:
+            # One statement, so two processes cannot both take an expired lease
+            return self.conn.execute(
+                "INSERT INTO outbox_lease (name, owner, expires) VALUES ('sender', ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE outbox_lease.owner = excluded.owner OR outbox_lease.expires <= ?",
+                (owner, now + ttl, now)
+            ).rowcount == 1
+
+    def release_lease(self, owner):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM outbox_lease WHERE name = 'sender' AND owner = ?", (owner,))
+
+    def mark_interrupted(self):
+        """
+        Rows claimed by a run that died may or may not have been sent; never
+        resend them blindly (see retry_interrupted). Call only while holding
+        the lease, so no live sender's rows are touched.
+        """
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "UPDATE outbox SET status = 'interrupted' WHERE status = 'sending'"
+            ).rowcount
+
+    def retry_interrupted(self):
+        """Requeues messages whose send was cut off (accepting possible duplicates)."""
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "UPDATE outbox SET status = 'queued' WHERE status = 'interrupted'"
+            ).rowcount
+
+    def pending(self):
+        """Messages still waiting to be sent (queued or in flight)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('queued', 'sending')"
+            ).fetchone()
+        return row[0]
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+def _send_request(message):
+    return {
+        "method": "POST",
+        "url": "/me/sendMail",
+        "body": {
+            "message": {
+                "subject": message['subject'],
+                "body": {"contentType": message['content_type'], "content": message['body']},
+                "toRecipients": [{"emailAddress": {"address": message['to_address']}}],
+            },
+            "saveToSentItems": True,
+        },
+    }
+
+
+class OutboxSender:
+    """
+    Drains an Outbox through Graph.
+
+    Messages are packed into $batch requests of `batch_size` sendMail calls
+    and sent by `workers` threads over the shared pooled transport. A token
+    bucket keeps the whole pool under `per_minute`. Throttled (429) sends are
+    retried; 5xx results on sendMail are not, because Graph may already have
+    delivered the message.
+    """
+
+    def __init__(self, outlook, outbox, workers=4, batch_size=20, per_minute=SEND_PER_MINUTE):
+        self.outlook = outlook
+        self.outbox = outbox
+        self.workers = workers
+        # A batch never claims more messages than one burst of the rate limit
+        self.batch_size = max(1, min(batch_size, 20, per_minute or 20))
+        self.limiter = TokenBucket(per_minute / 60, capacity=self.batch_size)
+        self.owner = uuid.uuid4().hex
+
+    def _send_batch(self):
+        # Claim first, then wait for quota for exactly what was claimed
+        messages = self.outbox.claim(self.batch_size)
+        if not messages:
+            return 0
+        self.limiter.acquire(len(messages))
+
+        from backend.graph.messages import batch_requests
+        try:
+            with STAGE_SECONDS.time(stage="send"):
+                results = batch_requests(self.outlook, [_send_request(m) for m in messages],
+                                         idempotent=False)
+        except Exception as e:
+            # The whole $batch failed: nothing in it can be assumed delivered or not
+            for message in messages:
+                self.outbox.mark_failed(message, e)
+            ITEMS.inc(len(messages), stage="send", outcome="failed")
+            print(f"❌ Send batch failed: {e}")
+            return len(messages)
+
+        sent = []
+        for message, result in zip(messages, results):
+            status = result['status'] if result else 0
+            if status == 202:
+                sent.append(message['id'])
+            elif status == 429:
+                self.outbox.mark_failed(message, "throttled", retry=True, delay=60)
+            else:
+                error = (result or {}).get('body') or status
+                self.outbox.mark_failed(message, error)
+                log_event("send_failed", to=message['to_address'], status=status)
+        self.outbox.mark_sent(sent)
+        ITEMS.inc(len(sent), stage="send", outcome="sent")
+        ITEMS.inc(len(messages) - len(sent), stage="send", outcome="failed")
+        return len(messages)
+
+    def _worker(self, stop):
+        handled = 0
+        while not stop.is_set():
+            if not self.outbox.acquire_lease(self.owner):
+                print("⚠️  Lost the outbox lease to another sender; stopping.")
+                return handled
+            count = self._send_batch()
+            handled += count
+            if not count:
+                if not self.outbox.pending():
+                    return handled
+                time.sleep(0.5)  # Remaining messages are waiting out a retry delay
+        return handled
+
+    def run(self, retry_interrupted=False):
+        """
+        Sends until the queue is empty. Returns the outbox status counts.
+        With `retry_interrupted`, sends cut off by a crash are requeued first.
+        """
+        if not self.outlook.get_token(interactive=False):
+            print("❌ Not logged in. Cannot send emails.")
+            return self.outbox.counts()
+        if not self.outbox.acquire_lease(self.owner):
+            print("⏳ Another sender is draining this outbox; try again when it is done.")
+            return self.outbox.counts()
+        try:
+            interrupted = self.outbox.mark_interrupted()
+            if interrupted:
+                print(f"⚠️  {interrupted} emails were cut off by a crash (resend with --retry-interrupted).")
+            if retry_interrupted:
+                print(f"🔁 Requeued {self.outbox.retry_interrupted()} interrupted emails.")
+            return self._run()
+        finally:
+            self.outbox.release_lease(self.owner)
+
+    def _run(self):
+        stop = threading.Event()
+        print(f"📤 Sending {self.outbox.pending()} queued emails with {self.workers} workers...")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._worker, stop) for _ in range(self.workers)]
+            try:
+                handled = sum(f.result() for f in futures)
+            except KeyboardInterrupt:
+                stop.set()
+                raise
+        counts = self.outbox.counts()
+        print(f"✅ Outbox drained: {handled} messages in {time.perf_counter() - start:.1f}s {counts}")
+        return counts
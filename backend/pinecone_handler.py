@@ -3,9 +3,14 @@ import json
 import time
 from pinecone import Pinecone
 from dotenv import load_dotenv
+from backend.metrics import VECTOR_SECONDS, VECTOR_ERRORS, ITEMS
 
 load_dotenv()
 
+# Keep a quantized local copy of every vector (backend.vector_store) and
+# answer searches from it instead of querying the index
+LOCAL_VECTOR_SEARCH = bool(os.getenv("LOCAL_VECTOR_SEARCH"))
+
 class PineconeHandler:
     def __init__(self):
         self.api_key = os.getenv("PINECONE_API_KEY")
@@ -19,6 +24,10 @@ class PineconeHandler:
         
         # Model for inference
         self.model = 'multilingual-e5-large'
+        self.local = None
+        if LOCAL_VECTOR_SEARCH:
+            from backend.clients import get_vector_store
+            self.local = get_vector_store()
 
     def embed_and_upsert(self, faqs):
         """
@@ -44,11 +53,12 @@ class PineconeHandler:
         try:
             # 1. Generate Embeddings using Pinecone Inference
             # We treat these as 'passage' type for storage
-            embeddings = self.pc.inference.embed(
-                model=self.model,
-                inputs=inputs,
-                parameters={"input_type": "passage", "truncate": "END"}
-            )
+            with VECTOR_SECONDS.time(op="embed"):
+                embeddings = self.pc.inference.embed(
+                    model=self.model,
+                    inputs=inputs,
+                    parameters={"input_type": "passage", "truncate": "END"}
+                )
             
             # 2. Prepare Match Records
             for i, embedding_obj in enumerate(embeddings):
@@ -67,48 +77,130 @@ class PineconeHandler:
                     "source_id": faq.get('source_email_id'),
                     "text": inputs[i] # Store full text for RAG context
                 }
+                if faq.get('content_hash'):
+                    metadata['content_hash'] = faq['content_hash']
                 
                 records.append({
-                    "id": faq.get('source_email_id'),
+                    "id": faq.get('source_email_id') or faq.get('id'),
                     "values": vector,
                     "metadata": metadata
                 })
                 
             # 3. Upsert to Index
             if records:
-                self.index.upsert(vectors=records)
+                with VECTOR_SECONDS.time(op="upsert"):
+                    self.index.upsert(vectors=records)
+                if self.local is not None:
+                    self.local.add([r['id'] for r in records], [r['values'] for r in records])
+                ITEMS.inc(len(records), stage="vectorize", outcome="upserted")
                 print(f"✅ Upserted {len(records)} vectors to Pinecone.")
                 return len(records)
                 
         except Exception as e:
+            VECTOR_ERRORS.inc(op="upsert")
             print(f"❌ Pinecone Error: {e}")
             return 0
         
         return 0
 
-    def search_similar(self, query, top_k=3):
-        """
-        Searches Pinecone for similar FAQs.
-        """
+    def delete(self, ids):
+        """Removes vectors by id (in chunks of 1000, Pinecone's limit per call)."""
+        ids = list(ids)
         try:
-            # Embed the query
-            query_embedding = self.pc.inference.embed(
+            for start in range(0, len(ids), 1000):
+                with VECTOR_SECONDS.time(op="delete"):
+                    self.index.delete(ids=ids[start:start + 1000])
+            if self.local is not None:
+                self.local.delete(ids)
+            ITEMS.inc(len(ids), stage="vectorize", outcome="deleted")
+        except Exception:
+            VECTOR_ERRORS.inc(op="delete")
+            raise
+        return len(ids)
+
+    def list_ids(self, page_size=100):
+        """Yields pages of vector ids (serverless list endpoint)."""
+        token = None
+        while True:
+            with VECTOR_SECONDS.time(op="list"):
+                response = self.index.list_paginated(limit=page_size, pagination_token=token)
+            ids = [v.id for v in response.vectors]
+            if ids:
+                yield ids
+            token = response.pagination.next if response.pagination else None
+            if not token:
+                return
+
+    def fetch_metadata(self, ids):
+        """Returns {id: metadata} for the given vector ids (values are not needed)."""
+        with VECTOR_SECONDS.time(op="fetch"):
+            response = self.index.fetch(ids=list(ids))
+        return {vid: dict(vector.metadata or {}) for vid, vector in response.vectors.items()}
+
+    def fetch_vectors(self, ids):
+        """Returns {id: values} for the given vector ids."""
+        with VECTOR_SECONDS.time(op="fetch"):
+            response = self.index.fetch(ids=list(ids))
+        return {vid: list(vector.values) for vid, vector in response.vectors.items()}
+
+    def update_metadata(self, vector_id, metadata):
+        """Merges `metadata` into a stored vector without re-embedding it."""
+        with VECTOR_SECONDS.time(op="update"):
+            self.index.update(id=vector_id, set_metadata=metadata)
+
+    def embed_queries(self, texts):
+        """Embeds many query texts in one inference call. Returns a list of vectors."""
+        if not texts:
+            return []
+        with VECTOR_SECONDS.time(op="embed_query"):
+            embeddings = self.pc.inference.embed(
                 model=self.model,
-                inputs=[query],
-                parameters={"input_type": "query"}
+                inputs=list(texts),
+                parameters={"input_type": "query", "truncate": "END"}
             )
-            
-            volume = query_embedding[0]['values']
-            
-            # Query Index
+        return [e['values'] for e in embeddings]
+
+    def search_vector(self, vector, top_k=3):
+        """Queries the index with an already embedded query."""
+        if self.local is not None and self._local_is_current():
+            return self._search_local(vector, top_k)
+        with VECTOR_SECONDS.time(op="query"):
             results = self.index.query(
-                vector=volume,
+                vector=vector,
                 top_k=top_k,
                 include_metadata=True
             )
-            
-            return results['matches']
-            
+        return results['matches']
+
+    def _local_is_current(self):
+        # Readers (UI, search service) see the vectorizer's flushes on refresh;
+        # until the local copy has caught up with its cursor, ask the index
+        from backend.clients import get_faq_store
+        self.local.refresh()
+        if not len(self.local) or self.local.checkpoint is None:
+            return False
+        return self.local.checkpoint >= (get_faq_store().get_cursor("vectorizer") or 0)
+
+    def _search_local(self, vector, top_k):
+        # Same match shape as the index; metadata comes from the FAQ store
+        from backend.clients import get_faq_store
+        faqs = get_faq_store()
+        matches = []
+        for vid, score in self.local.search(vector, top_k=top_k):
+            faq = faqs.get(vid)
+            if faq:
+                metadata = {"question": faq['question'], "answer": faq['answer'],
+                            "topic": faq.get('topic', 'General'), "source_id": faq.get('source_email_id')}
+                matches.append({"id": vid, "score": score, "metadata": metadata})
+        return matches
+
+    def search_similar(self, query, top_k=3):
+        """
+        Searches Pinecone for similar FAQs.
+        """
+        try:
+            return self.search_vector(self.embed_queries([query])[0], top_k=top_k)
         except Exception as e:
+            VECTOR_ERRORS.inc(op="query")
             print(f"❌ Search Error: {e}")
             return []
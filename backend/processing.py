@@ -1,6 +1,22 @@
-from bs4 import BeautifulSoup
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+# Thread analysis is CPU-bound (two HTML parses per candidate pair), so large
+# runs spread it over a process pool. Small runs stay in-process: below
+# PARALLEL_MIN_THREADS the pool start-up costs more than it saves.
+# MailboxPool workers get a share of the cores instead (see set_parse_workers).
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_CHUNK_SIZE = 64
+PARALLEL_MIN_THREADS = 256
+
+
+def set_parse_workers(workers):
+    """Sets the default parse pool size for this process."""
+    global PARSE_WORKERS
+    PARSE_WORKERS = max(1, workers)
+
 class ThreadProcessor:
     def __init__(self):
         pass
@@ -8,12 +24,15 @@ class ThreadProcessor:
     def clean_html(self, html_content):
         if not html_content:
             return ""
+        from bs4 import BeautifulSoup  # ~60ms to import; only runs that parse threads need it
         soup = BeautifulSoup(html_content, "html.parser")
         return soup.get_text(separator="\n").strip()
 
-    def extract_qa_pair(self, thread_emails, my_email_address):
+    def extract_qa_pair(self, thread_emails, my_email_address, presorted=False):
         """
         Input: List of emails in a conversation (from API).
+               presorted=True means the list is already ordered oldest -> newest
+               (as returned through the ThreadIndex), so no sort is needed.
         Output: (question_text, answer_text, answer_message_id) or None
         
         Logic:
@@ -23,7 +42,10 @@ class ThreadProcessor:
         4. Validate that this is a direct reply sequence.
         """
         # Sort desc (Newest first)
-        sorted_emails = sorted(thread_emails, key=lambda x: x.get('receivedDateTime', ''), reverse=True)
+        if presorted:
+            sorted_emails = thread_emails[::-1]
+        else:
+            sorted_emails = sorted(thread_emails, key=lambda x: x.get('receivedDateTime', ''), reverse=True)
         
         for i in range(len(sorted_emails) - 1):
             latest_email = sorted_emails[i] # Candidate Answer
@@ -50,8 +72,92 @@ class ThreadProcessor:
                         "question": question_body,
                         "answer": answer_body,
                         "id": latest_email.get('id'), # Use Answer ID as unique key
+                        "question_id": previous_email.get('id'),
+                        "question_sender": prev_sender,
                         "subject": latest_email.get('subject'),
                         "timestamp": latest_email.get('receivedDateTime')
                     }
         
         return None
+
+
+# --- Parallel pair extraction ---
+
+def compact_message(email):
+    """The fields extract_qa_pair reads, as a small tuple that pickles cheaply."""
+    return (
+        email.get('id'),
+        email.get('sender', {}).get('emailAddress', {}).get('address', ''),
+        email.get('receivedDateTime', ''),
+        email.get('subject'),
+        email.get('body', {}).get('content', ''),
+    )
+
+
+def _expand(record):
+    message_id, address, received, subject, body = record
+    return {
+        "id": message_id,
+        "sender": {"emailAddress": {"address": address}},
+        "receivedDateTime": received,
+        "subject": subject,
+        "body": {"content": body},
+    }
+
+
+def _extract_chunk(chunk, my_email_address):
+    """Worker: [(cid, [compact messages oldest first])] -> [(cid, pair or None)]."""
+    processor = ThreadProcessor()
+    return [
+        (cid, processor.extract_qa_pair([_expand(r) for r in records], my_email_address, presorted=True))
+        for cid, records in chunk
+    ]
+
+
+_pool = None
+_pool_key = None
+
+
+def _get_pool(workers):
+    """One long-lived pool per process, so scheduled runs do not pay start-up again."""
+    global _pool, _pool_key
+    key = (os.getpid(), workers)
+    if _pool is None or _pool_key != key:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_key = key
+    return _pool
+
+
+def iter_qa_pairs(threads, my_email_address, workers=None, chunk_size=PARSE_CHUNK_SIZE,
+                  total=None):
+    """
+    Yields (conversation_id, pair or None) for `threads`, an iterable of
+    (conversation_id, [compact_message, ...] oldest first), in input order.
+
+    With more than one worker and at least PARALLEL_MIN_THREADS threads,
+    chunks of `chunk_size` threads go to a process pool; at most two chunks
+    per worker are in flight, so memory stays bounded however long the
+    input is. Results are yielded in submission order, so the output is
+    identical to a serial run. `workers` defaults to PARSE_WORKERS.
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    if workers <= 1 or (total is not None and total < PARALLEL_MIN_THREADS):
+        processor = ThreadProcessor()
+        for cid, records in threads:
+            yield cid, processor.extract_qa_pair([_expand(r) for r in records], my_email_address, presorted=True)
+        return
+
+    pool = _get_pool(workers)
+    in_flight = deque()
+    chunk = []
+    for item in threads:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            in_flight.append(pool.submit(_extract_chunk, chunk, my_email_address))
+            chunk = []
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+    if chunk:
+        in_flight.append(pool.submit(_extract_chunk, chunk, my_email_address))
+    while in_flight:
+        yield from in_flight.popleft().result()
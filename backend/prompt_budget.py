@@ -0,0 +1,182 @@
+import os
+import re
+from collections import deque, OrderedDict
+from itertools import islice
+
+from backend.metrics import ITEMS
+
+# Token budgets for Gemini prompts. Tokens are counted locally with a
+# deterministic estimate (Gemini's tokenizer is not available offline) that
+# errs on the high side, so a prompt that fits here fits the real model.
+# Oversized email text is first compacted (quoted history, repeated log
+# lines, whitespace) and only then cut, keeping its head and tail.
+
+REQUEST_TOKENS = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))   # prompt tokens per Gemini request
+PAIRS_PER_CALL = int(os.getenv("EXTRACT_PAIRS_PER_CALL", "1"))  # Q&A pairs validated per request
+PAIR_OVERHEAD = 24          # headers and separators around each pair in a prompt
+MIN_SECTION_TOKENS = 32     # never cut a section below this
+LOOKAHEAD = 8               # candidates scanned to fill a request that still has room
+KEEP_SIMILAR_LINES = 2      # lines kept from a run of lines that differ only in numbers
+
+# One token per up-to-4 ASCII word characters, up-to-2 other-script
+# characters, or punctuation mark
+_TOKEN = re.compile(r"[A-Za-z0-9_]{1,4}|[^\W\x00-\x7f]{1,2}|[^\w\s]")
+_SHAPE = re.compile(r"\w*\d\w*")   # numbers, ids, hex, timestamps
+
+
+# Packing, fitting and building the prompt count the same texts several
+# times. Counts are remembered by (length, hash) only, so the cache never
+# keeps email bodies alive; str caches its hash, so a lookup stays cheap.
+_counts = OrderedDict()
+COUNT_CACHE = 4096
+
+
+def estimate_tokens(text):
+    """Deterministic local token count of `text` (slightly above Gemini's)."""
+    if not text:
+        return 0
+    key = (len(text), hash(text))
+    count = _counts.get(key)
+    if count is None:
+        count = _counts[key] = len(_TOKEN.findall(text))
+        if len(_counts) > COUNT_CACHE:
+            _counts.popitem(last=False)
+    return count
+
+
+def _cut(text, tokens, from_end=False):
+    """The longest prefix (or suffix) of `text` within `tokens`, cut at a token boundary."""
+    if tokens <= 0:
+        return ""
+    if not from_end:
+        for count, m in enumerate(_TOKEN.finditer(text), 1):
+            if count == tokens:
+                return text[:m.end()]
+        return text
+    starts = [m.start() for m in _TOKEN.finditer(text)]
+    return text[starts[-tokens]:] if len(starts) > tokens else text
+
+
+def compact_text(text):
+    """
+    Loss-light shrinking: drops quoted ("> ") lines, collapses runs of lines
+    that only differ in numbers/ids (pasted logs, stack traces) and squeezes
+    whitespace. Deterministic, so the same email always gives the same prompt.
+    """
+    lines, run_shape, run_len = [], None, 0
+    for line in (text or "").splitlines():
+        line = " ".join(line.split())
+        if line.startswith(">"):
+            continue
+        shape = _SHAPE.sub("#", line)
+        if line and shape == run_shape:
+            run_len += 1
+            if run_len <= KEEP_SIMILAR_LINES:
+                lines.append(line)
+            elif run_len == KEEP_SIMILAR_LINES + 1:
+                lines.append(None)  # placeholder for the "similar lines" marker
+            continue
+        if run_len > KEEP_SIMILAR_LINES:
+            lines[lines.index(None)] = f"[… {run_len - KEEP_SIMILAR_LINES} similar lines …]"
+        run_shape, run_len = shape, 1
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    if run_len > KEEP_SIMILAR_LINES:
+        lines[lines.index(None)] = f"[… {run_len - KEEP_SIMILAR_LINES} similar lines …]"
+    return "\n".join(lines).strip()
+
+
+def fit_text(text, budget):
+    """`text` within `budget` tokens: as is, compacted, or compacted and cut in the middle."""
+    if estimate_tokens(text) <= budget:
+        return text
+    ITEMS.inc(stage="prompt", outcome="compacted")
+    text = compact_text(text)
+    total = estimate_tokens(text)
+    if total <= budget:
+        return text
+    ITEMS.inc(stage="prompt", outcome="truncated")
+    marker_tokens = 12
+    head = max(0, (budget - marker_tokens) * 2 // 3)
+    tail = max(0, budget - marker_tokens - head)
+    head_text, tail_text = _cut(text, head), _cut(text, tail, from_end=True)
+    omitted = total - estimate_tokens(head_text) - estimate_tokens(tail_text)
+    return f"{head_text}\n[… {omitted} tokens omitted …]\n{tail_text}"
+
+
+def fit_sections(texts, budget):
+    """
+    Shares `budget` tokens between several texts. Small texts are kept whole
+    and what they leave is split evenly among the larger ones, which are
+    then fitted with fit_text. Returns the texts in the same order.
+    """
+    sizes = [estimate_tokens(t) for t in texts]
+    shares = [0] * len(texts)
+    remaining = budget
+    order = sorted(range(len(texts)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        fair = max(MIN_SECTION_TOKENS, remaining // (len(order) - position))
+        shares[i] = min(sizes[i], fair)
+        remaining -= shares[i]
+    return [t if sizes[i] <= shares[i] else fit_text(t, shares[i]) for i, t in enumerate(texts)]
+
+
+class PromptPacker:
+    """
+    Sizes Q&A pairs for validation prompts of at most `request_tokens`.
+
+    `fixed_tokens` is the prompt's own text (instructions); each pair costs
+    its question and answer plus PAIR_OVERHEAD, and no single pair may take
+    more than what is left of one request. With `pairs_per_call` > 1 the
+    candidates are packed, in priority order, into as few requests as fit.
+    """
+
+    def __init__(self, fixed_tokens=0, request_tokens=REQUEST_TOKENS, pairs_per_call=PAIRS_PER_CALL):
+        self.fixed_tokens = fixed_tokens
+        self.request_tokens = request_tokens
+        self.pairs_per_call = max(1, pairs_per_call)
+
+    def available(self, count=1):
+        """Tokens left for the question/answer text of `count` pairs in one request."""
+        return max(MIN_SECTION_TOKENS * 2 * count,
+                   self.request_tokens - self.fixed_tokens - count * PAIR_OVERHEAD)
+
+    def pair_tokens(self, pair):
+        """What one pair costs in a request, after compacting/fitting it on its own."""
+        texts = [pair.get('question') or "", pair.get('answer') or ""]
+        if sum(estimate_tokens(t) for t in texts) > self.available(1):
+            texts = fit_sections(texts, self.available(1))
+        return sum(estimate_tokens(t) for t in texts) + PAIR_OVERHEAD
+
+    def request_cost(self, sizes):
+        return self.fixed_tokens + sum(sizes)
+
+    def pack(self, pairs):
+        """
+        Groups `pairs` (best first) into requests: [(indices, estimated tokens)].
+        Each request takes the next pair and then fills up from the following
+        LOOKAHEAD pairs with those that still fit, so priorities move by a few
+        places at most.
+        """
+        sizes = [self.pair_tokens(p) for p in pairs]
+        room = self.request_tokens - self.fixed_tokens
+        pending = deque(range(len(pairs)))
+        groups = []
+        while pending:
+            group = [pending.popleft()]
+            used = sizes[group[0]]
+            for i in list(islice(pending, LOOKAHEAD)):
+                if len(group) >= self.pairs_per_call:
+                    break
+                if used + sizes[i] <= room:
+                    group.append(i)
+                    used += sizes[i]
+                    pending.remove(i)
+            groups.append((group, self.request_cost(sizes[i] for i in group)))
+        return groups
+
+    def fit(self, pairs):
+        """The (question, answer) texts of `pairs`, fitted to share one request."""
+        texts = fit_sections([t for p in pairs for t in (p.get('question') or "", p.get('answer') or "")],
+                             self.available(len(pairs)))
+        return list(zip(texts[0::2], texts[1::2]))
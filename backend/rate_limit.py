@@ -0,0 +1,74 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`.
+    A rate of 0/None means unlimited.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate or 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self, tokens):
+        """Takes `tokens` if they are available; returns 0, or the seconds until they will be."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def try_acquire(self, tokens=1):
+        if not self.rate:
+            return True
+        return self._take(tokens) == 0
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available."""
+        if not self.rate:
+            return
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    A TokenBucket whose state lives in shared memory, so worker processes
+    started by the creating process (e.g. as pool initializer arguments)
+    all draw from the same bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        import multiprocessing
+        self._state = multiprocessing.Array('d', 2)   # [tokens, updated]
+        super().__init__(rate, capacity)
+        self.lock = self._state.get_lock()
+
+    @property
+    def tokens(self):
+        return self._state[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def updated(self):
+        return self._state[1]
+
+    @updated.setter
+    def updated(self, value):
+        self._state[1] = value
@@ -0,0 +1,111 @@
+import time
+
+from backend.metrics import ITEMS, log_event
+
+FETCH_BATCH = 100   # ids per metadata fetch
+EMBED_BATCH = 96    # Pinecone inference accepts up to 96 inputs per call
+VECTORIZER = "vectorizer"
+
+
+def _same_text(local, remote):
+    return local.get('question') == remote.get('question') and local.get('answer') == remote.get('answer')
+
+
+def reconcile(faqs, index, dry_run=True, sample=10):
+    """
+    Compares the vector index with the FAQ store and repairs the difference.
+
+    Remote ids are listed page by page and their metadata fetched in batches
+    of FETCH_BATCH; each vector's stored content hash is compared with the
+    local one:
+      - ok:            hashes match
+      - metadata_only: same question/answer text, only metadata is stale or
+                       has no hash yet (old uploads) -> metadata update, no re-embed
+      - changed:       text differs -> re-embed
+      - orphans:       no live local FAQ (deleted, merged) -> delete
+      - missing:       live locally, not in the index -> embed
+    With dry_run nothing is written. Otherwise the vectorizer cursor is
+    also moved to the store version reconciled against, so a lost cursor or
+    state file never causes a full re-embed.
+
+    Returns a report dict of counts plus a few example ids per category.
+    """
+    start = time.perf_counter()
+    version = faqs.version
+    local = {record['id']: record['content_hash'] for record in faqs.iter_all()}
+
+    report = {key: 0 for key in ("local", "remote", "ok", "metadata_only", "changed", "orphans", "missing")}
+    examples = {key: [] for key in ("metadata_only", "changed", "orphans", "missing")}
+    report["local"] = len(local)
+    seen = set()
+    to_embed, to_update, to_delete = [], [], []
+
+    def note(kind, fid):
+        report[kind] += 1
+        if len(examples[kind]) < sample:
+            examples[kind].append(fid)
+
+    for page in index.list_ids():
+        for offset in range(0, len(page), FETCH_BATCH):
+            batch = page[offset:offset + FETCH_BATCH]
+            metadata = index.fetch_metadata(batch)
+            for vid in batch:
+                report["remote"] += 1
+                seen.add(vid)
+                if vid not in local:
+                    note("orphans", vid)
+                    to_delete.append(vid)
+                    continue
+                remote = metadata.get(vid) or {}
+                if remote.get('content_hash') == local[vid]:
+                    report["ok"] += 1
+                    continue
+                record = faqs.get(vid)
+                if _same_text(record, remote):
+                    note("metadata_only", vid)
+                    to_update.append(record)
+                else:
+                    note("changed", vid)
+                    to_embed.append(vid)
+
+    for fid in local:
+        if fid not in seen:
+            note("missing", fid)
+            to_embed.append(fid)
+
+    report["examples"] = {k: v for k, v in examples.items() if v}
+    report["dry_run"] = dry_run
+
+    if not dry_run:
+        for record in to_update:
+            index.update_metadata(record['id'], {
+                "topic": record.get('topic', 'General'),
+                "content_hash": record['content_hash'],
+            })
+        for start_at in range(0, len(to_embed), EMBED_BATCH):
+            batch = [faqs.get(fid) for fid in to_embed[start_at:start_at + EMBED_BATCH]]
+            batch = [r for r in batch if r]
+            if batch and index.embed_and_upsert(batch) != len(batch):
+                raise RuntimeError("Embedding failed during reconciliation; nothing after this batch was applied")
+        if to_delete:
+            index.delete(to_delete)
+        faqs.set_cursor(VECTORIZER, version)
+        ITEMS.inc(len(to_embed), stage="reconcile", outcome="embedded")
+        ITEMS.inc(len(to_update), stage="reconcile", outcome="metadata_updated")
+        ITEMS.inc(len(to_delete), stage="reconcile", outcome="deleted")
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    log_event("reconcile_finished", **{k: v for k, v in report.items() if k != "examples"})
+    return report
+
+
+def print_report(report):
+    mode = "Dry run" if report["dry_run"] else "Applied"
+    print(f"🧮 {mode}: {report['local']} local FAQs, {report['remote']} vectors in the index")
+    print(f"   ✅ in sync:          {report['ok']}")
+    print(f"   🏷️  metadata only:    {report['metadata_only']}")
+    print(f"   ✏️  changed (re-embed): {report['changed']}")
+    print(f"   ➕ missing (embed):  {report['missing']}")
+    print(f"   🗑️  orphans (delete): {report['orphans']}")
+    for kind, ids in report.get("examples", {}).items():
+        print(f"   e.g. {kind}: {', '.join(ids)}")
@@ -0,0 +1,217 @@
+import os
+import json
+import math
+import time
+from datetime import datetime
+
+from backend.metrics import ITEMS, log_event
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_queue (
+    answer_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    sender TEXT,
+    resolved INTEGER,
+    pair TEXT,
+    queued REAL
+);
+CREATE TABLE IF NOT EXISTS extraction_dropped (
+    answer_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    priority REAL,
+    dropped REAL
+);
+"""
+
+# Per-run budgets (0 = unlimited); a registry entry can set its own
+LLM_BUDGET = int(os.getenv("EXTRACT_LLM_BUDGET", "0"))
+TIME_BUDGET = float(os.getenv("EXTRACT_TIME_BUDGET", "0"))   # seconds
+TOKEN_BUDGET = int(os.getenv("EXTRACT_TOKEN_BUDGET", "0"))   # estimated prompt tokens
+MAX_QUEUE = 5000            # lowest-priority candidates beyond this are dropped
+HALF_LIFE_DAYS = 7          # a week-old thread is worth half a fresh one
+
+# Customer tiers: {"acme.com": "enterprise", "ceo@bigco.com": "premium"}
+TIERS_FILE = "data/customer_tiers.json"
+TIER_WEIGHTS = {"enterprise": 1.0, "premium": 0.7, "standard": 0.4}
+DEFAULT_TIER = "standard"
+
+GENERIC_ANSWERS = ("thanks", "thank you", "ok", "okay", "will check", "noted", "received")
+
+
+def load_tiers(path=TIERS_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {k.lower(): v for k, v in json.load(f).items()}
+
+
+def prefilter_score(pair):
+    """
+    Cheap 0..1 guess of how likely Gemini accepts the pair, from text alone:
+    a real question and a substantive, non-generic answer score high.
+    """
+    question = pair.get('question') or ""
+    answer = pair.get('answer') or ""
+    score = 0.0
+    if "?" in question:
+        score += 0.3
+    score += 0.3 * min(1.0, len(question) / 300)
+    score += 0.4 * min(1.0, len(answer) / 400)
+    if answer.strip().lower().rstrip(".!") in GENERIC_ANSWERS:
+        score = 0.0
+    return score
+
+
+def _age_days(timestamp, now):
+    try:
+        received = datetime.fromisoformat((timestamp or "").replace("Z", "+00:00"))
+    except ValueError:
+        return HALF_LIFE_DAYS * 4
+    return max(0.0, (now - received.timestamp()) / 86400)
+
+
+class ExtractionScheduler:
+    """
+    Priority queue of candidate Q&A pairs waiting for LLM validation.
+
+    Candidates are ranked by recency (exponential decay), whether our reply
+    closed the thread, a text pre-filter score and the customer's tier, and
+    validated best first until the run's LLM-call, prompt-token or time
+    budget is spent.
+    Whatever is left stays in the `extraction_queue` table (next to the
+    messages) and competes again, re-ranked, in the next run.
+    """
+
+    def __init__(self, store, llm_budget=LLM_BUDGET, time_budget=TIME_BUDGET, tiers=None,
+                 token_budget=TOKEN_BUDGET):
+        self.conn = store.conn
+        self.lock = store.lock
+        self.llm_budget = llm_budget
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+        self._retry = set()
+        self.tiers = load_tiers() if tiers is None else tiers
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def tier_weight(self, sender):
+        sender = (sender or "").lower()
+        tier = self.tiers.get(sender) or self.tiers.get(sender.rpartition("@")[2]) or DEFAULT_TIER
+        return TIER_WEIGHTS.get(tier, TIER_WEIGHTS[DEFAULT_TIER])
+
+    def priority(self, pair, sender, resolved, now=None):
+        now = now or time.time()
+        recency = math.pow(0.5, _age_days(pair.get('timestamp'), now) / HALF_LIFE_DAYS)
+        return (0.35 * recency
+                + 0.15 * (1.0 if resolved else 0.0)
+                + 0.30 * prefilter_score(pair)
+                + 0.20 * self.tier_weight(sender))
+
+    def add(self, conversation_id, pair, sender, resolved):
+        """Queues one candidate (or refreshes it if the thread changed)."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extraction_queue VALUES (?, ?, ?, ?, ?, "
+                "COALESCE((SELECT queued FROM extraction_queue WHERE answer_id = ?), ?))",
+                (pair['id'], conversation_id, sender, int(bool(resolved)), json.dumps(pair),
+                 pair['id'], time.time())
+            )
+            self.conn.execute("DELETE FROM extraction_dropped WHERE answer_id = ?", (pair['id'],))
+
+    def dropped(self, limit=100):
+        """Candidates dropped for queue size, most recent first: [(answer_id, conversation_id, dropped)]."""
+        with self.lock:
+            return [tuple(r) for r in self.conn.execute(
+                "SELECT answer_id, conversation_id, dropped FROM extraction_dropped ORDER BY dropped DESC LIMIT ?",
+                (limit,)
+            ).fetchall()]
+
+    def pending(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM extraction_queue").fetchone()[0]
+
+    def ranked(self):
+        """Every queued candidate as (priority, conversation_id, pair), best first."""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT conversation_id, sender, resolved, pair FROM extraction_queue"
+            ).fetchall()
+        ranked = []
+        for cid, sender, resolved, data in rows:
+            pair = json.loads(data)
+            ranked.append((self.priority(pair, sender, resolved, now), cid, pair))
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        return ranked
+
+    def _remove(self, answer_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM extraction_queue WHERE answer_id = ?",
+                                  [(a,) for a in answer_ids])
+
+    def retry(self, answer_id):
+        """Keeps a candidate queued after it was handled (e.g. a transient Gemini error)."""
+        self._retry.add(answer_id)
+
+    def run(self, handle, packer=None):
+        """
+        Calls `handle([(conversation_id, pair), ...])` for queued candidates,
+        best first, until the queue or a budget runs out. Without a `packer`
+        every call gets one candidate; with one (see backend.prompt_budget)
+        candidates are grouped into requests and their estimated prompt
+        tokens count against the token budget. `handle` returns False when it
+        did not use an LLM call (e.g. all already processed).
+        Returns {"handled", "llm_calls", "tokens", "carried_over", "dropped"}.
+        """
+        start = time.monotonic()
+        self._retry = set()  # a run killed mid-way must not leak its retries into this one
+        ranked = self.ranked()
+        dropped = [pair['id'] for _, _, pair in ranked[MAX_QUEUE:]]
+        if dropped:
+            # Kept in extraction_dropped, so the loss is visible (and the ids
+            # recoverable) outside metrics; re-queued candidates leave it
+            now = time.time()
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO extraction_dropped VALUES (?, ?, ?, ?)",
+                    [(pair['id'], cid, priority, now) for priority, cid, pair in ranked[MAX_QUEUE:]]
+                )
+            self._remove(dropped)
+            ranked = ranked[:MAX_QUEUE]
+            print(f"⚠️  Queue over {MAX_QUEUE}: dropped {len(dropped)} lowest-priority candidates "
+                  f"(listed in extraction_dropped).")
+            log_event("candidates_dropped", level="warning", count=len(dropped), answer_ids=dropped[:100])
+
+        if packer:
+            requests = packer.pack([pair for _, _, pair in ranked])
+        else:
+            requests = [([i], 0) for i in range(len(ranked))]
+
+        handled = calls = tokens = 0
+        for indices, cost in requests:
+            if self.llm_budget and calls >= self.llm_budget:
+                break
+            if self.time_budget and time.monotonic() - start >= self.time_budget:
+                break
+            # The first request always goes out, even if it alone is over the
+            # token budget; otherwise such a budget would never validate anything
+            if self.token_budget and calls and tokens + cost > self.token_budget:
+                break
+            items = [(ranked[i][1], ranked[i][2]) for i in indices]
+            if handle(items) is not False:
+                calls += 1
+                tokens += cost
+            # Remove only after handling, so a crash mid-run keeps the candidates
+            self._remove([pair['id'] for _, pair in items if pair['id'] not in self._retry])
+            handled += len(items)
+        retried, self._retry = len(self._retry), set()
+
+        carried = len(ranked) - handled + retried
+        ITEMS.inc(carried, stage="schedule", outcome="carried_over")
+        ITEMS.inc(len(dropped), stage="schedule", outcome="dropped")
+        log_event("schedule_done", handled=handled, llm_calls=calls, tokens=tokens, carried_over=carried,
+                  dropped=len(dropped))
+        if carried:
+            print(f"⏸️  Budget reached: {carried} candidates carried over to the next run.")
+        return {"handled": handled, "llm_calls": calls, "tokens": tokens, "carried_over": carried,
+                "dropped": len(dropped)}
@@ -0,0 +1,114 @@
+import re
+import html
+
+# Full-text index over the MessageStore (SQLite FTS5, same database file).
+# Rows share the message's rowid, are written in the same transaction as
+# the message itself, and hold the cleaned text only: no markup, CSS or
+# HTML entities, and at most MAX_INDEX_CHARS of body.
+
+MAX_INDEX_CHARS = 10000
+HIGHLIGHT = ("«", "»")
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, sender, body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# bm25 column weights: a hit in the subject or sender counts more than in the body.
+# Stored as the table's default rank, which lets FTS5 sort by it faster.
+RANK = "bm25(5.0, 3.0, 1.0)"
+
+COLUMNS = {"subject": "subject", "from": "sender", "sender": "sender", "body": "body"}
+
+_DROP_BLOCKS = re.compile(r"<(head|style|script)\b.*?</\1\s*>", re.S | re.I)
+_BREAKS = re.compile(r"<(br|/p|/div|/tr|/li)\b[^>]*>", re.I)
+_TAGS = re.compile(r"<[^>]+>")
+_TOKENS = re.compile(r'(\w+:)?("[^"]*"|\S+)')
+
+
+def index_text(content, content_type="html"):
+    """Plain text of a body for indexing (regex-based: fast enough for backfills of 100k+)."""
+    if not content:
+        return ""
+    if (content_type or "").lower() == "html":
+        content = _DROP_BLOCKS.sub(" ", content)
+        content = _BREAKS.sub("\n", content)
+        content = html.unescape(_TAGS.sub(" ", content))
+    return " ".join(content.split())[:MAX_INDEX_CHARS]
+
+
+def to_fts_query(query):
+    """
+    Turns what a user types into a safe FTS5 query:
+      words               all must match (any order)
+      "exact phrase"      phrase match
+      pass*               prefix match
+      subject:invoice     restrict a term to subject / from / body
+    Any other "word:" (error:timeout, a URL) is searched as text, whole.
+    Every term is quoted, so FTS5 operators and punctuation never raise.
+    Returns "" when nothing searchable is left.
+    """
+    terms = []
+    for label, token in _TOKENS.findall(query or ""):
+        column = COLUMNS.get(label[:-1].lower()) if label else None
+        prefix = token.endswith("*") and not token.startswith('"')
+        words = token.strip('"*') if token.startswith('"') else re.sub(r"[^\w]+", " ", token).strip()
+        if label and not column:
+            words = f"{label[:-1]} {words}".strip()
+        if not words:
+            continue
+        term = '"' + words.replace('"', '') + '"' + ("*" if prefix else "")
+        terms.append(f"{column} : {term}" if column else term)
+    return " AND ".join(terms)
+
+
+class SearchIndex:
+    """Writes and queries `messages_fts`; used through the MessageStore."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', ?)", (RANK,))
+
+    def write(self, entries):
+        """(rowid, subject, sender, body_text) tuples; call inside the store's write transaction."""
+        self.conn.executemany("DELETE FROM messages_fts WHERE rowid = ?", [(e[0],) for e in entries])
+        self.conn.executemany(
+            "INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (?, ?, ?, ?)", entries
+        )
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM messages_fts LIMIT 1").fetchone() is None
+
+    def count(self, query):
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return 0
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH ?", (fts_query,)
+            ).fetchone()[0]
+
+    def search(self, query, offset=0, limit=25):
+        """
+        One page of matches, best first: message summaries plus a `snippet`
+        of the body with the matched terms between « and ».
+        """
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT m.id, m.conversation_id, m.sender_name, m.sender_address, m.subject, m.received, "
+                "snippet(messages_fts, 2, ?, ?, '…', 16) AS snippet, messages_fts.rank AS rank "
+                "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+                "WHERE messages_fts MATCH ? ORDER BY messages_fts.rank LIMIT ? OFFSET ?",
+                (HIGHLIGHT[0], HIGHLIGHT[1], fts_query, limit, offset)
+            ).fetchall()
+        return [dict(r) for r in rows]
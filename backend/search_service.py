@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from backend.kb_search import normalize_query
+from backend.metrics import ITEMS, histogram, log_event, render_prometheus
+
+# Local FAQ search service: a small asyncio HTTP/1.1 server (standard
+# library only) in front of the same retrieval calls search_similar makes.
+#
+#   GET /search?q=...&top_k=3   ranked FAQ matches
+#   GET /faq/{id}               one stored FAQ
+#   GET /health, GET /metrics
+#
+# Clients (Pinecone, FAQ store) are built once and stay warm. Identical
+# queries in flight share one lookup, distinct ones arriving together are
+# embedded in one batched call, and answers are kept in a TTL'd LRU cache.
+
+HOST = "127.0.0.1"
+PORT = int(os.getenv("SEARCH_PORT", "8765"))
+CACHE_SIZE = 4096
+CACHE_TTL = 600          # seconds, like the UI's search cache
+BATCH_WINDOW = 0.005     # seconds to gather concurrent queries into one embed call
+EMBED_BATCH = 96         # Pinecone inference accepts up to 96 inputs per call
+MAX_TOP_K = 20
+MAX_REQUEST_BYTES = 16 * 1024
+
+SERVICE_SECONDS = histogram("search_service_seconds", "Search service request latency")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _match(match):
+    meta = dict(match['metadata'] or {})
+    return {
+        "id": match['id'],
+        "score": round(match['score'], 4),
+        "question": meta.get('question'),
+        "answer": meta.get('answer'),
+        "topic": meta.get('topic', 'General'),
+    }
+
+
+class SearchService:
+    """Retrieval with caching, request coalescing and batched query embedding."""
+
+    def __init__(self, index=None, faqs=None, workers=16, cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL,
+                 batch_window=BATCH_WINDOW):
+        if index is None or faqs is None:
+            from backend.clients import get_pinecone, get_faq_store
+            index = index or get_pinecone()
+            faqs = faqs or get_faq_store()
+        self.index = index
+        self.faqs = faqs
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.batch_window = batch_window
+        self.inflight = {}     # (query, top_k) -> Future shared by identical requests
+        self.queue = []        # [(key, future)] waiting for the next embed batch
+        self.flush_task = None
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "lookups": 0, "embed_calls": 0}
+
+    # --- Cache ---
+
+    def _cached(self, key):
+        entry = self.cache.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.cache_ttl:
+            return None
+        self.cache.move_to_end(key)
+        return entry[1]
+
+    def _remember(self, key, results):
+        self.cache[key] = (time.monotonic(), results)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    # --- Retrieval ---
+
+    async def search(self, query, top_k=3):
+        """Ranked matches for `query`. Returns (results, source) with source cache/coalesced/lookup."""
+        key = (normalize_query(query), top_k)
+        self.stats["requests"] += 1
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached, "cache"
+        if key in self.inflight:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self.inflight[key]), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        self.queue.append((key, future))
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+        try:
+            results = await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+        return results, "lookup"
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        self.flush_task = None
+        batch, self.queue = self.queue, []
+        for start in range(0, len(batch), EMBED_BATCH):
+            asyncio.create_task(self._lookup(batch[start:start + EMBED_BATCH]))
+
+    async def _lookup(self, batch):
+        loop = asyncio.get_running_loop()
+        texts = [key[0] for key, _ in batch]
+        try:
+            self.stats["embed_calls"] += 1
+            vectors = await loop.run_in_executor(self.pool, self.index.embed_queries, texts)
+            matches = await asyncio.gather(*[
+                loop.run_in_executor(self.pool, self.index.search_vector, vector, key[1])
+                for vector, (key, _) in zip(vectors, batch)
+            ])
+        except Exception as e:
+            log_event("search_service_failed", queries=len(batch), error=str(e))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.stats["lookups"] += len(batch)
+        for (key, future), found in zip(batch, matches):
+            results = [_match(m) for m in found or []]
+            self._remember(key, results)
+            if not future.done():
+                future.set_result(results)
+
+    async def faq(self, faq_id):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self.faqs.get, faq_id)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+
+# --- HTTP ---
+
+def _response(status, payload, content_type="application/json"):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _route(service, method, target):
+    if method != "GET":
+        return 405, {"error": "only GET is supported"}
+    url = urlsplit(target)
+    if url.path == "/search":
+        params = parse_qs(url.query)
+        query = (params.get("q") or [""])[0].strip()
+        if not query:
+            return 400, {"error": "missing q"}
+        try:
+            top_k = max(1, min(MAX_TOP_K, int((params.get("top_k") or ["3"])[0])))
+        except ValueError:
+            return 400, {"error": "top_k must be an integer"}
+        results, source = await service.search(query, top_k)
+        ITEMS.inc(stage="search_service", outcome=source)
+        return 200, {"query": query, "source": source, "results": results}
+    if url.path.startswith("/faq/"):
+        record = await service.faq(unquote(url.path[len("/faq/"):]))
+        return (200, record) if record else (404, {"error": "FAQ not found"})
+    if url.path == "/health":
+        return 200, {"status": "ok", **service.stats}
+    if url.path == "/metrics":
+        return 200, render_prometheus().encode()
+    return 404, {"error": "not found"}
+
+
+async def _handle(service, reader, writer):
+    try:
+        while True:
+            # Keep-alive: one connection serves requests until the client closes it
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except asyncio.LimitOverrunError:
+                writer.write(_response(413, {"error": "request too large"}))
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, _ = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "bad request line"}))
+                return
+            headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+            if int(headers.get("content-length") or 0):
+                await reader.readexactly(int(headers["content-length"]))
+
+            start = time.perf_counter()
+            try:
+                status, payload = await _route(service, method, target)
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+            SERVICE_SECONDS.observe(time.perf_counter() - start)
+            content_type = "text/plain; version=0.0.4" if isinstance(payload, bytes) else "application/json"
+            writer.write(_response(status, payload, content_type))
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                return
+    finally:
+        writer.close()
+
+
+async def start(service, host=HOST, port=PORT):
+    """Starts serving on host:port and returns the asyncio server."""
+    return await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port,
+                                      limit=MAX_REQUEST_BYTES)
+
+
+def serve(host=HOST, port=PORT, service=None):
+    """Runs the search service until interrupted."""
+    async def main():
+        server = await start(service or SearchService(), host, port)
+        print(f"🔎 FAQ search service on http://{host}:{port} (/search?q=..., /faq/<id>)")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n👋 Search service stopped.")
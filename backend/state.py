@@ -5,15 +5,27 @@ STATE_FILE = "data/processed_state.json"
 FAQ_FILE = "data/faq_metadata.json"
 
 class StateManager:
-    def __init__(self):
+    def __init__(self, data_dir=None, mailbox=None):
+        # Per-mailbox state lives in its own directory; default is the shared data/
+        self.mailbox = mailbox or "default"
+        if data_dir:
+            self.state_file = os.path.join(data_dir, os.path.basename(STATE_FILE))
+            self.faq_file = os.path.join(data_dir, os.path.basename(FAQ_FILE))
+        else:
+            self.state_file = STATE_FILE
+            self.faq_file = FAQ_FILE
+
         # Ensure data directory exists
-        if not os.path.exists("data"):
-            os.makedirs("data")
+        directory = os.path.dirname(self.state_file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._faqs = None
 
         # Load processed IDs
-        if os.path.exists(STATE_FILE):
+        if os.path.exists(self.state_file):
             try:
-                with open(STATE_FILE, "r") as f:
+                with open(self.state_file, "r") as f:
                     self.processed_ids = set(json.load(f))
             except json.JSONDecodeError:
                 self.processed_ids = set()
@@ -28,19 +40,27 @@ class StateManager:
         self._save_state()
 
     def _save_state(self):
-        with open(STATE_FILE, "w") as f:
+        # Write-then-rename: a crash mid-write must not leave a truncated file,
+        # which would load as "nothing processed"
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
             json.dump(list(self.processed_ids), f)
+        os.replace(tmp, self.state_file)
+
+    @property
+    def faqs(self):
+        """
+        The shared FAQ store. Every mailbox writes to it, tagged with its name,
+        so the vectorizer and UI see all of them; a mailbox's own faqs.db (or
+        faq_metadata.json) from before is moved in once.
+        """
+        if self._faqs is None:
+            from backend.clients import get_faq_store
+            self._faqs = get_faq_store()
+            if self.faq_file != FAQ_FILE:
+                directory = os.path.dirname(self.faq_file)
+                self._faqs.adopt(self.mailbox, os.path.join(directory, "faqs.db"), legacy_file=self.faq_file)
+        return self._faqs
 
     def save_faq(self, faq_data):
-        existing_faqs = []
-        if os.path.exists(FAQ_FILE):
-            try:
-                with open(FAQ_FILE, "r") as f:
-                    existing_faqs = json.load(f)
-            except json.JSONDecodeError:
-                pass
-        
-        existing_faqs.append(faq_data)
-        
-        with open(FAQ_FILE, "w") as f:
-            json.dump(existing_faqs, f, indent=4)
+        self.faqs.upsert(dict(faq_data, mailbox=self.mailbox))
@@ -0,0 +1,240 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.metrics import ITEMS, STAGE_SECONDS, histogram, log_event
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suggestions (
+    message_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    faq_id TEXT,
+    question TEXT,
+    answer TEXT,
+    score REAL,
+    status TEXT,
+    draft_id TEXT,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS idx_suggestions_status ON suggestions(status, created);
+"""
+
+# Only matches at least this similar become a suggested reply
+THRESHOLD = float(os.getenv("AUTO_REPLY_THRESHOLD", "0.85"))
+EMBED_BATCH = 96       # Pinecone inference accepts up to 96 inputs per call
+CACHE_SIZE = 2048
+CACHE_TTL = 600        # seconds; FAQ index changes show up after this
+
+SUGGEST_SECONDS = histogram("suggest_seconds", "Time from ingest to reply suggestion, per page")
+
+
+def received_at(message):
+    """receivedDateTime as epoch seconds (0 when missing or unparseable)."""
+    try:
+        return datetime.fromisoformat(message.get('receivedDateTime', '').replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0
+
+
+def query_text(message):
+    """Subject plus the plain-text preview: enough signal for retrieval, cheap to embed."""
+    text = f"{message.get('subject') or ''} {message.get('bodyPreview') or ''}"
+    return " ".join(text.lower().split())[:1000]
+
+
+class SuggestionEngine:
+    """
+    Suggests FAQ answers for incoming customer mail.
+
+    Only mail received after the feature was first enabled is considered
+    (the `suggest_since` watermark), so backfills and hydrated history never
+    get suggestions. Each ingested page is handled in one go: messages
+    already seen, sent by us, or in threads we answered last are skipped, repeated texts are answered from an LRU cache, the rest
+    are embedded in a single batched call and looked up in parallel. Matches
+    above `threshold` are recorded in the `suggestions` table (next to the
+    messages) and, with `create_drafts`, saved as Outlook reply drafts.
+    """
+
+    def __init__(self, store, index, threshold=THRESHOLD, create_drafts=False, outlook=None,
+                 workers=8, threads=None):
+        self.store = store
+        self.threads = threads
+        self.conn = store.conn
+        self.lock = store.lock
+        self.index = index
+        self.threshold = threshold
+        self.create_drafts = create_drafts and outlook is not None
+        self.outlook = outlook
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('suggest_since', ?)",
+                              (int(time.time()),))
+            self.since = self.conn.execute("SELECT value FROM meta WHERE key = 'suggest_since'").fetchone()[0]
+
+    # --- Retrieval cache ---
+
+    def _cached(self, text):
+        with self.cache_lock:
+            entry = self.cache.get(text)
+            if entry is None or time.monotonic() - entry[0] > CACHE_TTL:
+                return None
+            self.cache.move_to_end(text)
+            return entry[1]
+
+    def _remember(self, text, match):
+        with self.cache_lock:
+            self.cache[text] = (time.monotonic(), match)
+            self.cache.move_to_end(text)
+            while len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache.clear()
+
+    def _lookup(self, texts):
+        """Best match ({} if none) per distinct text, embedding only cache misses."""
+        matches = {}
+        missing = []
+        for text in texts:
+            cached = self._cached(text)
+            if cached is not None:
+                matches[text] = cached
+            else:
+                missing.append(text)
+
+        for start in range(0, len(missing), EMBED_BATCH):
+            chunk = missing[start:start + EMBED_BATCH]
+            vectors = self.index.embed_queries(chunk)
+            results = self.pool.map(lambda v: self.index.search_vector(v, top_k=1), vectors)
+            for text, result in zip(chunk, results):
+                best = result[0] if result else None
+                # Cache "no match" too (as an empty dict) so it is not looked up again
+                match = {"id": best['id'], "score": best['score'],
+                         "metadata": dict(best['metadata'] or {})} if best else {}
+                self._remember(text, match)
+                matches[text] = match
+        return matches
+
+    # --- Pipeline stage ---
+
+    def _answered(self, conversation_id, me):
+        thread = self.threads.get_thread(conversation_id) if self.threads and conversation_id else None
+        return bool(thread and me and thread['last_sender'] == me)
+
+    def _new_messages(self, messages, me):
+        candidates = [
+            m for m in messages
+            if m.get('id') and m.get('sender', {}).get('emailAddress', {}).get('address', '').lower() != me
+            and received_at(m) >= self.since
+        ]
+        answered = {cid for cid in {m.get('conversationId') for m in candidates} if self._answered(cid, me)}
+        candidates = [m for m in candidates if m.get('conversationId') not in answered]
+        if not candidates:
+            return []
+        placeholders = ",".join("?" * len(candidates))
+        with self.lock:
+            seen = {r[0] for r in self.conn.execute(
+                f"SELECT message_id FROM suggestions WHERE message_id IN ({placeholders})",
+                [m['id'] for m in candidates]
+            )}
+        return [m for m in candidates if m['id'] not in seen]
+
+    def process(self, messages, my_email_address=""):
+        """
+        Handles one page of newly ingested messages (Graph API dicts).
+        Returns the suggestion records created for confident matches.
+        """
+        start = time.perf_counter()
+        me = (my_email_address or "").lower()
+        messages = self._new_messages(messages, me)
+        if not messages:
+            return []
+
+        texts = {m['id']: query_text(m) for m in messages}
+        try:
+            with STAGE_SECONDS.time(stage="suggest"):
+                matches = self._lookup(list(dict.fromkeys(texts.values())))
+        except Exception as e:
+            # Leave the messages unrecorded so the next run tries again
+            print(f"❌ Suggestion lookup failed: {e}")
+            log_event("suggest_failed", messages=len(messages), error=str(e))
+            return []
+
+        now = time.time()
+        rows, suggested = [], []
+        for message in messages:
+            match = matches.get(texts[message['id']]) or {}
+            meta = match.get('metadata', {})
+            confident = match.get('score', 0) >= self.threshold
+            record = {
+                "message_id": message['id'],
+                "conversation_id": message.get('conversationId'),
+                "faq_id": match.get('id'),
+                "question": meta.get('question'),
+                "answer": meta.get('answer'),
+                "score": match.get('score'),
+                "status": "suggested" if confident else "no_match",
+                "draft_id": None,
+                "created": now,
+            }
+            rows.append(record)
+            if confident:
+                suggested.append(record)
+
+        if self.create_drafts and suggested:
+            self._create_drafts(suggested)
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO suggestions VALUES (:message_id, :conversation_id, :faq_id, "
+                ":question, :answer, :score, :status, :draft_id, :created)", rows
+            )
+
+        # Every message of the page waits for the whole page: one observation per page
+        SUGGEST_SECONDS.observe(time.perf_counter() - start)
+        ITEMS.inc(len(suggested), stage="suggest", outcome="suggested")
+        ITEMS.inc(len(messages) - len(suggested), stage="suggest", outcome="no_match")
+        if suggested:
+            print(f"💡 Suggested replies for {len(suggested)} of {len(messages)} new messages.")
+        return suggested
+
+    def _create_drafts(self, records):
+        """Saves each suggestion as a reply draft in Outlook ($batch createReply)."""
+        from backend.graph.messages import batch_requests
+        requests = [
+            {"method": "POST", "url": f"/me/messages/{r['message_id']}/createReply",
+             "body": {"comment": r['answer']}}
+            for r in records
+        ]
+        try:
+            results = batch_requests(self.outlook, requests, idempotent=False)
+        except Exception as e:
+            print(f"❌ Draft creation failed: {e}")
+            return
+        for record, result in zip(records, results):
+            if result and result['status'] == 201:
+                record['draft_id'] = (result.get('body') or {}).get('id')
+                record['status'] = "drafted"
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+
+def get_suggestion(store, message_id):
+    """The suggested reply recorded for a message, or None (also before the stage ever ran)."""
+    with store.lock:
+        try:
+            row = store.conn.execute(
+                "SELECT * FROM suggestions WHERE message_id = ? AND status != 'no_match'", (message_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return dict(row) if row else None
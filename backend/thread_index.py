@@ -0,0 +1,138 @@
+import json
+import bisect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    conversation_id TEXT PRIMARY KEY,
+    subject TEXT,
+    messages TEXT,
+    participants TEXT,
+    message_count INTEGER,
+    last_activity TEXT,
+    last_sender TEXT,
+    has_my_reply INTEGER,
+    unanswered INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_threads_activity ON threads(last_activity);
+CREATE INDEX IF NOT EXISTS idx_threads_unanswered ON threads(unanswered, last_activity);
+"""
+
+
+class ThreadIndex:
+    """
+    Persistent conversation index kept next to the messages in the MessageStore.
+
+    Each row holds the thread's messages as an ordered list of
+    [receivedDateTime, id, sender] (oldest first) plus the derived fields the
+    views filter on, so listing threads or "awaiting reply" threads never has
+    to regroup the mailbox.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.conn = store.conn
+        self.lock = store.lock
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def update(self, emails, my_email_address=""):
+        """
+        Folds newly arrived messages (Graph API dicts) into their threads.
+        Returns the conversation ids touched by this batch, in first-seen order.
+        """
+        me = (my_email_address or "").lower()
+
+        batch = {}
+        for email in emails:
+            cid = email.get('conversationId')
+            if cid and email.get('id'):
+                batch.setdefault(cid, []).append(email)
+
+        if not batch:
+            return []
+
+        with self.lock, self.conn:
+            for cid, thread_emails in batch.items():
+                row = self.conn.execute(
+                    "SELECT subject, messages, participants FROM threads WHERE conversation_id = ?",
+                    (cid,)
+                ).fetchone()
+
+                if row:
+                    subject = row['subject']
+                    messages = json.loads(row['messages'])
+                    participants = set(json.loads(row['participants']))
+                else:
+                    subject, messages, participants = None, [], set()
+
+                known_ids = {m[1] for m in messages}
+                for email in thread_emails:
+                    if email['id'] in known_ids:
+                        continue
+                    sender = email.get('sender', {}).get('emailAddress', {}).get('address', '').lower()
+                    bisect.insort(messages, [email.get('receivedDateTime', ''), email['id'], sender])
+                    known_ids.add(email['id'])
+                    if sender:
+                        participants.add(sender)
+                    if not subject:
+                        subject = email.get('subject')
+
+                last_received, _, last_sender = messages[-1]
+                has_my_reply = bool(me) and any(m[2] == me for m in messages)
+                unanswered = not (me and last_sender == me)
+
+                self.conn.execute(
+                    """
+                    INSERT OR REPLACE INTO threads
+                        (conversation_id, subject, messages, participants, message_count,
+                         last_activity, last_sender, has_my_reply, unanswered)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (cid, subject, json.dumps(messages), json.dumps(sorted(participants)),
+                     len(messages), last_received, last_sender, int(has_my_reply), int(unanswered))
+                )
+            self.store._bump_version()
+
+        return list(batch)
+
+    @staticmethod
+    def _to_thread(row):
+        messages = json.loads(row['messages'])
+        return {
+            "conversation_id": row['conversation_id'],
+            "subject": row['subject'],
+            "message_ids": [m[1] for m in messages],
+            "participants": json.loads(row['participants']),
+            "message_count": row['message_count'],
+            "last_activity": row['last_activity'],
+            "last_sender": row['last_sender'],
+            "first_sender": messages[0][2] if messages else "",
+            "has_my_reply": bool(row['has_my_reply']),
+            "unanswered": bool(row['unanswered']),
+        }
+
+    def get_thread(self, conversation_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM threads WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()
+        return self._to_thread(row) if row else None
+
+    def count_threads(self, unanswered_only=False):
+        where = " WHERE unanswered = 1" if unanswered_only else ""
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM threads{where}").fetchone()[0]
+
+    def list_threads(self, offset=0, limit=50, unanswered_only=False):
+        """Threads ordered by last activity (newest first)."""
+        where = " WHERE unanswered = 1" if unanswered_only else ""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM threads{where} ORDER BY last_activity DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [self._to_thread(r) for r in rows]
+
+    def awaiting_reply(self, offset=0, limit=50):
+        """Threads whose latest message is from a customer, newest first."""
+        return self.list_threads(offset, limit, unanswered_only=True)
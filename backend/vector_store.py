@@ -0,0 +1,371 @@
+import os
+import json
+import atexit
+import threading
+
+import numpy as np
+
+from backend.metrics import VECTOR_SECONDS
+
+# Local copy of the FAQ (and message) embeddings, searchable without a
+# round trip to Pinecone.
+#
+# Vectors are stored unit-normalized in append-only segments under
+# data/vectors/, each as a set of memory-mapped files:
+#   <n>.f32   full precision, 4 bytes per dimension (read only to re-rank)
+#   <n>.i8    int8 scalar codes, 1 byte per dimension, + <n>.scale per row
+#   <n>.b1    sign bits, 1 bit per dimension
+#   <n>.ids.json  the vector id of each row
+# A search scans the int8 (or binary) codes for a shortlist, then re-scores
+# only the shortlisted rows exactly from the .f32 file, so the full vectors
+# are paged in a few rows at a time and RAM stays close to the code size.
+#
+# One process (the vectorizer) writes; readers such as the UI and the
+# search service pick up its flushes by re-reading manifest.json when it
+# changes. The manifest also records the writer's `checkpoint` (the FAQ
+# store sequence it has mirrored), so readers can tell when they are behind.
+
+VECTOR_DIR = "data/vectors"
+SEGMENT_SIZE = 100_000      # rows per segment after compaction
+FLUSH_EVERY = 4096          # buffered rows written as a new segment
+MAX_SEGMENTS = 16           # more than this and small segments are merged
+RERANK_FACTOR = 10          # shortlist = top_k * RERANK_FACTOR rows re-scored exactly
+SCAN_CHUNK = 4096           # rows scored per step; bounds temporary memory
+MODES = ("int8", "binary", "exact")
+DEFAULT_MODE = os.getenv("VECTOR_QUANT_MODE", "int8")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits):
+    # numpy >= 2.0 counts bits natively; older versions use a lookup table
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return _POPCOUNT[bits]
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize_int8(vectors):
+    """Symmetric per-row int8 codes: (codes, scales) with vector ≈ codes * scale."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors):
+    """One sign bit per dimension, packed 8 per byte."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def _top(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class _Segment:
+    def __init__(self, directory, name, count, dims):
+        self.name = name
+        self.count = count
+        path = os.path.join(directory, name)
+        self.f32 = np.memmap(path + ".f32", dtype=np.float32, mode="r", shape=(count, dims))
+        self.i8 = np.memmap(path + ".i8", dtype=np.int8, mode="r", shape=(count, dims))
+        self.scale = np.memmap(path + ".scale", dtype=np.float32, mode="r", shape=(count,))
+        self.b1 = np.memmap(path + ".b1", dtype=np.uint8, mode="r", shape=(count, (dims + 7) // 8))
+        with open(path + ".ids.json", "r") as f:
+            self.ids = json.load(f)
+        self.alive = np.ones(count, dtype=bool)
+
+    def approximate(self, query, query_bits, mode, start, stop, scratch):
+        if mode == "binary":
+            # Fewer differing sign bits = closer; higher is better
+            return -_popcount(np.bitwise_xor(self.b1[start:stop], query_bits)).sum(axis=1, dtype=np.int32)
+        if mode == "int8":
+            # Widened into a reused buffer: numpy has no fast int8 dot product
+            codes = scratch[:stop - start]
+            np.copyto(codes, self.i8[start:stop])
+            return (codes @ query) * self.scale[start:stop]
+        return self.f32[start:stop] @ query
+
+
+class LocalVectorStore:
+    """
+    Append-only, memory-mapped vector store with quantized first-pass search
+    and exact re-ranking. Re-adding an id replaces it; deletes are
+    tombstones until the next compaction.
+    """
+
+    def __init__(self, directory=VECTOR_DIR, dims=None):
+        self.directory = directory
+        self.dims = dims
+        self.lock = threading.RLock()
+        self.segments = []
+        self.where = {}        # id -> (segment, row); segment None for the write buffer
+        self.deleted = set()   # tombstoned ids not yet compacted away
+        self.buffer_ids = []
+        self.buffer = []
+        self.next_segment = 1
+        self.generation = 0    # bumped on every manifest write
+        self.checkpoint = None
+        self._manifest_key = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        atexit.register(self.flush)
+
+    # --- Manifest ---
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        key = self._stat_key()
+        if key is None:
+            return
+        with open(self._manifest_path(), "r") as f:
+            manifest = json.load(f)
+        if manifest.get('generation', 0) == self.generation and self.segments:
+            self._manifest_key = key
+            return
+        segments = [_Segment(self.directory, e['name'], e['count'], manifest['dims'])
+                    for e in manifest['segments']]
+        self.dims = manifest['dims']
+        self.segments, self.where, self.deleted = segments, {}, set()
+        for segment in segments:
+            self.next_segment = max(self.next_segment, int(segment.name) + 1)
+            for row, vid in enumerate(segment.ids):
+                self._place(vid, (segment, row))
+        for vid in manifest.get('deleted', []):
+            self._drop(vid)
+        self.generation = manifest.get('generation', 0)
+        self.checkpoint = manifest.get('checkpoint')
+        self._manifest_key = key
+
+    def refresh(self):
+        """Re-reads the manifest if another process changed it (cheap when it did not)."""
+        with self.lock:
+            if self.buffer or self._stat_key() == self._manifest_key:
+                return False
+            try:
+                self._load()
+            except (OSError, ValueError, KeyError):
+                # Caught the writer mid-compaction; keep the current view and retry next time
+                return False
+            return True
+
+    def _save_manifest(self):
+        self.generation += 1
+        manifest = {
+            "generation": self.generation,
+            "checkpoint": self.checkpoint,
+            "dims": self.dims,
+            "segments": [{"name": s.name, "count": s.count} for s in self.segments],
+            "deleted": sorted(self.deleted),
+        }
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+        self._manifest_key = self._stat_key()
+
+    def _place(self, vid, location):
+        previous = self.where.get(vid)
+        if previous and previous[0] is not None:
+            previous[0].alive[previous[1]] = False
+        self.where[vid] = location
+
+    def _drop(self, vid):
+        location = self.where.pop(vid, None)
+        if location and location[0] is not None:
+            location[0].alive[location[1]] = False
+            self.deleted.add(vid)
+
+    # --- Writes ---
+
+    def add(self, ids, vectors):
+        """Adds (or replaces) vectors by id. Buffered; written every FLUSH_EVERY rows."""
+        vectors = _normalize(vectors)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("add() takes one vector per id")
+        with self.lock:
+            if self.dims is None:
+                self.dims = vectors.shape[1]
+            if vectors.shape[1] != self.dims:
+                raise ValueError(f"Expected {self.dims}-dimensional vectors, got {vectors.shape[1]}")
+            for vid, vector in zip(ids, vectors):
+                if vid in self.where and self.where[vid][0] is None:
+                    self.buffer[self.where[vid][1]] = vector
+                    continue
+                self._place(vid, (None, len(self.buffer)))
+                self.deleted.discard(vid)
+                self.buffer_ids.append(vid)
+                self.buffer.append(vector)
+            if len(self.buffer) >= FLUSH_EVERY:
+                self.flush()
+        return len(ids)
+
+    def delete(self, ids):
+        with self.lock:
+            pending = [vid for vid in ids if vid in self.where and self.where[vid][0] is None]
+            if pending:
+                self.flush()
+            for vid in ids:
+                self._drop(vid)
+            self._save_manifest()
+        return len(ids)
+
+    def _write_segment(self, ids, vectors):
+        name = f"{self.next_segment:06d}"
+        self.next_segment += 1
+        path = os.path.join(self.directory, name)
+        codes, scales = quantize_int8(vectors)
+        vectors.astype(np.float32).tofile(path + ".f32")
+        codes.tofile(path + ".i8")
+        scales.tofile(path + ".scale")
+        quantize_binary(vectors).tofile(path + ".b1")
+        with open(path + ".ids.json", "w") as f:
+            json.dump(list(ids), f)
+        return _Segment(self.directory, name, len(ids), self.dims)
+
+    def flush(self, checkpoint=None):
+        """
+        Writes buffered vectors as a segment (and merges small segments if
+        there are many). `checkpoint` records how far the writer has got
+        (the vectorizer passes its FAQ store cursor).
+        """
+        with self.lock:
+            if checkpoint is not None and checkpoint != self.checkpoint:
+                self.checkpoint = checkpoint
+                if not self.buffer:
+                    self._save_manifest()
+            if not self.buffer:
+                return
+            with VECTOR_SECONDS.time(op="local_flush"):
+                segment = self._write_segment(self.buffer_ids, np.stack(self.buffer))
+                self.segments.append(segment)
+                for row, vid in enumerate(segment.ids):
+                    self.where[vid] = (segment, row)
+                self.buffer_ids, self.buffer = [], []
+                self._save_manifest()
+            if len(self.segments) > MAX_SEGMENTS:
+                self.compact()
+
+    def compact(self):
+        """Rewrites live rows into full segments, dropping replaced and deleted ones."""
+        with self.lock:
+            self.flush()
+            old = self.segments
+            if not old:
+                return
+            with VECTOR_SECONDS.time(op="local_compact"):
+                new = []
+                ids, parts, size = [], [], 0
+                for segment in old:
+                    rows = np.flatnonzero(segment.alive)
+                    for start in range(0, len(rows), SEGMENT_SIZE):
+                        chunk = rows[start:start + SEGMENT_SIZE]
+                        ids += [segment.ids[r] for r in chunk]
+                        parts.append(np.asarray(segment.f32[chunk]))
+                        size += len(chunk)
+                        if size >= SEGMENT_SIZE:
+                            new.append(self._write_segment(ids, np.concatenate(parts)))
+                            ids, parts, size = [], [], 0
+                if ids:
+                    new.append(self._write_segment(ids, np.concatenate(parts)))
+                self.segments = new
+                self.where = {}
+                for segment in new:
+                    for row, vid in enumerate(segment.ids):
+                        self.where[vid] = (segment, row)
+                self.deleted = set()
+                self._save_manifest()
+            for segment in old:
+                for ext in (".f32", ".i8", ".scale", ".b1", ".ids.json"):
+                    os.remove(os.path.join(self.directory, segment.name + ext))
+
+    # --- Search ---
+
+    def __len__(self):
+        return len(self.where)
+
+    def search(self, vector, top_k=3, mode=DEFAULT_MODE, shortlist=None):
+        """
+        [(id, score)] best first, scores being cosine similarity. `mode` is the
+        first pass: "int8", "binary" or "exact" (full-precision scan, no
+        re-ranking). `shortlist` rows (default top_k * RERANK_FACTOR) from the
+        first pass are re-scored exactly.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}; expected one of {MODES}")
+        query = _normalize(vector)
+        shortlist = max(top_k, shortlist or top_k * RERANK_FACTOR)
+        query_bits = quantize_binary(query[None, :])[0]
+        self.refresh()
+        with self.lock:
+            segments = list(self.segments)
+            buffer_ids, buffer = list(self.buffer_ids), list(self.buffer)
+
+        scratch = np.empty((SCAN_CHUNK, self.dims or 0), dtype=np.float32) if mode == "int8" else None
+        with VECTOR_SECONDS.time(op=f"local_{mode}"):
+            # First pass: best `shortlist` rows per chunk, merged across segments
+            candidates, approx = [], []
+            for segment in segments:
+                for start in range(0, segment.count, SCAN_CHUNK):
+                    stop = min(start + SCAN_CHUNK, segment.count)
+                    scores = segment.approximate(query, query_bits, mode, start, stop, scratch).astype(np.float32)
+                    scores[~segment.alive[start:stop]] = -np.inf
+                    best = _top(scores, shortlist)
+                    candidates += [(segment, start + r) for r in best]
+                    approx.append(scores[best])
+            if not candidates and not buffer:
+                return []
+            approx = np.concatenate(approx) if approx else np.empty(0, dtype=np.float32)
+            keep = _top(approx, shortlist) if mode != "exact" else _top(approx, top_k)
+
+            # Re-rank: exact scores for the shortlisted rows only
+            results = []
+            keep = [i for i in keep if np.isfinite(approx[i])]
+            if mode == "exact":
+                results = [(candidates[i][0].ids[candidates[i][1]], float(approx[i])) for i in keep]
+            else:
+                by_segment = {}
+                for i in keep:
+                    segment, row = candidates[i]
+                    by_segment.setdefault(segment, []).append(row)
+                for segment, rows in by_segment.items():
+                    rows = np.sort(rows)  # in file order, so the page-ins stay sequential
+                    exact = segment.f32[rows] @ query
+                    results += [(segment.ids[r], float(s)) for r, s in zip(rows, exact)]
+            if buffer:
+                scores = np.stack(buffer) @ query
+                results += [(vid, float(s)) for vid, s in zip(buffer_ids, scores)]
+        results.sort(key=lambda r: r[1], reverse=True)
+        return results[:top_k]
+
+    def stats(self):
+        """Row counts and bytes on disk per representation."""
+        rows = sum(s.count for s in self.segments)
+        dims = self.dims or 0
+        return {
+            "vectors": len(self),
+            "rows": rows + len(self.buffer),
+            "segments": len(self.segments),
+            "bytes_f32": rows * dims * 4,
+            "bytes_int8": rows * (dims + 4),
+            "bytes_binary": rows * ((dims + 7) // 8),
+        }
@@ -0,0 +1,96 @@
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.metrics import ITEMS, JOB_SECONDS, log_event
+
+
+def _init_worker(limiters, parse_workers):
+    from backend.mailboxes import share_limiters
+    from backend.processing import set_parse_workers
+    share_limiters(limiters)
+    set_parse_workers(parse_workers)
+
+
+class MailboxPool:
+    """
+    Runs one extraction job per mailbox on a process pool.
+
+    Scheduling is round-robin: each round submits every idle mailbox, least
+    recently started first, and a mailbox whose previous job is still running
+    is skipped rather than queued twice, so a slow or huge mailbox cannot
+    starve the others. Each worker process keeps its own per-mailbox clients
+    (see backend.mailboxes.get_mailbox) between rounds; rate limits are
+    shared by all workers.
+    """
+
+    def __init__(self, entries, job, workers=None):
+        self.entries = entries
+        self.job = job
+        self.workers = workers or min(len(entries), os.cpu_count() or 1)
+        # Rate limits are per mailbox, not per worker: a mailbox's job may land on
+        # any worker, so its buckets live in shared memory created here.
+        # Each worker's thread-parsing pool gets its share of the cores
+        # (unless PARSE_WORKERS is set), so N workers don't start N pools of N.
+        from backend.mailboxes import shared_limiters
+        parse_workers = int(os.getenv("PARSE_WORKERS") or max(1, (os.cpu_count() or 1) // self.workers))
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(shared_limiters(entries), parse_workers))
+        self.running = {}
+        self.last_started = {}
+        self.lock = threading.Lock()
+
+    def _done(self, name, started, future):
+        with self.lock:
+            self.running.pop(name, None)
+        elapsed = time.time() - started
+        try:
+            summary = future.result() or {}
+        except Exception as e:
+            print(f"❌ [{name}] Job crashed: {e}")
+            log_event("mailbox_job_failed", mailbox=name, error=str(e))
+            return
+        # Worker processes have their own metric registries; aggregate here
+        JOB_SECONDS.observe(elapsed, mailbox=name)
+        for outcome in ("fetched", "validated", "rejected", "skipped"):
+            if summary.get(outcome):
+                ITEMS.inc(summary[outcome], stage="mailbox", outcome=outcome, mailbox=name)
+        log_event("mailbox_job_finished", mailbox=name, seconds=round(elapsed, 3), **summary)
+
+    def run_round(self):
+        """Submits a job for every mailbox that is not already running."""
+        submitted = []
+        with self.lock:
+            idle = [e for e in self.entries if e['name'] not in self.running]
+            idle.sort(key=lambda e: self.last_started.get(e['name'], 0))
+            for entry in idle:
+                name = entry['name']
+                started = time.time()
+                self.last_started[name] = started
+                future = self.executor.submit(self.job, entry)
+                self.running[name] = future
+                submitted.append((name, started, future))
+
+        # Outside the lock: a callback runs immediately if the job already finished
+        for name, started, future in submitted:
+            future.add_done_callback(lambda f, n=name, s=started: self._done(n, s, f))
+        skipped = len(self.entries) - len(idle)
+        print(f"📬 Scheduled {len(idle)} mailbox jobs on {self.workers} workers"
+              + (f" ({skipped} still running)" if skipped else ""))
+
+    def wait(self):
+        """Blocks until every submitted job has finished."""
+        while True:
+            with self.lock:
+                pending = list(self.running.values())
+            if not pending:
+                return
+            for future in pending:
+                try:
+                    future.result()
+                except Exception:
+                    pass
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,124 @@
+"""
+Import-time budget for the entry points.
+
+Imports each entry module in a fresh interpreter with `-X importtime` and
+fails (exit 1) if it takes longer than its budget or pulls in one of the
+heavy SDKs, which should only load once a command actually needs them.
+Streamlit scripts draw their page when imported, so for those only the
+module-level import statements are run and timed.
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --budget-ms 150 --top 15
+"""
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry module -> budget in milliseconds (cumulative import time, this machine)
+ENTRY_POINTS = {
+    "cli": 25,
+    "faq_extractor": 60,
+    "run_vectorization": 40,
+    "send_outbox": 50,
+    "backend.search_service": 60,   # asyncio itself is most of it
+}
+
+# Streamlit script -> (budget in milliseconds, heavy modules it may import)
+SCRIPTS = {
+    "main.py": (450, ("streamlit",)),
+}
+
+HEAVY_MODULES = (
+    "google.generativeai", "pinecone", "pandas", "bs4", "msal", "httpx", "streamlit",
+)
+
+PROBE = """
+import sys, json
+{imports}
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+
+def _importtime(code):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def _startup_modules():
+    """Modules the interpreter imports anyway (site, .pth hooks), left out of the report."""
+    return {line.split("|")[-1].strip() for line in _importtime("pass").stderr.splitlines()}
+
+
+def script_imports(path):
+    """The module-level import statements of a script, as source."""
+    with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(module, startup=frozenset(), imports=None):
+    """
+    (total_ms, [(cumulative_ms, name)] of direct imports, heavy modules loaded).
+    With `imports` (source), those statements are timed instead of `import module`.
+    """
+    result = _importtime(PROBE.format(imports=imports or f"import {module}", heavy=HEAVY_MODULES))
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    heavy = json.loads(result.stdout.strip().splitlines()[-1])
+    if imports:
+        # The statements run at the probe's top level: indented by one space
+        top = sorted(((ms, name.strip()) for ms, name in rows if name.startswith(" ")
+                      and not name.startswith("  ") and name.strip() not in startup
+                      and name.strip() != "json"), reverse=True)
+        return sum(ms for ms, _ in top), top, heavy
+    total = next((ms for ms, name in rows if name.strip() == module), 0.0)
+    # Direct imports of the entry module are indented by exactly three spaces
+    top = sorted(((ms, name.strip()) for ms, name in rows if name.startswith("   ")
+                  and not name.startswith("    ") and name.strip() not in startup), reverse=True)
+    return total, top, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check entry-point import times")
+    parser.add_argument("--budget-ms", type=float, help="Override every budget")
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to show")
+    parser.add_argument("--runs", type=int, default=3, help="Take the best of this many runs")
+    args = parser.parse_args()
+
+    startup = _startup_modules()
+    checks = [(module, budget, None, ()) for module, budget in ENTRY_POINTS.items()]
+    checks += [(path, budget, script_imports(path), allowed) for path, (budget, allowed) in SCRIPTS.items()]
+    failed = False
+    for module, budget, imports, allowed in checks:
+        budget = args.budget_ms or budget
+        runs = [measure(module, startup, imports) for _ in range(args.runs)]
+        total, top, heavy = min(runs, key=lambda r: r[0])
+        heavy = [m for m in heavy if m not in allowed]
+        ok = total <= budget and not heavy
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {module}: {total:.1f}ms (budget {budget:.0f}ms)")
+        if heavy:
+            print(f"   heavy modules imported: {', '.join(heavy)}")
+        for ms, name in top[:args.top]:
+            print(f"   {ms:8.1f}ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
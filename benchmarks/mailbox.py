@@ -0,0 +1,143 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+# Synthetic support mailbox.
+# Bodies mimic what Outlook really sends: a CSS block, signatures, a legal
+# disclaimer and the quoted history of the thread, so HTML parsing and
+# storage costs are representative.
+
+AGENT = "support@bench.local"
+
+STYLE = """<head><style>
+p.MsoNormal, li.MsoNormal, div.MsoNormal {margin:0cm; font-size:11.0pt; font-family:"Calibri",sans-serif;}
+a:link, span.MsoHyperlink {color:#0563C1; text-decoration:underline;}
+.MsoChpDefault {font-size:10.0pt;} @page WordSection1 {size:612.0pt 792.0pt; margin:72.0pt 72.0pt 72.0pt 72.0pt;}
+</style></head>"""
+
+DISCLAIMER = (
+    "<p style='font-size:8pt;color:gray'>CONFIDENTIALITY NOTICE: This e-mail and any attachments are "
+    "confidential and intended solely for the addressee. If you received it in error, please notify "
+    "the sender and delete it. Any unauthorised use or disclosure is prohibited.</p>"
+)
+
+TOPICS = [
+    ("password reset", "I requested a password reset link but it never arrived in my inbox, even in spam."),
+    ("user creation", "Creating a new user fails after submitting the form and the user never appears in the list."),
+    ("invoice", "Our latest invoice shows a duplicate charge for the premium plan this month."),
+    ("export", "The CSV export times out for reports larger than a few thousand rows."),
+    ("sso login", "Single sign-on redirects back to the login page in a loop for some of our staff."),
+    ("api limits", "Our integration receives 429 responses from the API well below the documented limit."),
+    ("mobile sync", "The mobile app stopped syncing calendar events after the last update."),
+    ("data import", "Importing contacts from a spreadsheet silently drops rows with accented names."),
+]
+
+ANSWERS = [
+    "Thank you for reaching out. Please clear the browser cache, confirm the address on file, and retry; "
+    "if the problem persists we have escalated it and will follow up within one business day.",
+    "We have identified the cause: a configuration flag on your tenant. It has now been corrected, "
+    "please try again and let us know whether the issue is resolved.",
+    "This is a known issue fixed in version 4.2. Updating to the latest release resolves it; the steps "
+    "are listed in our knowledge base under Troubleshooting.",
+]
+
+
+def _iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _html(paragraphs, signature, quoted=""):
+    body = "".join(f"<p class='MsoNormal'>{p}</p>" for p in paragraphs)
+    return (
+        f"<html>{STYLE}<body><div class='WordSection1'>{body}"
+        f"<p class='MsoNormal'>--<br>{signature}</p>{DISCLAIMER}{quoted}</div></body></html>"
+    )
+
+
+def _quote(message):
+    sender = message['sender']['emailAddress']
+    return (
+        "<div style='border:none;border-top:solid #E1E1E1 1.0pt;padding:3.0pt 0cm 0cm 0cm'>"
+        f"<p class='MsoNormal'><b>From:</b> {sender['name']} &lt;{sender['address']}&gt;<br>"
+        f"<b>Sent:</b> {message['receivedDateTime']}<br><b>Subject:</b> {message['subject']}</p></div>"
+        f"<blockquote>{message['body']['content']}</blockquote>"
+    )
+
+
+def _message(mid, cid, name, address, subject, received, html):
+    text_preview = subject[:60]
+    return {
+        "id": mid,
+        "conversationId": cid,
+        "sender": {"emailAddress": {"name": name, "address": address}},
+        "subject": subject,
+        "receivedDateTime": _iso(received),
+        "bodyPreview": text_preview,
+        "body": {"contentType": "html", "content": html},
+    }
+
+
+def generate_thread(thread_no, start, rng, agent=AGENT, replies=None):
+    """
+    One conversation: a customer question, usually an agent answer, and
+    sometimes a follow-up pair. Every reply quotes the full history.
+    """
+    topic, question = TOPICS[thread_no % len(TOPICS)]
+    customer = f"customer{thread_no % 997}@example.com"
+    cid = f"conv-{thread_no:07d}"
+    subject = f"Issue with {topic} (#{thread_no})"
+    if replies is None:
+        replies = rng.choice([0, 1, 1, 1, 3])
+
+    messages = []
+    when = start
+    first = _message(
+        f"msg-{thread_no:07d}-0", cid, f"Customer {thread_no % 997}", customer, subject, when,
+        _html([f"Hello,", question, "Could you help us resolve this? Thanks."], f"Customer {thread_no % 997}")
+    )
+    messages.append(first)
+
+    for turn in range(1, replies + 1):
+        when = when + timedelta(minutes=rng.randint(5, 600))
+        prev = messages[-1]
+        if turn % 2 == 1:
+            html = _html(["Hi,", rng.choice(ANSWERS), "Best regards,"], "Support Team", _quote(prev))
+            msg = _message(f"msg-{thread_no:07d}-{turn}", cid, "Support Team", agent, "RE: " + subject, when, html)
+        else:
+            html = _html(["Thanks, one more question:", question.replace("The", "Now the")],
+                         f"Customer {thread_no % 997}", _quote(prev))
+            msg = _message(f"msg-{thread_no:07d}-{turn}", cid, f"Customer {thread_no % 997}", customer,
+                           "RE: " + subject, when, html)
+        messages.append(msg)
+
+    return messages
+
+
+def generate_mailbox(thread_count, seed=7, agent=AGENT, start=None):
+    """Returns the messages of `thread_count` threads, newest first (Graph order)."""
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for n in range(thread_count):
+        thread_start = start + timedelta(minutes=n * 17)
+        messages.extend(generate_thread(n, thread_start, rng, agent))
+    messages.sort(key=lambda m: m['receivedDateTime'], reverse=True)
+    return messages
+
+
+def generate_faqs(count, seed=11):
+    """FAQ records shaped like the ones the extractor saves."""
+    rng = random.Random(seed)
+    faqs = []
+    for n in range(count):
+        topic, question = TOPICS[n % len(TOPICS)]
+        faqs.append({
+            "valid": True,
+            "question": f"{question} (case {n})",
+            "answer": rng.choice(ANSWERS),
+            "topic": topic.title(),
+            "keywords": topic.split(),
+            "source_email_id": f"msg-{n:07d}-1",
+            "conversation_id": f"conv-{n:07d}",
+            "timestamp": _iso(datetime(2024, 1, 1) + timedelta(minutes=n)),
+        })
+    return faqs
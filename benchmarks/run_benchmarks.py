@@ -0,0 +1,708 @@
+"""
+Pipeline benchmarks against local Graph/Gemini/Pinecone stand-ins.
+
+Usage:
+    python -m benchmarks.run_benchmarks                       # all scenarios
+    python -m benchmarks.run_benchmarks -s cold_backfill -s search_load
+    python -m benchmarks.run_benchmarks --output bench_output.txt
+    python -m benchmarks.run_benchmarks --baseline bench_output.txt   # fail on regressions
+
+Each scenario runs in its own subprocess (inside a throw-away working
+directory) so peak RSS and on-disk state are measured per scenario.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import resource
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Scenario sizes; override with BENCH_SCALE=0.1 for a quick smoke run
+SCALE = float(os.getenv("BENCH_SCALE", "1"))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(prefix, seconds):
+    return {
+        f"{prefix}_p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        f"{prefix}_p99_ms": round(percentile(seconds, 99) * 1000, 2),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _timed_pages(iter_pages, timings):
+    """Wraps iter_email_pages to record the wait for each page."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        for page in iter_pages(*args, **kwargs):
+            timings.append(time.perf_counter() - start)
+            yield page
+            start = time.perf_counter()
+    return wrapper
+
+
+def _install_stand_ins(graph, gemini=None, pinecone=None):
+    from backend.clients import get_outlook, get_gemini, get_pinecone
+    from benchmarks.simulator import SimulatedOutlook
+    get_outlook.override(SimulatedOutlook(graph))
+    if gemini:
+        get_gemini.override(gemini)
+    if pinecone:
+        get_pinecone.override(pinecone)
+
+
+# --- Scenarios ---
+
+def cold_backfill():
+    """First run over a full mailbox: fetch, index, thread and validate everything."""
+    import faq_extractor
+    from backend.graph import messages as graph_messages
+    from benchmarks.mailbox import generate_mailbox
+    from benchmarks.simulator import GraphSimulator, SimulatedGemini
+
+    messages = generate_mailbox(int(2000 * SCALE))
+    graph = GraphSimulator(messages, latency=0.02, throttle_rate=0.02).start()
+    gemini = SimulatedGemini(latency=0.005, failure_rate=0.01)
+    _install_stand_ins(graph, gemini=gemini)
+
+    pages = []
+    # The extractor imports iter_email_pages when a job starts, so wrap it at the source
+    iter_pages = graph_messages.iter_email_pages
+    graph_messages.iter_email_pages = _timed_pages(iter_pages, pages)
+
+    start = time.perf_counter()
+    try:
+        with quiet():
+            faq_extractor.run_extraction_job(max_count=len(messages))
+    finally:
+        graph_messages.iter_email_pages = iter_pages
+    elapsed = time.perf_counter() - start
+    graph.stop()
+
+    result = {
+        "messages": len(messages),
+        "seconds": round(elapsed, 3),
+        "messages_per_s": round(len(messages) / elapsed, 1),
+        "graph_requests": graph.requests,
+        "graph_throttled": graph.throttled,
+        "llm_calls": gemini.calls,
+    }
+    result.update(latency_summary("page", pages))
+    return result
+
+
+def steady_state():
+    """Repeated 50-message polls while a little new mail arrives between polls."""
+    import random
+    import faq_extractor
+    from datetime import datetime, timedelta, timezone
+    from benchmarks.mailbox import generate_mailbox, generate_thread
+    from benchmarks.simulator import GraphSimulator, SimulatedGemini
+
+    base = generate_mailbox(int(500 * SCALE))
+    graph = GraphSimulator(base, latency=0.02).start()
+    gemini = SimulatedGemini(latency=0.05)
+    _install_stand_ins(graph, gemini=gemini)
+
+    rng = random.Random(1)
+    polls = max(5, int(30 * SCALE))
+    next_thread = len(base)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    timings = []
+
+    with quiet():
+        faq_extractor.run_extraction_job()  # warm-up: seeds state like a running service
+        for _ in range(polls):
+            new = []
+            for _ in range(rng.randint(0, 4)):
+                now += timedelta(minutes=3)
+                new.extend(generate_thread(next_thread, now, rng, replies=1))
+                next_thread += 1
+            graph.add_messages(new)
+
+            start = time.perf_counter()
+            faq_extractor.run_extraction_job()
+            timings.append(time.perf_counter() - start)
+    graph.stop()
+
+    result = {
+        "polls": polls,
+        "polls_per_s": round(polls / sum(timings), 2),
+        "messages_per_s": round(polls * 50 / sum(timings), 1),
+        "llm_calls": gemini.calls,
+    }
+    result.update(latency_summary("poll", timings))
+    return result
+
+
+def vectorization_backlog():
+    """Embedding a large FAQ backlog, then several small incremental rounds."""
+    import run_vectorization
+    from backend.clients import get_faq_store
+    from benchmarks.mailbox import generate_faqs
+    from benchmarks.simulator import GraphSimulator, SimulatedPinecone
+
+    pinecone = SimulatedPinecone(latency=0.05, per_item_latency=0.0005, failure_rate=0.0)
+    graph = GraphSimulator().start()
+    _install_stand_ins(graph, pinecone=pinecone)
+
+    backlog = int(5000 * SCALE)
+    rounds = max(3, int(10 * SCALE))
+    faqs = generate_faqs(backlog + rounds * 20)
+    store = get_faq_store()
+
+    timings = []
+    store.upsert_many(faqs[:backlog])
+    start = time.perf_counter()
+    with quiet():
+        run_vectorization.run_vectorization()
+    backlog_seconds = time.perf_counter() - start
+
+    with quiet():
+        for r in range(1, rounds + 1):
+            store.upsert_many(faqs[backlog + (r - 1) * 20:backlog + r * 20])
+            start = time.perf_counter()
+            run_vectorization.run_vectorization()
+            timings.append(time.perf_counter() - start)
+    graph.stop()
+
+    result = {
+        "faqs": len(pinecone.vectors),
+        "backlog_seconds": round(backlog_seconds, 3),
+        "faqs_per_s": round(backlog / backlog_seconds, 1),
+        "vector_calls": pinecone.calls,
+    }
+    result.update(latency_summary("incremental", timings))
+    return result
+
+
+def search_load():
+    """
+    Concurrent knowledge-base searches through the Search tab's path
+    (backend.kb_search: normalization and caching), with repeated queries
+    typed in different case and spacing as real users produce.
+    """
+    import random
+    from backend.clients import get_kb_search
+    from benchmarks.mailbox import generate_faqs, TOPICS
+    from benchmarks.simulator import GraphSimulator, SimulatedPinecone
+
+    pinecone = SimulatedPinecone(latency=0.03)
+    graph = GraphSimulator().start()
+    _install_stand_ins(graph, pinecone=pinecone)
+    with quiet():
+        pinecone.embed_and_upsert(generate_faqs(int(2000 * SCALE)))
+    pinecone.calls = 0
+
+    rng = random.Random(2)
+    queries = []
+    for _ in range(max(50, int(1000 * SCALE))):
+        query = f"how to fix {rng.choice(TOPICS)[0]}"
+        queries.append(rng.choice([query, query.upper(), "  " + query.capitalize(), query.replace(" ", "  ")]))
+    timings = []
+    kb = get_kb_search()
+
+    def search(query):
+        start = time.perf_counter()
+        kb.search(query, top_k=3)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(search, queries))
+    elapsed = time.perf_counter() - start
+    graph.stop()
+
+    result = {
+        "queries": len(queries),
+        "qps": round(len(queries) / elapsed, 1),
+        "backend_calls": pinecone.calls,
+    }
+    result.update(latency_summary("query", timings))
+    return result
+
+
+def prompt_packing():
+    """Validation prompts for candidates with pasted logs: bounded size, batched requests, run budget."""
+    import random
+    from backend.gemini import VALIDATION_PROMPT
+    from backend.message_store import MessageStore
+    from backend.prompt_budget import PromptPacker, estimate_tokens
+    from backend.scheduler import ExtractionScheduler
+    from benchmarks.mailbox import generate_faqs
+    from benchmarks.simulator import SimulatedGemini
+
+    rng = random.Random(4)
+    pairs = generate_faqs(int(2000 * SCALE))
+    for n, pair in enumerate(pairs):
+        pair['id'] = f"answer-{n}"
+        pair['timestamp'] = "2024-01-01T00:00:00Z"
+        if rng.random() < 0.05:  # customers pasting whole log files
+            pair['question'] += "\n" + "\n".join(
+                f"2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} ERROR sync-{rng.randrange(10**6)} timeout after {rng.randrange(900)}ms"
+                for i in range(rng.randrange(500, 20000)))
+    unbounded = [estimate_tokens(VALIDATION_PROMPT.format(question=p['question'], answer=p['answer'])) for p in pairs]
+
+    store = MessageStore("packing.db")
+    result = {"candidates": len(pairs), "unbounded_max_tokens": max(unbounded),
+              "unbounded_p99_tokens": round(percentile(unbounded, 99))}
+    for per_call in (1, 8):
+        gemini = SimulatedGemini(accept_rate=1.0)
+        gemini.packer = PromptPacker(gemini.packer.fixed_tokens, pairs_per_call=per_call)
+        scheduler = ExtractionScheduler(store, llm_budget=0, time_budget=0, tiers={}, token_budget=0)
+        for pair in pairs:
+            scheduler.add("conv", pair, "customer@example.com", resolved=True)
+        start = time.perf_counter()
+        with quiet():
+            summary = scheduler.run(lambda items: gemini.validate_batch([p for _, p in items]), packer=gemini.packer)
+        elapsed = time.perf_counter() - start
+        result[f"x{per_call}_requests"] = gemini.calls
+        result[f"x{per_call}_max_tokens"] = max(gemini.prompt_tokens)
+        result[f"x{per_call}_mean_tokens"] = round(sum(gemini.prompt_tokens) / gemini.calls)
+        result[f"x{per_call}_build_ms_per_pair"] = round(elapsed / summary["handled"] * 1000, 3)
+
+    # A run capped at 20% of the packed total stops early and carries the rest over
+    gemini = SimulatedGemini(accept_rate=1.0)
+    budget = result["x1_mean_tokens"] * result["x1_requests"] // 5
+    scheduler = ExtractionScheduler(store, tiers={}, token_budget=budget)
+    for pair in pairs:
+        scheduler.add("conv", pair, "customer@example.com", resolved=True)
+    with quiet():
+        summary = scheduler.run(lambda items: gemini.validate_batch([p for _, p in items]), packer=gemini.packer)
+    result["budget_tokens"] = budget
+    result["budget_spent_tokens"] = summary["tokens"]
+    result["budget_carried_over"] = summary["carried_over"]
+    return result
+
+
+def vector_quantization():
+    """Local vector search: int8 and binary first passes with exact re-ranking vs. a full float32 scan."""
+    import numpy as np
+    from backend.vector_store import LocalVectorStore
+
+    dims, count, k = 1024, int(100000 * SCALE), 10
+    rng = np.random.default_rng(3)
+    # Embedding-like data: topic clusters around a shared offset (e5 vectors are far from isotropic)
+    offset = rng.standard_normal(dims).astype(np.float32)
+    centers = offset + rng.standard_normal((64, dims)).astype(np.float32)
+    store = LocalVectorStore("vectors")
+    start = time.perf_counter()
+    for first in range(0, count, 10000):
+        n = min(10000, count - first)
+        vectors = centers[rng.integers(0, len(centers), n)] + 1.5 * rng.standard_normal((n, dims), dtype=np.float32)
+        store.add([f"faq-{first + i}" for i in range(n)], vectors)
+    store.flush()
+    ingest_seconds = time.perf_counter() - start
+
+    queries = [store.segments[0].f32[i] + 0.05 * rng.standard_normal(dims, dtype=np.float32) for i in range(50)]
+    truth = [{vid for vid, _ in store.search(q, top_k=k, mode="exact")} for q in queries]
+
+    stats = store.stats()
+    result = {
+        "vectors": count,
+        "ingest_vectors_per_s": round(count / ingest_seconds),
+        "f32_bytes_per_vector": stats["bytes_f32"] // count,
+        "int8_bytes_per_vector": stats["bytes_int8"] // count,
+        "binary_bytes_per_vector": stats["bytes_binary"] // count,
+    }
+    for mode, shortlist in (("exact", None), ("int8", k * 10), ("binary", k * 10), ("binary", k * 40)):
+        label = mode if shortlist is None else f"{mode}_{shortlist // k}x"
+        latencies, hits = [], 0
+        for q, expected in zip(queries, truth):
+            begin = time.perf_counter()
+            found = store.search(q, top_k=k, mode=mode, shortlist=shortlist)
+            latencies.append(time.perf_counter() - begin)
+            hits += len(expected & {vid for vid, _ in found})
+        result[f"{label}_recall_at_{k}"] = round(hits / (k * len(queries)), 3)
+        result.update(latency_summary(label, latencies))
+    return result
+
+
+def search_service():
+    """The HTTP search service under concurrent load: cache, coalescing and batched embedding."""
+    import asyncio
+    from backend.faq_store import FaqStore
+    from backend.search_service import SearchService, start
+    from benchmarks.mailbox import generate_faqs
+    from benchmarks.search_load_test import default_queries, run_load
+    from benchmarks.simulator import SimulatedPinecone
+
+    pinecone = SimulatedPinecone(latency=0.03)
+    with quiet():
+        pinecone.embed_and_upsert(generate_faqs(int(2000 * SCALE)))
+    pinecone.calls = 0
+    service = SearchService(index=pinecone, faqs=FaqStore("faqs.db"))
+
+    async def load():
+        server = await start(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await run_load(f"http://127.0.0.1:{port}", default_queries(200),
+                                  max(200, int(4000 * SCALE)), concurrency=32)
+
+    result = asyncio.run(load())
+    service.close()
+    result["backend_calls"] = pinecone.calls
+    result["embed_calls"] = service.stats["embed_calls"]
+    return result
+
+
+def bulk_send():
+    """Draining a large outbox of templated FAQ replies through $batch sendMail."""
+    from backend.outbox import Outbox, OutboxSender
+    from benchmarks.mailbox import generate_faqs
+    from benchmarks.simulator import GraphSimulator, SimulatedOutlook
+
+    graph = GraphSimulator(latency=0.05, throttle_rate=0.02).start()
+    outlook = SimulatedOutlook(graph)
+    faqs = generate_faqs(20)
+    count = int(3000 * SCALE)
+
+    outbox = Outbox("data/outbox.db")
+    start = time.perf_counter()
+    for i, faq in enumerate(faqs):
+        outbox.enqueue_template("faq_answer", faq, [
+            {"address": f"customer{n}@example.com", "name": f"Customer {n}"}
+            for n in range(i, count, len(faqs))
+        ])
+    enqueue_seconds = time.perf_counter() - start
+
+    # Unlimited rate: measures the pipeline itself, not Graph's 30/min quota
+    start = time.perf_counter()
+    with quiet():
+        counts = OutboxSender(outlook, outbox, workers=4, per_minute=0).run()
+    elapsed = time.perf_counter() - start
+    graph.stop()
+
+    return {
+        "messages": count,
+        "sent": counts.get("sent", 0),
+        "enqueue_seconds": round(enqueue_seconds, 3),
+        "seconds": round(elapsed, 3),
+        "messages_per_s": round(counts.get("sent", 0) / elapsed, 1),
+        "graph_requests": graph.requests,
+    }
+
+
+def auto_reply():
+    """Reply suggestions for a burst of inbound customer mail, one page at a time."""
+    from datetime import datetime, timezone
+    from backend.message_store import MessageStore
+    from backend.suggestions import SuggestionEngine
+    from benchmarks.mailbox import generate_mailbox, generate_faqs, AGENT
+    from benchmarks.simulator import SimulatedPinecone
+
+    pinecone = SimulatedPinecone(latency=0.03, per_item_latency=0.0002)
+    with quiet():
+        pinecone.embed_and_upsert(generate_faqs(int(2000 * SCALE)))
+    pinecone.calls = 0
+
+    # Mail arriving now: only mail received after the engine was enabled gets suggestions
+    now = datetime.now(timezone.utc)
+    inbound = [m for m in generate_mailbox(int(2000 * SCALE), start=now) if m['id'].endswith("-0")]
+    store = MessageStore("data/mailbox.db")
+    engine = SuggestionEngine(store, pinecone, threshold=0.5)
+
+    timings = []
+    suggested = 0
+    start = time.perf_counter()
+    with quiet():
+        for offset in range(0, len(inbound), 50):
+            page = inbound[offset:offset + 50]
+            page_start = time.perf_counter()
+            store.add_messages(page)
+            suggested += len(engine.process(page, AGENT))
+            # Every message in the page waits for the whole page
+            timings += [time.perf_counter() - page_start] * len(page)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "messages": len(inbound),
+        "suggested": suggested,
+        "messages_per_s": round(len(inbound) / elapsed, 1),
+        "backend_calls": pinecone.calls,
+    }
+    result.update(latency_summary("message", timings))
+    return result
+
+
+def thread_parsing():
+    """Q&A pair extraction over a backfill of threads, serial vs. the process pool."""
+    from itertools import groupby
+    from backend.processing import compact_message, iter_qa_pairs, PARSE_WORKERS
+    from benchmarks.mailbox import generate_mailbox, AGENT
+
+    messages = sorted(generate_mailbox(int(4000 * SCALE)),
+                      key=lambda m: (m['conversationId'], m['receivedDateTime']))
+    threads = [(cid, [compact_message(m) for m in group])
+               for cid, group in groupby(messages, key=lambda m: m['conversationId'])]
+
+    start = time.perf_counter()
+    serial = list(iter_qa_pairs(threads, AGENT, workers=1))
+    serial_seconds = time.perf_counter() - start
+
+    workers = max(2, PARSE_WORKERS)
+    list(iter_qa_pairs(threads[:workers * 64], AGENT, workers=workers))  # start the pool
+    start = time.perf_counter()
+    parallel = list(iter_qa_pairs(threads, AGENT, workers=workers))
+    parallel_seconds = time.perf_counter() - start
+
+    return {
+        "threads": len(threads),
+        "workers": workers,
+        "identical": serial == parallel,
+        "serial_threads_per_s": round(len(threads) / serial_seconds, 1),
+        "threads_per_s": round(len(threads) / parallel_seconds, 1),
+        "speedup": round(serial_seconds / parallel_seconds, 2),
+    }
+
+
+def vector_reconcile():
+    """Reconciling a drifted index: edits, deletes, old uploads without hashes, lost cursor."""
+    import run_vectorization
+    from backend.clients import get_faq_store
+    from backend.reconcile import reconcile
+    from benchmarks.mailbox import generate_faqs
+    from benchmarks.simulator import GraphSimulator, SimulatedPinecone
+
+    pinecone = SimulatedPinecone(latency=0.01, per_item_latency=0.0001)
+    graph = GraphSimulator().start()
+    _install_stand_ins(graph, pinecone=pinecone)
+
+    count = int(5000 * SCALE)
+    store = get_faq_store()
+    faqs = generate_faqs(count)
+    store.upsert_many(faqs)
+    with quiet():
+        run_vectorization.run_vectorization()
+
+    # Drift: 2% edited, 2% deleted locally, 5% uploaded before hashes existed,
+    # 1% never uploaded, and the vectorizer cursor lost
+    step = 50
+    store.upsert_many([dict(f, answer=f['answer'] + " (updated)") for f in faqs[0::step]])
+    store.delete([f['source_email_id'] for f in faqs[1::step]])
+    for f in faqs[2::20]:
+        pinecone.vectors[f['source_email_id']][1].pop('content_hash', None)
+    for f in faqs[3::100]:
+        pinecone.vectors.pop(f['source_email_id'], None)
+    store.set_cursor("vectorizer", None)
+
+    pinecone.calls = 0
+    dry = reconcile(store, pinecone, dry_run=True)
+    applied = reconcile(store, pinecone, dry_run=False)
+    after = reconcile(store, pinecone, dry_run=True)
+    graph.stop()
+
+    return {
+        "faqs": count,
+        "changed": applied["changed"],
+        "metadata_only": applied["metadata_only"],
+        "orphans": applied["orphans"],
+        "missing": applied["missing"],
+        "dry_run_matches": {k: dry[k] for k in ("changed", "orphans", "missing")} ==
+                           {k: applied[k] for k in ("changed", "orphans", "missing")},
+        "in_sync_after": after["ok"] == after["local"] == after["remote"],
+        "dry_run_ms": round(dry["seconds"] * 1000, 1),
+        "apply_ms": round(applied["seconds"] * 1000, 1),
+        "vector_calls": pinecone.calls,
+    }
+
+
+def body_compression():
+    """Dictionary-compressed body storage: size on disk and random-access decode speed."""
+    import random
+    import zlib
+    from backend.message_store import MessageStore
+    from benchmarks.mailbox import generate_mailbox
+
+    messages = generate_mailbox(int(4000 * SCALE))
+    store = MessageStore("bodies.db")
+    start = time.perf_counter()
+    with quiet():
+        for offset in range(0, len(messages), 50):
+            store.add_messages(messages[offset:offset + 50])
+    write_seconds = time.perf_counter() - start
+
+    stats = store.storage_stats()
+    # Baseline: every body compressed on its own, without a dictionary
+    plain = sum(len(zlib.compress(m['body']['content'].encode("utf-8"), 6)) for m in messages)
+
+    ids = [m['id'] for m in messages]
+    random.Random(7).shuffle(ids)
+    start = time.perf_counter()
+    decoded = sum(len(store.get_message(mid)['body']) for mid in ids)
+    read_seconds = time.perf_counter() - start
+
+    return {
+        "messages": stats["messages"],
+        "codec": store.bodies.codec,
+        "raw_mb": round(stats["raw_bytes"] / 1e6, 2),
+        "stored_mb": round(stats["stored_bytes"] / 1e6, 2),
+        "ratio": stats["ratio"],
+        "zlib_no_dict_ratio": round(stats["raw_bytes"] / plain, 2),
+        "write_messages_per_s": round(len(messages) / write_seconds, 1),
+        "decode_messages_per_s": round(len(ids) / read_seconds, 1),
+        "decode_mb_per_s": round(decoded / read_seconds / 1e6, 1),
+    }
+
+
+def mail_search():
+    """Full-text search over a large local mailbox: ranked, prefix, phrase and column queries."""
+    from backend.message_store import MessageStore
+    from benchmarks.mailbox import generate_mailbox, TOPICS
+
+    messages = generate_mailbox(int(50000 * SCALE))
+    store = MessageStore("search.db")
+    start = time.perf_counter()
+    with quiet():
+        for offset in range(0, len(messages), 50):
+            store.add_messages(messages[offset:offset + 50])
+    ingest_seconds = time.perf_counter() - start
+
+    queries = []
+    for topic, text in TOPICS:
+        words = text.split()
+        queries += [topic, f'"{" ".join(words[2:5])}"', f"{words[3][:4]}*", f"subject:{topic.split()[0]}",
+                    f"from:customer{len(queries)}"]
+    latencies = []
+    for query in queries * 3:
+        start = time.perf_counter()
+        store.count_search(query)
+        store.search_messages(query, offset=0, limit=25)
+        latencies.append(time.perf_counter() - start)
+
+    result = {
+        "messages": len(messages),
+        "queries": len(latencies),
+        "ingest_messages_per_s": round(len(messages) / ingest_seconds, 1),
+    }
+    result.update(latency_summary("query", latencies))
+    return result
+
+
+SCENARIOS = {
+    "cold_backfill": cold_backfill,
+    "steady_state": steady_state,
+    "vectorization_backlog": vectorization_backlog,
+    "search_load": search_load,
+    "search_service": search_service,
+    "prompt_packing": prompt_packing,
+    "vector_quantization": vector_quantization,
+    "bulk_send": bulk_send,
+    "auto_reply": auto_reply,
+    "thread_parsing": thread_parsing,
+    "vector_reconcile": vector_reconcile,
+    "body_compression": body_compression,
+    "mail_search": mail_search,
+}
+
+
+def run_child(name):
+    """Runs one scenario in this process from a temporary working directory."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        os.chdir(workdir)
+        result = SCENARIOS[name]()
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_scenario(name):
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", name],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        raise RuntimeError(f"Scenario {name} failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns regression messages: throughput (`*_per_s`, `qps`) must not drop,
+    and latencies (`*_ms`) / memory (`*_mb`) must not grow, by more than `threshold`.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old:
+                continue
+            if metric.endswith("_per_s") or metric == "qps":
+                change = (old - value) / old
+            elif metric.endswith("_ms") or metric.endswith("_mb"):
+                change = (value - old) / old
+            else:
+                continue
+            if change > threshold:
+                regressions.append(f"{name}.{metric}: {old} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed relative regression vs. the baseline (default 0.15)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"⏱️  Running {name}...")
+        results[name] = run_scenario(name)
+        for metric, value in results[name].items():
+            print(f"   {metric:<22} {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Load test for the FAQ search service (backend/search_service.py).
+
+Opens `--concurrency` keep-alive connections and sends `--requests`
+GET /search requests across them, drawing queries from a small pool so
+repeats hit the cache and in-flight coalescing the way real users do.
+Reports QPS, p50/p99 latency and errors.
+
+    python cli.py search-service &
+    python -m benchmarks.search_load_test --concurrency 32 --requests 2000
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import urlsplit, quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.run_benchmarks import percentile
+
+
+def default_queries(count=200, seed=2):
+    from benchmarks.mailbox import TOPICS
+    rng = random.Random(seed)
+    return [f"how to fix {rng.choice(TOPICS)[0]} {rng.randrange(count // len(TOPICS) + 1)}"
+            for _ in range(count)]
+
+
+async def _get(reader, writer, path, host):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.decode("latin-1").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, body
+
+
+async def run_load(url, queries, total, concurrency, top_k=3):
+    """Sends `total` searches over `concurrency` connections. Returns the summary dict."""
+    target = urlsplit(url)
+    host, port = target.hostname, target.port or 80
+    latencies, errors, sources = [], [0], {}
+    counter = iter(range(total))
+    rng = random.Random(7)
+
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in counter:
+                path = f"/search?q={quote(rng.choice(queries))}&top_k={top_k}"
+                start = time.perf_counter()
+                try:
+                    status, body = await _get(reader, writer, path, target.netloc)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    errors[0] += 1
+                    writer.close()
+                    reader, writer = await asyncio.open_connection(host, port)
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors[0] += 1
+                    continue
+                source = json.loads(body)['source']
+                sources[source] = sources.get(source, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "qps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "errors": errors[0],
+        **{f"from_{k}": v for k, v in sorted(sources.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.getenv('SEARCH_PORT', '8765')}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200, help="Size of the query pool")
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.url, default_queries(args.distinct), args.requests,
+                                   args.concurrency, args.top_k))
+    print(f"🔎 {summary['requests']} searches, concurrency {args.concurrency}")
+    for key, value in summary.items():
+        print(f"  {key:<16} {value}")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+import http.server
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.mailbox import AGENT
+
+# Local stand-ins for the three remote services.
+# GraphSimulator is a real HTTP server, so the code under test runs its
+# actual httpx paging/retry path. Gemini and Pinecone are only reached through
+# their SDKs, so they are replaced in-process by objects exposing the same
+# methods as GeminiValidator and PineconeHandler.
+
+
+class GraphSimulator:
+    """
+    Serves /v1.0/me, /me/messages (paged, by id and delta), createReply,
+    /me/sendMail and /$batch from an in-memory mailbox.
+
+    Args:
+        messages: Graph message dicts, newest first.
+        latency: Seconds added to every response.
+        throttle_rate: Probability (0-1) that a request gets a 429.
+        retry_after: Retry-After value sent with 429s.
+        attachments: File attachments per message id.
+    """
+
+    def __init__(self, messages=None, latency=0.0, throttle_rate=0.0, retry_after=0, seed=3,
+                 attachments=None):
+        self.messages = list(messages or [])
+        # message id -> [{"id", "name", "contentType", "content": bytes}]
+        self.attachments = attachments or {}
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.sent = []
+        self.drafts = []
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1.0"
+
+    def add_messages(self, messages):
+        """New mail arrives at the top of the inbox."""
+        with self.lock:
+            self.messages = sorted(messages, key=lambda m: m['receivedDateTime'], reverse=True) + self.messages
+
+    def route(self, method, path, body=None):
+        """Answers one Graph call; returns (status, payload, headers)."""
+        parsed = urlparse(path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        route = parsed.path[len("/v1.0"):] if parsed.path.startswith("/v1.0") else parsed.path
+
+        if method == "GET" and route == "/me":
+            return 200, {"displayName": "Support Team", "mail": AGENT}, None
+        if method == "GET" and route == "/me/messages":
+            top = int(query.get("$top", 10))
+            skip = int(query.get("$skip", 0))
+            with self.lock:
+                messages = self.messages
+                if query.get("$filter", "").startswith("conversationId eq "):
+                    cid = query["$filter"][len("conversationId eq "):].strip("'").replace("''", "'")
+                    messages = [m for m in messages if m.get('conversationId') == cid]
+                page = messages[skip:skip + top]
+                more = skip + top < len(messages)
+            payload = {"value": page}
+            if more:
+                payload["@odata.nextLink"] = f"{self.url}/me/messages?$top={top}&$skip={skip + top}"
+            return 200, payload, None
+        if method == "GET" and "/attachments" in route:
+            parts = route.split("/")  # /me/messages/{id}/attachments[/{aid}/$value]
+            files = self.attachments.get(parts[3], [])
+            if len(parts) == 5:
+                return 200, {"value": [
+                    {"id": a["id"], "name": a["name"], "contentType": a["contentType"],
+                     "size": len(a["content"]), "isInline": False} for a in files
+                ]}, None
+            match = next((a for a in files if a["id"] == parts[5]), None)
+            if match is None:
+                return 404, {"error": {"code": "ErrorItemNotFound"}}, None
+            return 200, match["content"], None
+        if method == "GET" and route.startswith("/me/messages/"):
+            message_id = route.rsplit("/", 1)[1]
+            with self.lock:
+                message = next((m for m in self.messages if m['id'] == message_id), None)
+            if message is None:
+                return 404, {"error": {"code": "ErrorItemNotFound"}}, None
+            return 200, message, None
+        if method == "POST" and route.startswith("/me/messages/") and route.endswith("/createReply"):
+            with self.lock:
+                self.drafts.append({"replyTo": route.split("/")[3], "comment": (body or {}).get("comment")})
+                draft_id = f"draft-{len(self.drafts)}"
+            return 201, {"id": draft_id, "isDraft": True}, None
+        if method == "GET" and route.endswith("/messages/delta"):
+            return 200, self._delta(query), None
+        if method == "POST" and route == "/me/sendMail":
+            with self.lock:
+                self.sent.append(body["message"])
+            return 202, {}, None
+        if method == "POST" and route == "/$batch":
+            return 200, {"responses": [self._batch_item(item) for item in body["requests"]]}, None
+        return 404, {"error": {"code": "NotFound"}}, None
+
+    def _delta(self, query):
+        """
+        Delta paging. Mail only ever arrives at the top of the inbox, so a
+        sync is the slice of messages between two mailbox sizes: `since`
+        (the size at the end of the previous sync) and `until` (the size
+        when this sync started). The delta link carries `until` forward.
+        """
+        top = 50
+        with self.lock:
+            total = len(self.messages)
+            since = int(query.get("$deltatoken", query.get("since", 0)))
+            until = int(query.get("until", total))
+            skip = int(query.get("$skiptoken", 0))
+            changed = self.messages[total - until:total - since]
+        payload = {"value": changed[skip:skip + top]}
+        delta_url = f"{self.url}/me/mailFolders/inbox/messages/delta"
+        if skip + top < len(changed):
+            payload["@odata.nextLink"] = f"{delta_url}?$skiptoken={skip + top}&since={since}&until={until}"
+        else:
+            payload["@odata.deltaLink"] = f"{delta_url}?$deltatoken={until}"
+        return payload
+
+    def _batch_item(self, item):
+        with self.lock:
+            throttle = self.rng.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            status, payload, headers = 429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": str(self.retry_after)}
+        else:
+            status, payload, headers = self.route(item["method"], "/v1.0" + item["url"], item.get("body"))
+        return {"id": item["id"], "status": status, "headers": headers or {}, "body": payload}
+
+    def _handler(self):
+        sim = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, payload, headers=None):
+                raw = isinstance(payload, bytes)
+                data = payload if raw else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method):
+                # Always drain the body so the keep-alive connection stays usable
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                with sim.lock:
+                    sim.requests += 1
+                    throttle = sim.rng.random() < sim.throttle_rate
+                if sim.latency:
+                    time.sleep(sim.latency)
+                if throttle:
+                    with sim.lock:
+                        sim.throttled += 1
+                    self._send(429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": str(sim.retry_after)})
+                    return
+
+                self._send(*sim.route(method, self.path, body))
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                return # Silence logs
+
+        return Handler
+
+    def start(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class SimulatedOutlook:
+    """OutlookService stand-in already "logged in" against a GraphSimulator."""
+
+    def __init__(self, graph):
+        self.graph_url = graph.url
+        self.token_file = "token_cache.json"
+        self.access_token = "bench-token"
+        self.headers = {"Authorization": "Bearer bench-token"}
+
+    def get_token(self, interactive=True):
+        return self.access_token
+
+    def get_my_profile(self):
+        import httpx
+        return httpx.get(f"{self.graph_url}/me", headers=self.headers).json()
+
+    def batch(self, requests, idempotent=True):
+        from backend.graph.messages import batch_requests
+        return batch_requests(self, requests, idempotent=idempotent)
+
+
+class SimulatedGemini:
+    """GeminiValidator stand-in with configurable latency, failure and acceptance rates."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, accept_rate=0.8, seed=5, per_token_latency=0.0):
+        from backend.gemini import prompt_packer
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.failure_rate = failure_rate
+        self.accept_rate = accept_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.packer = prompt_packer()
+        self.calls = 0
+        self.failures = 0
+        self.prompt_tokens = []   # estimated size of every prompt sent
+
+    def _call(self, pairs, raise_errors=False):
+        from backend.gemini import build_prompt
+        from backend.prompt_budget import estimate_tokens
+        tokens = estimate_tokens(build_prompt(pairs, self.packer))
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens.append(tokens)
+            fail = self.rng.random() < self.failure_rate
+            accepted = [self.rng.random() < self.accept_rate for _ in pairs]
+        delay = self.latency + self.per_token_latency * tokens
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self.lock:
+                self.failures += 1
+            if raise_errors:
+                raise RuntimeError("simulated Gemini failure")
+            print("Gemini Error: simulated failure")
+            return [None] * len(pairs)
+        return [
+            {
+                "valid": True,
+                "question": pair['question'],
+                "answer": pair['answer'],
+                "topic": "Bench",
+                "keywords": pair['question'].split()[:3],
+            } if accept else None
+            for pair, accept in zip(pairs, accepted)
+        ]
+
+    def validate_and_extract(self, question, answer):
+        return self._call([{"question": question, "answer": answer}])[0]
+
+    def validate_batch(self, pairs):
+        return self._call(pairs, raise_errors=True)
+
+
+def _embed(text, dims=64):
+    """Deterministic bag-of-words vector, good enough for ranking stand-in results."""
+    vector = [0.0] * dims
+    for word in text.lower().split():
+        h = int(hashlib.md5(word.encode()).hexdigest(), 16)
+        vector[h % dims] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class SimulatedPinecone:
+    """PineconeHandler stand-in backed by an in-memory index."""
+
+    def __init__(self, latency=0.0, per_item_latency=0.0, failure_rate=0.0, seed=9):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.vectors = {}
+        self.calls = 0
+        self.failures = 0
+
+    def _call(self, items=1):
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.failure_rate
+        delay = self.latency + self.per_item_latency * items
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self.lock:
+                self.failures += 1
+        return not fail
+
+    def embed_and_upsert(self, faqs):
+        if not faqs:
+            return 0
+        if not self._call(len(faqs)):
+            print("❌ Pinecone Error: simulated failure")
+            return 0
+        with self.lock:
+            for faq in faqs:
+                text = f"Question: {faq['question']}\nAnswer: {faq['answer']}"
+                metadata = {
+                    "question": faq['question'],
+                    "answer": faq['answer'],
+                    "topic": faq.get('topic', 'General'),
+                    "source_id": faq.get('source_email_id'),
+                    "text": text,
+                }
+                if faq.get('content_hash'):
+                    metadata['content_hash'] = faq['content_hash']
+                self.vectors[faq.get('source_email_id') or faq.get('id')] = (_embed(text), metadata)
+        return len(faqs)
+
+    def delete(self, ids):
+        if not self._call(len(ids)):
+            raise RuntimeError("simulated delete failure")
+        with self.lock:
+            for vid in ids:
+                self.vectors.pop(vid, None)
+        return len(ids)
+
+    def list_ids(self, page_size=100):
+        with self.lock:
+            ids = sorted(self.vectors)
+        for start in range(0, len(ids), page_size):
+            self._call()
+            yield ids[start:start + page_size]
+
+    def fetch_metadata(self, ids):
+        self._call(len(ids))
+        with self.lock:
+            return {vid: dict(self.vectors[vid][1]) for vid in ids if vid in self.vectors}
+
+    def fetch_vectors(self, ids):
+        self._call(len(ids))
+        with self.lock:
+            return {vid: list(self.vectors[vid][0]) for vid in ids if vid in self.vectors}
+
+    def update_metadata(self, vector_id, metadata):
+        self._call()
+        with self.lock:
+            if vector_id in self.vectors:
+                self.vectors[vector_id][1].update(metadata)
+
+    def embed_queries(self, texts):
+        if not self._call(len(texts)):
+            raise RuntimeError("simulated embedding failure")
+        return [_embed(text) for text in texts]
+
+    def search_vector(self, vector, top_k=3):
+        if not self._call():
+            raise RuntimeError("simulated query failure")
+        with self.lock:
+            scored = [
+                {"id": vid, "score": sum(a * b for a, b in zip(vector, vec)), "metadata": meta}
+                for vid, (vec, meta) in self.vectors.items()
+            ]
+        scored.sort(key=lambda m: m['score'], reverse=True)
+        return scored[:top_k]
+
+    def search_similar(self, query, top_k=3):
+        if not self._call():
+            print("❌ Search Error: simulated failure")
+            return []
+        q = _embed(query)
+        with self.lock:
+            scored = [
+                {"id": vid, "score": sum(a * b for a, b in zip(q, vec)), "metadata": meta}
+                for vid, (vec, meta) in self.vectors.items()
+            ]
+        scored.sort(key=lambda m: m['score'], reverse=True)
+        return scored[:top_k]
@@ -0,0 +1,139 @@
+import os
+import sys
+import argparse
+
+# One entry point for the whole tool:
+#   python cli.py fetch | extract | resume | vectorize | search "query" | search-service | serve
+#
+# Every subcommand imports its module inside the handler, so `--help` and
+# the cheap commands never load msal, httpx, Gemini, Pinecone or Streamlit.
+# benchmarks/import_budget.py keeps it that way.
+
+
+def cmd_fetch(args):
+    """Fetches and indexes new mail without running the LLM."""
+    from dotenv import load_dotenv
+    from backend.mailboxes import default_mailbox, get_mailbox, load_registry
+
+    load_dotenv()
+    mailbox = default_mailbox()
+    if args.mailbox:
+        by_name = {e['name']: e for e in load_registry()}
+        if args.mailbox not in by_name:
+            sys.exit(f"Unknown mailbox: {args.mailbox}")
+        mailbox = get_mailbox(by_name[args.mailbox])
+
+    from faq_extractor import run_extraction_job
+    summary = run_extraction_job(max_count=args.max_count, mailbox=mailbox, fetch_only=True)
+    return 0 if summary is not None else 1
+
+
+def cmd_resume(args):
+    """Finishes interrupted extraction runs: checkpointed results and the queue, no fetch."""
+    from faq_extractor import main
+    main(["--resume"] + (["--mailbox", args.mailbox] if args.mailbox else []))
+    return 0
+
+
+def cmd_extract(args):
+    """The background extractor (same flags as `python faq_extractor.py`)."""
+    from faq_extractor import main
+    main(args.extractor_args)
+    return 0
+
+
+def cmd_vectorize(args):
+    from dotenv import load_dotenv
+    load_dotenv()
+    import run_vectorization
+    if args.local:
+        run_vectorization.run_local_backfill()
+    elif args.reconcile:
+        run_vectorization.run_reconciliation(dry_run=args.dry_run)
+    else:
+        run_vectorization.run_vectorization()
+    return 0
+
+
+def cmd_search(args):
+    from dotenv import load_dotenv
+    from backend.clients import get_pinecone
+
+    load_dotenv()
+    results = get_pinecone().search_similar(args.query, top_k=args.top_k)
+    if not results:
+        print("No matching FAQs found.")
+        return 1
+    for match in results:
+        meta = match['metadata'] or {}
+        print(f"[{match['score']:.2f}] {meta.get('question', '')}")
+        print(f"       {meta.get('answer', '')}")
+        print(f"       ({meta.get('topic', 'General')})\n")
+    return 0
+
+
+def cmd_search_service(args):
+    from dotenv import load_dotenv
+    from backend.search_service import serve
+
+    load_dotenv()
+    serve(host=args.host, port=args.port)
+    return 0
+
+
+def cmd_serve(args):
+    from run_app import run_app
+    run_app()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Outlook FAQ extractor")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fetch = commands.add_parser("fetch", help="Fetch and index new mail (no LLM)")
+    fetch.add_argument("--mailbox", help="Registry mailbox to fetch (default: the main account)")
+    fetch.add_argument("--max-count", type=int, help="Stop after this many messages")
+    fetch.set_defaults(handler=cmd_fetch)
+
+    extract = commands.add_parser("extract", help="Run the FAQ extractor (see `extract -- --help`)")
+    extract.add_argument("extractor_args", nargs=argparse.REMAINDER,
+                         help="Arguments passed to the extractor, e.g. --once --suggest")
+    extract.set_defaults(handler=cmd_extract)
+
+    resume = commands.add_parser("resume", help="Finish interrupted extraction runs without fetching")
+    resume.add_argument("--mailbox", help="Registry mailbox to resume (default: all)")
+    resume.set_defaults(handler=cmd_resume)
+
+    vectorize = commands.add_parser("vectorize", help="Embed new and changed FAQs into Pinecone")
+    vectorize.add_argument("--reconcile", action="store_true",
+                           help="Compare the whole index with the FAQ store and fix differences")
+    vectorize.add_argument("--dry-run", action="store_true", help="With --reconcile: only report")
+    vectorize.add_argument("--local", action="store_true",
+                           help="Copy the whole index into the local quantized vector store")
+    vectorize.set_defaults(handler=cmd_vectorize)
+
+    search = commands.add_parser("search", help="Search the FAQ knowledge base")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, default=3)
+    search.set_defaults(handler=cmd_search)
+
+    service = commands.add_parser("search-service", help="Serve FAQ search over local HTTP")
+    service.add_argument("--host", default="127.0.0.1")
+    service.add_argument("--port", type=int, default=int(os.getenv("SEARCH_PORT", "8765")))
+    service.set_defaults(handler=cmd_search_service)
+
+    serve = commands.add_parser("serve", help="Start the extractor and the Streamlit UI")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "extractor_args", None) and args.extractor_args[0] == "--":
+        args.extractor_args = args.extractor_args[1:]
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,107 +1,379 @@
 import time
-import schedule
 import os
+import argparse
 from dotenv import load_dotenv
-from outlook_client import OutlookService
-from read_emails import get_all_emails
-from backend.processing import ThreadProcessor
-from backend.state import StateManager
-from backend.gemini import GeminiValidator
+from backend.processing import compact_message, iter_qa_pairs
+from backend.clients import get_gemini
+from backend.gemini import IncompleteResponse
+from backend.checkpoints import LeaseLost
+from backend.mailboxes import default_mailbox, get_mailbox, load_registry
+from backend.metrics import (
+    STAGE_SECONDS, JOB_SECONDS, ITEMS, log_event, start_metrics_server, SamplingProfiler
+)
+
+# The Graph client (httpx, msal), the worker pool and the scheduler are
+# imported where they are used, so `--help`, `--login` and the CLI start fast.
 
 # Load environment logic
 load_dotenv()
 
-def run_extraction_job():
-    print(f"\n🚀 Starting FAQ Extraction Job at {time.strftime('%H:%M:%S')}...")
+def run_extraction_job(max_count=None, profile_file=None, mailbox=None, fetch_only=False, resume=False):
+    """
+    Runs one extraction pass over `mailbox` (default: the single-account setup).
+    With `profile_file`, the run is sampled by the SamplingProfiler and its
+    collapsed stacks are written to that file. With `fetch_only`, new mail
+    is fetched and indexed but no threads are sent to the LLM. With `resume`,
+    no mail is fetched: the run only finishes what earlier runs checkpointed
+    or left queued. Only one run per mailbox works at a time (the ledger's
+    run lease); another one started meanwhile skips.
+    Returns a summary dict of counts, or None if the run could not start.
+    """
+    mailbox = mailbox or default_mailbox()
+    max_count = max_count or mailbox.max_count
+    try:
+        if profile_file:
+            with SamplingProfiler(profile_file):
+                return _run_extraction_job(max_count, mailbox, fetch_only, resume)
+        return _run_extraction_job(max_count, mailbox, fetch_only, resume)
+    except LeaseLost as e:
+        # Stalled past its lease and another run took over; leave the rest to it
+        print(f"⚠️  Run {e} lost the mailbox lease to another run; stopping.")
+        return None
+
+def run_mailbox_job(entry):
+    """Worker-pool entry point: one job for one registry entry."""
+    load_dotenv()
+    return run_extraction_job(mailbox=get_mailbox(entry))
+
+def _run_extraction_job(max_count, mailbox, fetch_only=False, resume=False):
+    from backend.graph.messages import iter_email_pages
+    from backend.attachments import with_attachment_text
+    from backend.checkpoints import SETTLED
+
+    print(f"\n🚀 Starting FAQ Extraction Job [{mailbox.name}] at {time.strftime('%H:%M:%S')}...")
+    log_event("job_started", mailbox=mailbox.name, max_count=max_count)
+    job_start = time.perf_counter()
     
     # 1. Initialize Services
     try:
-        outlook = OutlookService()
-        token = outlook.get_token(interactive=False) # Ensure we have a token
+        # Clients are built once per process and reused across scheduled runs
+        outlook = None if resume else mailbox.outlook()
+        token = resume or outlook.get_token(interactive=False) # Ensure we have a token
         if not token:
             print("❌ Outlook Token missing. Skipping run.")
             return
 
-        gemini = GeminiValidator()
-        state_db = StateManager()
-        processor = ThreadProcessor()
+        gemini = None if fetch_only else get_gemini()
+        state_db = mailbox.state()
+        store = mailbox.store()
+        thread_index = mailbox.thread_index()
+        hydrator = mailbox.hydrator()
+        scheduler = mailbox.scheduler()
+        # Run ids and per-candidate checkpoints (backend/checkpoints.py)
+        ledger = mailbox.ledger()
+        # Tells the UI (another process reading the same stores) when new data lands
+        changes = mailbox.changes()
+        # Optional stage: FAQ-based reply suggestions for new customer mail
+        suggester = mailbox.suggestions() if os.getenv("AUTO_REPLY_SUGGESTIONS") else None
+        # Optional stage: download attachments and use their text in the Q&A pairs
+        attachments = mailbox.attachments() if os.getenv("INGEST_ATTACHMENTS") else None
         
-        # Get My Email Address (to identify answers)
-        me = outlook.get_my_profile().get('mail') or outlook.get_my_profile().get('userPrincipalName')
-        print(f"📧 Identifed Support Agent: {me}")
+        # Get My Email Address (to identify answers); a resume fetches
+        # nothing and uses the one the last fetch published
+        me = (changes.info("profile") or {}).get('mail') if resume else None
+        if not resume:
+            profile = outlook.get_my_profile()
+            me = profile.get('mail') or profile.get('userPrincipalName')
+            print(f"📧 Identifed Support Agent: {me}")
+            changes.publish("profile", mail=me, name=profile.get('displayName'))
 
     except Exception as e:
         print(f"❌ Initialization Error: {e}")
         return
 
-    # 2. Fetch Emails (Last 50)
-    print("📥 Fetching recent emails...")
-    emails = get_all_emails(outlook, max_count=50)
-    
-    # Group by Conversation
-    threads = {}
-    for email in emails:
-        cid = email.get('conversationId')
-        if cid:
-            if cid not in threads: threads[cid] = []
-            threads[cid].append(email)
-            
-    print(f"🧵 Found {len(threads)} active threads.")
+    new_faqs = 0
+    rejected = 0
+    skipped = 0
+    failed = 0
+    recovered = 0
+
+    def settle(answer_id, metadata):
+        # The verdict is checkpointed already; FAQ upserts are keyed by id and
+        # content hash, so repeating this after a crash writes nothing twice
+        with STAGE_SECONDS.time(stage="state_write"):
+            if metadata:
+                state_db.save_faq(metadata)
+                ledger.record_saved(answer_id, run_id)
+            state_db.mark_processed(answer_id)
+
+    if not fetch_only:
+        run_id, interrupted = ledger.start_run(mailbox.name)
+        if run_id is None:
+            print(f"⏳ Another extraction run is working on [{mailbox.name}]; skipping.")
+            return
+        if interrupted:
+            print(f"♻️  Picking up after interrupted run(s): {', '.join(interrupted)}")
+        # Gemini results checkpointed by an earlier run but never saved: no new calls needed
+        for answer_id, cid, metadata in ledger.checkpointed():
+            settle(answer_id, metadata)
+            recovered += 1
+            new_faqs += 1
+        if recovered:
+            print(f"💾 Saved {recovered} FAQs validated before the last interruption.")
+        ledger.refresh_vectorized(state_db.faqs)
+
+    # 2. Fetch Emails (Last `max_count`, 50 by default)
+    touched = []
+    fetched = 0
+    if resume:
+        print(f"⏯️  Resuming: {scheduler.pending()} queued candidates, no new mail fetched.")
+    else:
+        print("📥 Fetching recent emails...")
+    # Index page by page; the thread index groups it by conversation incrementally
+    pages = iter([]) if resume else iter_email_pages(outlook, max_count=max_count,
+                                                     rate_limiter=mailbox.graph_limiter)
+    while True:
+        with STAGE_SECONDS.time(stage="fetch"):
+            page = next(pages, None)
+        if page is None:
+            break
+        fetched += len(page)
+        if not fetch_only:
+            ledger.renew(run_id)
+        with STAGE_SECONDS.time(stage="index"):
+            store.add_messages(page)
+            touched += [cid for cid in thread_index.update(page, me) if cid not in touched]
+        if attachments:
+            attachments.ingest(outlook, page)
+        if suggester:
+            suggester.process(page, me)
+        changes.publish("messages", fetched=fetched)
+
+    # Threads cut off by the fetch window (only our reply fetched) get their
+    # earlier messages by conversationId, once per conversation
+    hydrated = 0 if resume else hydrator.hydrate(outlook, touched, me)
+    if hydrated:
+        changes.publish("messages", fetched=fetched, hydrated=hydrated)
+
+    ITEMS.inc(fetched, stage="fetch", outcome="fetched")
+    log_event("fetch_done", mailbox=mailbox.name, messages=fetched, threads=len(touched))
+    print(f"🧵 Found {len(touched)} active threads.")
+    if fetch_only:
+        summary = {"fetched": fetched, "threads": len(touched)}
+        changes.publish("job", **summary)
+        return summary
 
     # 3. Process Threads
-    new_faqs = 0
-    
-    for cid, thread_emails in threads.items():
-        # Check if already processed (optimization: check latest message ID)
-        # But for now, we process potential pairs.
-        
-        pair = processor.extract_qa_pair(thread_emails, me)
+    # Whole known conversations, already ordered by the index, as compact
+    # records; large backfills are parsed on a process pool
+    def load_threads():
+        for cid in touched:
+            thread = thread_index.get_thread(cid)
+            yield cid, [compact_message(e) for e in store.get_messages(thread['message_ids'])]
+
+    pairs = iter_qa_pairs(load_threads(), me, total=len(touched)) if touched else iter([])
+    while True:
+        with STAGE_SECONDS.time(stage="parse"):
+            item = next(pairs, None)
+            if item is None:
+                break
+            cid, pair = item
+            ledger.renew(run_id)
+            if pair and attachments:
+                question_files = attachments.text_for(pair['question_id'])
+                answer_files = attachments.text_for(pair['id'])
+                pair['question'] = with_attachment_text(pair['question'], question_files)
+                pair['answer'] = with_attachment_text(pair['answer'], answer_files)
+                pair['attachments'] = question_files + answer_files
         
         if pair:
-            msg_id = pair['id']
-            
             # Check if this specific Answer has been processed
-            if state_db.is_processed(msg_id):
+            if state_db.is_processed(pair['id']):
                 print(f"⏭️  Skipping processed thread: {pair['subject'][:30]}...")
+                ITEMS.inc(stage="extract", outcome="skipped")
+                skipped += 1
+                continue
+            # Gemini already answered for this exact text (e.g. a crash before it was marked)
+            if ledger.track(cid, pair, run_id) in SETTLED:
+                ITEMS.inc(stage="extract", outcome="skipped")
+                skipped += 1
                 continue
-                
+            # Queue it; validation runs best-first below, within the run's budgets
+            thread = thread_index.get_thread(cid)
+            scheduler.add(cid, pair, pair.get('question_sender'), resolved=thread['last_sender'] == me)
+
+    def record(cid, pair, metadata):
+        nonlocal new_faqs, rejected
+        msg_id = pair['id']
+        if metadata:
+            print("✅ Valid FAQ Found! Saving...")
+
+            # Add extra metadata
+            metadata['source_email_id'] = msg_id
+            metadata['conversation_id'] = cid
+            metadata['subject'] = pair['subject']
+            metadata['timestamp'] = pair['timestamp']
+            if pair.get('attachments'):
+                metadata['attachments'] = [name for name, _ in pair['attachments']]
+            ITEMS.inc(stage="extract", outcome="validated")
+            new_faqs += 1
+        else:
+            print("⚠️  Gemini rejected (Not a valid FAQ).")
+            ITEMS.inc(stage="extract", outcome="rejected")
+            rejected += 1
+
+        # 5. Checkpoint the (paid) verdict first, then save and mark state
+        ledger.record_result(msg_id, run_id, metadata)
+        settle(msg_id, metadata)
+
+    def validate(items):
+        # Raises LeaseLost before paying for pairs another run now owns
+        ledger.renew(run_id)
+        # Carried over and handled elsewhere in the meantime, or already answered
+        items = [(cid, pair) for cid, pair in items if not state_db.is_processed(pair['id'])]
+        for cid, pair in items:
+            ledger.track(cid, pair, run_id)
+        items = [(cid, pair) for cid, pair in items if ledger.needs_llm(pair)]
+        if not items:
+            return False
+
+        for _, pair in items:
             print(f"🔍 Analyzing candidate: {pair['subject']}")
-            
-            # 4. Validate with Gemini
-            metadata = gemini.validate_and_extract(pair['question'], pair['answer'])
-            
-            if metadata:
-                print("✅ Valid FAQ Found! Saving...")
-                
-                # Add extra metadata
-                metadata['source_email_id'] = msg_id
-                metadata['conversation_id'] = cid
-                metadata['timestamp'] = pair['timestamp']
-                
-                # 5. Save and Mark State
-                state_db.save_faq(metadata)
-                state_db.mark_processed(msg_id)
-                new_faqs += 1
-            else:
-                print("⚠️  Gemini rejected (Not a valid FAQ).")
-                # Optional: Mark as processed anyway so we don't re-check? 
-                # Better to leave it in case logic improves, but to avoid loop cost we can mark it.
-                state_db.mark_processed(msg_id) 
 
+        def fail(failed_items, error):
+            nonlocal failed
+            # Not a rejection: keep the pairs queued for the next run
+            print(f"⚠️  Gemini call failed, will retry: {error}")
+            for _, pair in failed_items:
+                if ledger.record_failure(pair['id'], run_id, error):
+                    scheduler.retry(pair['id'])
+            ITEMS.inc(len(failed_items), stage="extract", outcome="failed")
+            failed += len(failed_items)
+
+        # 4. Validate with Gemini (prompts are kept within PROMPT_TOKEN_BUDGET)
+        mailbox.llm_limiter.acquire()
+        missing = set()
+        try:
+            with STAGE_SECONDS.time(stage="llm"):
+                results = gemini.validate_batch([pair for _, pair in items])
+        except IncompleteResponse as e:
+            # Keep the verdicts we got; pairs left without one are retried
+            results, missing = e.results, set(e.missing)
+            fail([items[i] for i in e.missing], e)
+        except Exception as e:
+            fail(items, e)
+            return
+
+        for position, ((cid, pair), metadata) in enumerate(zip(items, results)):
+            if position not in missing:
+                record(cid, pair, metadata)
+
+    scheduled = scheduler.run(validate, packer=gemini.packer)
+
+    elapsed = time.perf_counter() - job_start
+    JOB_SECONDS.observe(elapsed)
+    summary = {"fetched": fetched, "threads": len(touched), "validated": new_faqs,
+               "rejected": rejected, "skipped": skipped, "failed": failed, "recovered": recovered,
+               "carried_over": scheduled["carried_over"]}
+    ledger.finish_run(run_id, summary)
+    log_event("job_finished", mailbox=mailbox.name, run_id=run_id, seconds=round(elapsed, 3), **summary)
+    if new_faqs:
+        changes.publish("faqs", added=new_faqs)
+    changes.publish("job", **summary)
     print(f"🎉 Job Complete. Extracted {new_faqs} new FAQs.")
+    return summary
 
-def main():
-    print("⏳ FAQ Extractor Service Started (Interval: 10 mins)")
-    
-    # Run once immediately
-    run_extraction_job()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background FAQ extractor")
+    parser.add_argument("--once", action="store_true", help="Run a single job and exit")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Sample the first job run and write collapsed stacks to FILE")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("EMAILFETCH_METRICS_PORT", "0")),
+                        help="Serve Prometheus metrics on this local port")
+    parser.add_argument("--mailbox", help="Only process this mailbox from the registry")
+    parser.add_argument("--workers", type=int, help="Worker processes for multi-mailbox runs")
+    parser.add_argument("--login", metavar="MAILBOX", help="Sign in to a registry mailbox and exit")
+    parser.add_argument("--attachments", action="store_true",
+                        help="Download attachments and use their text in extraction (INGEST_ATTACHMENTS=1)")
+    parser.add_argument("--suggest", action="store_true",
+                        help="Suggest FAQ answers for new customer mail (AUTO_REPLY_SUGGESTIONS=1)")
+    parser.add_argument("--drafts", action="store_true",
+                        help="Also save confident suggestions as Outlook reply drafts (AUTO_REPLY_DRAFTS=1)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Finish checkpointed and queued candidates without fetching mail, then exit")
+    args = parser.parse_args(argv)
+
+    # Environment, so worker processes pick the settings up too
+    if args.suggest or args.drafts:
+        os.environ["AUTO_REPLY_SUGGESTIONS"] = "1"
+    if args.drafts:
+        os.environ["AUTO_REPLY_DRAFTS"] = "1"
+    if args.attachments:
+        os.environ["INGEST_ATTACHMENTS"] = "1"
+
+    entries = load_registry()
+    by_name = {e['name']: e for e in entries}
+
+    if args.login:
+        if args.login not in by_name:
+            parser.error(f"Unknown mailbox: {args.login}")
+        get_mailbox(by_name[args.login]).outlook().get_token(interactive=True)
+        return
+
+    if args.mailbox:
+        if args.mailbox not in by_name:
+            parser.error(f"Unknown mailbox: {args.mailbox}")
+        entries = [by_name[args.mailbox]]
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    if args.resume:
+        for entry in entries:
+            run_extraction_job(mailbox=get_mailbox(entry), resume=True)
+        return
+
+    # A single mailbox runs in-process exactly as before
+    if len(entries) == 1:
+        mailbox = get_mailbox(entries[0])
+        job = lambda: run_extraction_job(mailbox=mailbox)
+
+        if args.once:
+            run_extraction_job(profile_file=args.profile, mailbox=mailbox)
+            return
+
+        print("⏳ FAQ Extractor Service Started (Interval: 10 mins)")
+        # Run once immediately
+        run_extraction_job(profile_file=args.profile, mailbox=mailbox)
+    else:
+        from backend.worker_pool import MailboxPool
+        pool = MailboxPool(entries, run_mailbox_job, workers=args.workers)
+        job = pool.run_round
+
+        if args.once:
+            pool.run_round()
+            pool.wait()
+            pool.shutdown()
+            return
+
+        print(f"⏳ FAQ Extractor Service Started for {len(entries)} mailboxes (Interval: 10 mins)")
+        pool.run_round()
     
     # Schedule
-    schedule.every(10).minutes.do(run_extraction_job)
-    
+    import schedule
+    from backend.clients import get_change_feed
+    schedule.every(10).minutes.do(job)
+
+    # Between runs, wait on the change feed: "Refresh" in the UI asks for a run now
+    feed = get_change_feed()
+    seen = {"refresh": feed.versions().get("refresh", 0)}
     while True:
         schedule.run_pending()
-        time.sleep(1)
+        versions = feed.wait(seen, timeout=1)
+        if versions:
+            seen["refresh"] = versions["refresh"]
+            print("🔔 Refresh requested from the UI")
+            job()
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
-from bs4 import BeautifulSoup
-from outlook_client import OutlookService
-from read_emails import get_all_emails
+from backend.clients import (
+    get_outlook, get_kb_search, get_message_store, get_thread_index, get_faq_store, get_change_feed,
+    reset_clients
+)
+from backend.message_store import SORT_COLUMNS
+from backend.suggestions import get_suggestion
 import time
 
 # ... (rest of imports/config)
@@ -18,28 +20,98 @@ st.set_page_config(
 def clean_html(html_content):
     if not html_content:
         return ""
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html_content, "html.parser")
     # get_text with separator handles <br> and <p> better
     return soup.get_text(separator="\n").strip()
 
-# --- Session State ---
-if 'outlook' not in st.session_state:
-    st.session_state.outlook = OutlookService()
+def data_frame(rows, columns):
+    # pandas is only loaded when a table is first drawn, like bs4 above
+    import pandas as pd
+    return pd.DataFrame(rows, columns=columns)
+
+# Only successful lookups are cached: st.cache_data does not keep a call that raised
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_profile():
+    profile = get_outlook().get_my_profile()
+    if not profile or "error" in profile:
+        raise RuntimeError(f"Profile lookup failed: {profile}")
+    return profile
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Inbox queries are keyed by the store version, so cached pages are reused
+# until new mail is written and the UI never holds more than one page.
+# FAQ reads are keyed by the FAQ store's sequence number, like the inbox by version
+@st.cache_data(max_entries=64, show_spinner=False)
+def count_faqs(version, topic, keyword):
+    return get_faq_store().count(topic=topic, keyword=keyword)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_faq_page(version, offset, limit, topic, keyword):
+    return get_faq_store().list(offset, limit, topic=topic, keyword=keyword)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_faq_topics(version):
+    return get_faq_store().topics()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def count_emails(version, sender, subject):
+    return get_message_store().count_messages(sender=sender, subject=subject)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_email_page(version, offset, limit, sort_by, descending, sender, subject):
+    return get_message_store().list_messages(
+        offset=offset, limit=limit, sort_by=sort_by, descending=descending,
+        sender=sender, subject=subject
+    )
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def count_search(version, query):
+    return get_message_store().count_search(query)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def search_emails(version, query, offset, limit):
+    return get_message_store().search_messages(query, offset=offset, limit=limit)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def count_threads(version, unanswered_only):
+    return get_thread_index().count_threads(unanswered_only=unanswered_only)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_thread_page(version, offset, limit, unanswered_only):
+    return get_thread_index().list_threads(offset=offset, limit=limit, unanswered_only=unanswered_only)
 
-if 'emails' not in st.session_state:
-    st.session_state.emails = []
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_thread_messages(version, conversation_id):
+    thread = get_thread_index().get_thread(conversation_id)
+    return get_message_store().get_messages(thread['message_ids']) if thread else []
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_email_body(version, message_id):
+    message = get_message_store().get_message(message_id)
+    return clean_html(message['body']) if message else ""
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_suggestion(version, message_id):
+    return get_suggestion(get_message_store(), message_id)
 
 # --- Sidebar ---
 st.sidebar.title("📧 Connections")
 
 # Initialize logic
-outlook = st.session_state.outlook
+outlook = get_outlook()
 token = outlook.get_token(interactive=False)
+my_address = ""
 
 if token:
     st.sidebar.success("✅ Connected to Outlook")
     try:
-        profile = outlook.get_my_profile()
+        # The extractor publishes the profile it signed in with; Graph is only
+        # asked before it has ever run
+        profile = get_change_feed().info("profile")
+        profile = {"mail": profile['mail'], "displayName": profile.get('name')} if profile else load_profile()
+        my_address = profile.get('mail') or profile.get('userPrincipalName') or ""
         st.sidebar.write(f"**User**: {profile.get('displayName')}")
         st.sidebar.write(f"**Email**: {profile.get('mail') or profile.get('userPrincipalName')}")
     except:
@@ -47,10 +119,11 @@ if token:
 
     if st.sidebar.button("Logout (Clear Cache)", type="primary"):
         import os
+        outlook.tokens.stop()
         if os.path.exists(outlook.token_file):
             os.remove(outlook.token_file)
-        st.session_state.emails = [] 
         st.cache_data.clear()
+        reset_clients()
         st.rerun()
 
 else:
@@ -85,83 +158,180 @@ st.title("📬 Your Inbox")
 # --- Tabs ---
 tab1, tab2, tab3 = st.tabs(["📧 Emails", "🤖 Extracted FAQs", "🔎 AI Search"])
 
+# The background extractor writes to the same local stores; the UI never
+# fetches mail itself. This fragment polls the change feed and reruns the
+# page when the extractor publishes new messages or FAQs.
+WATCHED_CHANNELS = ("messages", "faqs", "job")
+
+@st.fragment(run_every=2)
+def watch_changes():
+    feed = get_change_feed()
+    seen = st.session_state.setdefault("seen_versions", {c: feed.versions().get(c, 0) for c in WATCHED_CHANNELS})
+    versions = feed.changed(seen)
+    if versions:
+        st.session_state["seen_versions"] = {c: versions.get(c, 0) for c in WATCHED_CHANNELS}
+        st.rerun()
+
+    job = feed.info("job")
+    if job:
+        st.caption(f"🔁 Last sync {time.strftime('%H:%M:%S', time.localtime(job['updated']))}: "
+                   f"{job.get('fetched', 0)} messages, {job.get('validated', 0)} new FAQs")
+    else:
+        st.caption("The background extractor has not run yet (`python cli.py serve`).")
+
 with tab1:
+    store = get_message_store()
     col1, col2 = st.columns([1, 5])
     with col1:
         if st.button("🔄 Refresh Emails"):
-            with st.spinner("Fetching emails..."):
-                st.session_state.emails = get_all_emails(outlook, max_count=50)
+            get_change_feed().publish("refresh")
+            st.toast("Asked the extractor to fetch new mail; the list updates when it lands.")
+    with col2:
+        watch_changes()
 
     # --- Display Data ---
-    emails = st.session_state.emails
-
-    if emails:
-        # Convert to DataFrame for easier handling
-        data = []
-        for email in emails:
-            sender = email.get('sender', {}).get('emailAddress', {}).get('name', 'Unknown')
-            sender_email = email.get('sender', {}).get('emailAddress', {}).get('address', '')
-            subject = email.get('subject', '(No Subject)')
-            received = email.get('receivedDateTime', '')
-            body_preview = email.get('bodyPreview', '')
-            
-            # Get and clean body content
-            raw_body = email.get('body', {}).get('content', '')
-            clean_body = clean_html(raw_body)
-            
-            conversation_id = email.get('conversationId', '')
-            
-            data.append({
-                "Sender": sender,
-                "Subject": subject,
-                "Received": received,
-                "Preview": body_preview,
-                "Body": clean_body,
-                "ConversationID": conversation_id,
-                "FullData": email
-            })
-
-        df = pd.DataFrame(data)
-        
-        # --- Main Table ---
-        st.subheader("📊 Emails")
+    version = store.version
+
+    if version:
+        view = st.radio("View", ["Messages", "Conversations", "Awaiting reply", "Search"], horizontal=True)
+
+        if view == "Search":
+            # Local full-text index over every stored message; no Graph call
+            q1, q2 = st.columns([5, 1])
+            search_query = q1.text_input(
+                "Search mail", placeholder='password reset · "duplicate charge" · sync* · subject:invoice · from:acme'
+            ).strip()
+            page_size = q2.selectbox("Results per page", PAGE_SIZES, index=0)
+
+            if search_query:
+                total = count_search(version, search_query)
+                page_count = max(1, -(-total // page_size))
+                page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+                rows = search_emails(version, search_query, (page - 1) * page_size, page_size)
+                st.subheader(f"🔎 {total} matching emails")
+
+                event = st.dataframe(
+                    data_frame(
+                        [{"Sender": r['sender_name'], "Subject": r['subject'], "Received": r['received'],
+                          "Match": r['snippet']} for r in rows],
+                        columns=["Sender", "Subject", "Received", "Match"]
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                    on_select="rerun",
+                    selection_mode="single-row",
+                    key="search_table"
+                )
+                if event.selection.rows:
+                    row = rows[event.selection.rows[0]]
+                    with st.expander(f"✉️ {row['subject']}", expanded=True):
+                        st.caption(f"From: {row['sender_name']} <{row['sender_address']}> | {row['received']}")
+                        st.text(load_email_body(version, row['id']))
+        elif view == "Messages":
+            f1, f2, f3, f4 = st.columns([2, 2, 1, 1])
+            sender_filter = f1.text_input("Sender", placeholder="name or address").strip()
+            subject_filter = f2.text_input("Subject contains").strip()
+            sort_by = f3.selectbox("Sort by", list(SORT_COLUMNS), format_func=str.title)
+            page_size = f4.selectbox("Rows per page", PAGE_SIZES, index=1)
+            descending = st.toggle("Descending", value=True)
+
+            total = count_emails(version, sender_filter, subject_filter)
+            page_count = max(1, -(-total // page_size))
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+
+            rows = load_email_page(
+                version, (page - 1) * page_size, page_size, sort_by, descending,
+                sender_filter, subject_filter
+            )
+            df = data_frame(rows, columns=["id", "sender_name", "subject", "received", "preview", "conversation_id"])
+            df.columns = ["ID", "Sender", "Subject", "Received", "Preview", "ConversationID"]
         
-        # Sort for best visibility
-        df = df.sort_values(by="Received", ascending=False)
-
-        st.dataframe(
-            df[["Sender", "Subject", "Received", "Body", "ConversationID"]],
-            use_container_width=True, # Keeping this as it is standard in recent versions, user log might be from older or specific version. 
-            # Actually, let's use the exact suggestion: width='stretch' is for Styler, but for st.dataframe it is use_container_width.
-            # The log said: "For use_container_width=True, use width='stretch'". This suggests st.column_config or similar context?
-            # Wait, st.dataframe `use_container_width` IS the replacement for `width`. 
-            # If the user is on a VERY new version where `use_container_width` is deprecated (unlikely, it's the new standard), 
-            # or a very old one. 
-            # Let's check the log again: "Please replace `use_container_width` with `width`". This implies `use_container_width` is DEPRECATED?
-            # Streamlit 1.42+ might revert? 
-            # Let's try explicitly setting width to 1000 or similar if responsive is an issue, OR just ignore it if it works.
-            # But I will try to follow instructions.
-            # Actually, standard st.dataframe uses `use_container_width`. 
-            # If I look closely at the log: "For `use_container_width=True`, use `width='stretch'`".
-            # This looks like a Pandas Styler warning passed through Streamlit?
-            # Or is it Streamlit itself?
-            # I will trust the standard `use_container_width=True` for now, maybe the log is misleading or from a specific widget.
-            # BUT, I will remove `use_container_width=True` and see if `width=None` works better, or just leave it.
-            # Let's stick to the plan: "Fix deprecation warnings".
-            # I will replace `use_container_width=True` with `width=None` (default) and let Streamlit handle it, 
-            # OR better, if I want it wide, I'll rely on `layout="wide"` in page config.
+            # --- Main Table ---
+            st.subheader(f"📊 Emails ({total})")
+
+            event = st.dataframe(
+                df[["Sender", "Subject", "Received", "Preview", "ConversationID"]],
+                use_container_width=True, # Keeping this as it is standard in recent versions, user log might be from older or specific version. 
+                # Actually, let's use the exact suggestion: width='stretch' is for Styler, but for st.dataframe it is use_container_width.
+                # The log said: "For use_container_width=True, use width='stretch'". This suggests st.column_config or similar context?
+                # Wait, st.dataframe `use_container_width` IS the replacement for `width`. 
+                # If the user is on a VERY new version where `use_container_width` is deprecated (unlikely, it's the new standard), 
+                # or a very old one. 
+                # Let's check the log again: "Please replace `use_container_width` with `width`". This implies `use_container_width` is DEPRECATED?
+                # Streamlit 1.42+ might revert? 
+                # Let's try explicitly setting width to 1000 or similar if responsive is an issue, OR just ignore it if it works.
+                # But I will try to follow instructions.
+                # Actually, standard st.dataframe uses `use_container_width`. 
+                # If I look closely at the log: "For `use_container_width=True`, use `width='stretch'`".
+                # This looks like a Pandas Styler warning passed through Streamlit?
+                # Or is it Streamlit itself?
+                # I will trust the standard `use_container_width=True` for now, maybe the log is misleading or from a specific widget.
+                # BUT, I will remove `use_container_width=True` and see if `width=None` works better, or just leave it.
+                # Let's stick to the plan: "Fix deprecation warnings".
+                # I will replace `use_container_width=True` with `width=None` (default) and let Streamlit handle it, 
+                # OR better, if I want it wide, I'll rely on `layout="wide"` in page config.
             
-            # Re-reading: The warning is likely about `st.dataframe` in newer Streamlit versions preferring a different param?
-            # No, `use_container_width` was introduced to REPLACE `width`. 
-            # Maybe the user has an old version? 
-            # I'll stick with `use_container_width=True` but if I really want to fix it I'd need to know the version.
-            # User has `streamlit` in requirements.txt.
-            # I'll try just removing the line if it causes noise, or leave it. 
-            # Decision: I will leave it for now to ensure layout logic remains, as the warning is non-blocking.
-            # I will just clean up the code.
-            hide_index=True,
-            height=600
-        )
+                # Re-reading: The warning is likely about `st.dataframe` in newer Streamlit versions preferring a different param?
+                # No, `use_container_width` was introduced to REPLACE `width`. 
+                # Maybe the user has an old version? 
+                # I'll stick with `use_container_width=True` but if I really want to fix it I'd need to know the version.
+                # User has `streamlit` in requirements.txt.
+                # I'll try just removing the line if it causes noise, or leave it. 
+                # Decision: I will leave it for now to ensure layout logic remains, as the warning is non-blocking.
+                # I will just clean up the code.
+                hide_index=True,
+                height=600,
+                on_select="rerun",
+                selection_mode="single-row",
+                key="inbox_table"
+            )
+
+            # Bodies are only loaded for the row the user opens
+            if event.selection.rows:
+                row = rows[event.selection.rows[0]]
+                with st.expander(f"✉️ {row['subject']}", expanded=True):
+                    st.caption(f"From: {row['sender_name']} <{row['sender_address']}> | {row['received']}")
+                    st.text(load_email_body(version, row['id']))
+                    suggestion = load_suggestion(version, row['id'])
+                    if suggestion:
+                        drafted = " (saved as draft in Outlook)" if suggestion['draft_id'] else ""
+                        st.info(f"💡 **Suggested reply** ({suggestion['score']:.2f}){drafted}\n\n{suggestion['answer']}")
+                        st.caption(f"From FAQ: {suggestion['question']}")
+        else:
+            unanswered_only = view == "Awaiting reply"
+            page_size = st.selectbox("Threads per page", PAGE_SIZES, index=1)
+            total = count_threads(version, unanswered_only)
+            page_count = max(1, -(-total // page_size))
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+
+            threads = load_thread_page(version, (page - 1) * page_size, page_size, unanswered_only)
+            st.subheader(f"🧵 Conversations ({total})")
+
+            event = st.dataframe(
+                data_frame(
+                    [{
+                        "Subject": t['subject'],
+                        "Messages": t['message_count'],
+                        "Participants": ", ".join(t['participants']),
+                        "Last Activity": t['last_activity'],
+                        "Replied": "✅" if t['has_my_reply'] else "",
+                    } for t in threads],
+                    columns=["Subject", "Messages", "Participants", "Last Activity", "Replied"]
+                ),
+                use_container_width=True,
+                hide_index=True,
+                height=600,
+                on_select="rerun",
+                selection_mode="single-row",
+                key="thread_table"
+            )
+
+            if event.selection.rows:
+                thread = threads[event.selection.rows[0]]
+                for message in load_thread_messages(version, thread['conversation_id']):
+                    sender = message['sender']['emailAddress']
+                    with st.expander(f"✉️ {sender['name']} | {message['receivedDateTime']}"):
+                        st.text(load_email_body(version, message['id']))
 
     elif token:
         st.info("No emails loaded. Click 'Refresh Emails' to fetch.")
@@ -171,30 +341,34 @@ with tab1:
 with tab2:
     st.header("🤖 AI Extracted FAQs")
     st.markdown("These are Question & Answer pairs automatically extracted from your email threads.")
-    
-    faq_file = "data/faq_metadata.json"
-    processed_file = "data/processed_state.json"
-    
-    import json
-    import os
-    
-    if os.path.exists(faq_file):
-        with open(faq_file, "r") as f:
-            try:
-                faqs = json.load(f)
-                if faqs:
-                    st.success(f"Found {len(faqs)} FAQs")
-                    
-                    for i, faq in enumerate(faqs):
-                        with st.expander(f"Q: {faq.get('question')[:100]}..."):
-                            st.markdown(f"**Question:**\n{faq.get('question')}")
-                            st.markdown(f"**Answer:**\n{faq.get('answer')}")
-                            st.caption(f"Topic: {faq.get('topic')} | Keywords: {', '.join(faq.get('keywords', []))}")
-                            # st.json(faq)
-                else:
-                    st.warning("No FAQs extracted yet.")
-            except:
-                st.error("Error reading FAQ file.")
+
+    faq_store = get_faq_store()
+    faq_version = faq_store.version
+
+    if faq_version:
+        topics = load_faq_topics(faq_version)
+        c1, c2, c3 = st.columns([2, 2, 1])
+        topic_filter = c1.selectbox(
+            "Topic", [None] + [t for t, _ in topics],
+            format_func=lambda t: "All topics" if t is None else f"{t} ({dict(topics)[t]})"
+        )
+        keyword_filter = c2.text_input("Keyword").strip()
+        faq_page_size = c3.selectbox("FAQs per page", [10, 25, 50], index=1)
+
+        faq_total = count_faqs(faq_version, topic_filter, keyword_filter)
+        faq_pages = max(1, -(-faq_total // faq_page_size))
+        faq_page = st.number_input(f"Page (of {faq_pages})", min_value=1, max_value=faq_pages, value=1,
+                                   key="faq_page")
+        st.success(f"Found {faq_total} FAQs")
+
+        for faq in load_faq_page(faq_version, (faq_page - 1) * faq_page_size, faq_page_size,
+                                 topic_filter, keyword_filter):
+            with st.expander(f"Q: {faq.get('question')[:100]}..."):
+                st.markdown(f"**Question:**\n{faq.get('question')}")
+                st.markdown(f"**Answer:**\n{faq.get('answer')}")
+                mailbox_note = f" | Mailbox: {faq['mailbox']}" if faq.get('mailbox', 'default') != 'default' else ""
+                st.caption(f"Topic: {faq.get('topic')} | Keywords: {', '.join(faq.get('keywords', []))} | ID: {faq['id']}"
+                           + mailbox_note)
     else:
         st.info("No extracted data found. Run `python faq_extractor.py` to start the process.")
 
@@ -205,11 +379,9 @@ with tab3:
     if st.button("Search", type="primary"):
         if query:
             try:
-                from backend.pinecone_handler import PineconeHandler
-                pc = PineconeHandler()
-                
                 with st.spinner("Searching knowledge base..."):
-                    results = pc.search_similar(query, top_k=3)
+                    # Cached per normalized query (backend.kb_search); errors are not cached
+                    results = get_kb_search().search(query, top_k=3)
                 
                 # Check if we have any relevant results
                 relevant_results = [r for r in results if r['score'] > 0.75]
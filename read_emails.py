@@ -1,78 +1,16 @@
-import httpx
-from outlook_client import OutlookService
-
-def get_all_emails(outlook, max_count=50):
-    """
-    Fetches emails from the user's inbox.
-    
-    Args:
-        outlook: The authenticated OutlookService instance.
-        max_count: Maximum number of emails to retrieve (use 9999 for 'all')
-    """
-    print(f"🔄 Connecting to Outlook...")
-    
-    # 1. Ensure we are logged in
-    token = outlook.get_token()
-    if not token:
-        print("❌ Login failed. Cannot retrieve emails.")
-        return []
-
-    # 2. API Setup
-    endpoint = "https://graph.microsoft.com/v1.0/me/messages"
-    
-    # Optimize the request: 
-    # - Get 50 at a time ($top)
-    # - Sort by newest first ($orderby)
-    # - Only get fields we need ($select) to make it faster
-    params = {
-        "$top": "50",
-        "$orderby": "receivedDateTime DESC",
-        "$select": "sender,subject,receivedDateTime,bodyPreview,body,conversationId"
-    }
-
-    all_messages = []
-    
-    print("📥 Starting download...")
-
-    # 3. Pagination Loop (The "Next Page" Logic)
-    while endpoint and len(all_messages) < max_count:
-        try:
-            # Make the request
-            response = httpx.get(endpoint, headers=outlook.headers, params=params)
-            response.raise_for_status() # Raise error if 401/403/500
-            
-            data = response.json()
-            messages = data.get('value', [])
-            
-            # Add this batch to our total list
-            all_messages.extend(messages)
-            print(f"   ...Fetched {len(messages)} emails (Total: {len(all_messages)})")
-            
-            # 4. Check for the "Next Page" Link
-            # If Microsoft has more emails, they give us a specifically formatted URL
-            endpoint = data.get('@odata.nextLink')
-            
-            # Important: The 'nextLink' already contains the params (top, select, etc.)
-            # so we must clear our manual params for the next loop iteration.
-            params = None 
-            
-            if len(all_messages) >= max_count:
-                print("🛑 Reached email limit.")
-                break
-                
-        except httpx.HTTPStatusError as e:
-            print(f"❌ HTTP Error: {e}")
-            break
-        except Exception as e:
-            print(f"❌ Unexpected Error: {e}")
-            break
-
-    return all_messages
+from backend.graph import OutlookService
+# The paging helpers moved to backend/graph/messages.py; re-exported for existing callers
+from backend.graph.messages import (
+    DEFAULT_SELECT, iter_email_pages, iter_emails, aiter_email_pages, aiter_emails,
+    strip_html, project, get_all_emails,
+)
 
 # --- Execution ---
 if __name__ == "__main__":
     # Initialize your auth class
     my_app = OutlookService()
+    # First run opens the browser login; later runs use the saved token
+    my_app.get_token()
     
     # Fetch the emails (Change 50 to 1000 if you want more)
     emails = get_all_emails(my_app, max_count=20)
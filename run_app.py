@@ -18,7 +18,7 @@ def run_app():
     ui_process = subprocess.Popen([sys.executable, "-m", "streamlit", "run", "main.py"])
     
     print("\n✅ Application works are running!")
-    print("   - Backend PID:Provider")
+    print(f"   - Backend PID: {extractor_process.pid}")
     print(f"   - Frontend PID: {ui_process.pid}")
     print("\n👉 Press Ctrl+C to stop both services.\n")
     
@@ -1,65 +1,104 @@
 import json
 import os
-from backend.pinecone_handler import PineconeHandler
-from backend.state import StateManager
+import argparse
+from backend.clients import get_pinecone, get_faq_store
+from backend.reconcile import reconcile, print_report
 
-FAQ_FILE = "data/faq_metadata.json"
-STATE_FILE = "data/processed_state.json"
+CONSUMER = "vectorizer"
+LEGACY_STATE_FILE = "data/vectorized_state.json"
+CHANGES_PER_ROUND = 1000
+EMBED_BATCH = 96  # Pinecone inference accepts up to 96 inputs per call
 
 def run_vectorization():
     print("🚀 Starting Pinecone Vectorization...")
     
-    # 1. Load Data
-    if not os.path.exists(FAQ_FILE):
-        print("⚠️ No FAQ metadata found.")
-        return
+    # 1. Read only what changed since our last run (the FAQ store keeps the cursor)
+    faqs = get_faq_store()
+    cursor = faqs.get_cursor(CONSUMER)
+    already_embedded = set()
+    if cursor is None:
+        cursor = 0
+        # First run after the JSON files: skip what the old vectorizer already uploaded
+        if os.path.exists(LEGACY_STATE_FILE):
+            with open(LEGACY_STATE_FILE, 'r') as f:
+                already_embedded = set(json.load(f))
 
-    with open(FAQ_FILE, 'r') as f:
+    pc = None
+    embedded = removed = 0
+    while True:
+        changes = faqs.changes_since(cursor, limit=CHANGES_PER_ROUND)
+        if not changes:
+            break
+
+        new_faqs = [c for c in changes if not c.get('deleted') and c['id'] not in already_embedded]
+        deleted_ids = [c['id'] for c in changes if c.get('deleted')]
+        print(f"📊 {len(changes)} FAQ changes since #{cursor}: {len(new_faqs)} to embed, {len(deleted_ids)} to remove.")
+
+        # 2. Upload to Pinecone
         try:
-            all_faqs = json.load(f)
-        except:
-            print("❌ Error reading FAQ file.")
+            pc = pc or get_pinecone()
+            for start in range(0, len(new_faqs), EMBED_BATCH):
+                batch = new_faqs[start:start + EMBED_BATCH]
+                if pc.embed_and_upsert(batch) != len(batch):
+                    print("❌ Vectorization stopped; will resume from here next run.")
+                    return
+                embedded += len(batch)
+            if deleted_ids:
+                pc.delete(deleted_ids)
+                removed += len(deleted_ids)
+        except Exception as e:
+            print(f"❌ Vectorization failed: {e}")
             return
 
-    # 2. Load State (to check what's already vectorized)
-    # We can add a "vectorized_ids" field to our state or just query Pinecone.
-    # For simplicity, let's track "vectorized_ids" in a new file or key.
-    
-    vectorized_file = "data/vectorized_state.json"
-    vectorized_ids = set()
-    if os.path.exists(vectorized_file):
-        with open(vectorized_file, 'r') as f:
-             vectorized_ids = set(json.load(f))
-             
-    # 3. Filter New FAQs
-    new_faqs = []
-    for faq in all_faqs:
-        mid = faq.get('source_email_id')
-        if mid and mid not in vectorized_ids:
-            new_faqs.append(faq)
-            
-    print(f"📊 Found {len(all_faqs)} total FAQs. {len(new_faqs)} new to vectorize.")
-    
-    if not new_faqs:
+        # 3. Update State (the local vector copy first, so readers know it is current)
+        cursor = changes[-1]['seq']
+        local = getattr(pc, "local", None)
+        if local is not None:
+            local.flush(checkpoint=cursor)
+        faqs.set_cursor(CONSUMER, cursor)
+
+    if embedded or removed:
+        print(f"💾 State updated (#{cursor}): {embedded} embedded, {removed} removed.")
+    else:
         print("✅ All caught up.")
-        return
 
-    # 4. Upload to Pinecone
-    try:
-        pc = PineconeHandler()
-        count = pc.embed_and_upsert(new_faqs)
-        
-        # 5. Update State
-        if count > 0:
-            for faq in new_faqs:
-                vectorized_ids.add(faq['source_email_id'])
-                
-            with open(vectorized_file, 'w') as f:
-                json.dump(list(vectorized_ids), f)
-            print("💾 State updated.")
-            
-    except Exception as e:
-        print(f"❌ Vectorization failed: {e}")
+def run_reconciliation(dry_run=True):
+    """Checks the whole index against the FAQ store (see backend.reconcile)."""
+    print("🔍 Reconciling Pinecone with the FAQ store...")
+    report = reconcile(get_faq_store(), get_pinecone(), dry_run=dry_run)
+    print_report(report)
+    return report
+
+def run_local_backfill():
+    """Copies every vector in the index into the local store used by LOCAL_VECTOR_SEARCH."""
+    from backend.clients import get_vector_store
+    print("📥 Copying Pinecone vectors to the local vector store...")
+    pc = get_pinecone()
+    store = get_vector_store()
+    # The index holds everything up to the vectorizer's cursor as of now
+    cursor = get_faq_store().get_cursor(CONSUMER) or 0
+    copied = 0
+    for ids in pc.list_ids(page_size=100):
+        vectors = pc.fetch_vectors(ids)
+        if vectors:
+            store.add(list(vectors), list(vectors.values()))
+        copied += len(vectors)
+    store.flush(checkpoint=cursor)
+    print(f"✅ {copied} vectors stored locally ({store.stats()['segments']} segments).")
+    return copied
 
 if __name__ == "__main__":
-    run_vectorization()
+    parser = argparse.ArgumentParser(description="Embed new FAQs into Pinecone")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Compare the whole index with the FAQ store and fix differences")
+    parser.add_argument("--dry-run", action="store_true", help="With --reconcile: only report")
+    parser.add_argument("--local", action="store_true",
+                        help="Copy the whole index into the local quantized vector store")
+    args = parser.parse_args()
+
+    if args.local:
+        run_local_backfill()
+    elif args.reconcile:
+        run_reconciliation(dry_run=args.dry_run)
+    else:
+        run_vectorization()
@@ -0,0 +1,55 @@
+import json
+import argparse
+from dotenv import load_dotenv
+from backend.clients import get_outlook, get_faq_store
+from backend.outbox import Outbox, OutboxSender, TEMPLATES, SEND_PER_MINUTE
+
+load_dotenv()
+
+def queue_faq_replies(outbox, recipients_file, template):
+    """
+    Queues templated FAQ answers. The recipients file is a JSON list like
+    [{"address": "a@b.com", "name": "Ann", "faq": "<faq id>"}], where the
+    FAQ id is the one shown in the Extracted FAQs tab.
+    """
+    faqs = get_faq_store()
+    with open(recipients_file, "r") as f:
+        recipients = json.load(f)
+
+    by_faq = {}
+    for recipient in recipients:
+        by_faq.setdefault(recipient.pop("faq"), []).append(recipient)
+
+    queued = 0
+    unknown = 0
+    for fid, group in by_faq.items():
+        faq = faqs.get(fid)
+        if not faq:
+            print(f"⚠️  Unknown FAQ {fid}, skipping {len(group)} recipients.")
+            unknown += len(group)
+            continue
+        queued += outbox.enqueue_template(template, faq, group)
+    print(f"📥 Queued {queued} new emails ({len(recipients) - unknown - queued} already in the outbox).")
+    if unknown:
+        print(f"⚠️  Skipped {unknown} recipients with an unknown FAQ id.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send queued emails from the outbox")
+    parser.add_argument("--recipients", metavar="FILE", help="Queue FAQ replies from this JSON file first")
+    parser.add_argument("--template", default="faq_answer", choices=sorted(TEMPLATES))
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent sender threads")
+    parser.add_argument("--per-minute", type=int, default=SEND_PER_MINUTE,
+                        help="Send rate limit for the mailbox (0 = unlimited)")
+    parser.add_argument("--retry-interrupted", action="store_true",
+                        help="Resend messages whose send was cut off by a crash (may duplicate)")
+    parser.add_argument("--status", action="store_true", help="Print outbox counts and exit")
+    args = parser.parse_args()
+
+    outbox = Outbox()
+    if args.status:
+        print(outbox.counts())
+    else:
+        if args.recipients:
+            queue_faq_replies(outbox, args.recipients, args.template)
+        OutboxSender(get_outlook(), outbox, workers=args.workers,
+                     per_minute=args.per_minute).run(retry_interrupted=args.retry_interrupted)